@@ -0,0 +1,245 @@
+"""
+Sincronização normalizada do catálogo iFood
+Quebra a árvore de get_catalog_categories nas tabelas ifood_categories,
+ifood_items, ifood_option_groups e ifood_item_options
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from ifood_product_sync import IFoodProductSync, _intern
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CATALOG_ROWS = REGISTRY.counter(
+    'sync_catalog_rows_total',
+    'Linhas gravadas pela sincronização de catálogo por tabela',
+    ['table']
+)
+
+
+# Tabelas na ordem de dependência (pais antes dos filhos) e a coluna
+# única usada como alvo do ON CONFLICT de cada uma
+WRITE_ORDER = [
+    ('ifood_categories', 'id'),
+    ('ifood_items', 'item_id'),
+    ('ifood_option_groups', 'group_id'),
+    ('ifood_item_options', 'option_id'),
+]
+
+
+def _price_values(data: Any) -> tuple:
+    """Extrai (value, originalValue) de um objeto de preço da API"""
+    if not isinstance(data, dict):
+        return None, None
+    return data.get('value'), data.get('originalValue')
+
+
+class IFoodCatalogSync(IFoodProductSync):
+    """
+    Sincronizador do catálogo em tabelas normalizadas
+
+    As linhas de cada merchant são acumuladas em buffers por tabela
+    (deduplicadas pela chave única) e gravadas com upserts em lote,
+    respeitando a ordem de dependência entre as tabelas.
+    """
+
+    def __init__(self, supabase_client, ifood_api_client, config=None, checkpoint=None,
+                 token_store=None):
+        super().__init__(supabase_client, ifood_api_client, checkpoint=checkpoint,
+                         token_store=token_store)
+        self.config = config
+        self.chunk_size = getattr(config, 'UPSERT_CHUNK_SIZE', 500)
+        self.dry_run = getattr(config, 'DRY_RUN', False)
+        self.pending: Dict[str, Dict[str, Dict]] = {table: {} for table, _ in WRITE_ORDER}
+        self.stats = {table: 0 for table, _ in WRITE_ORDER}
+
+    def run_sync_cycle(self):
+        """Executa ciclo com estatísticas por tabela"""
+        self.stats = {table: 0 for table, _ in WRITE_ORDER}
+
+        super().run_sync_cycle()
+
+        logger.info("📊 Estatísticas do ciclo (catálogo):")
+        for table, count in self.stats.items():
+            logger.info(f"   - {table}: {count}")
+
+    def process_merchant_products(self, token_data: Dict):
+        """
+        Normaliza os catálogos de um merchant e grava tudo ao final
+        """
+        user_id = token_data.get('user_id')
+        access_token = token_data.get('access_token')
+
+        if not all([user_id, access_token]):
+            logger.warning("Dados de token incompletos")
+            return
+
+        for merchant in self.get_merchant_info(user_id):
+            merchant_id = merchant.get('merchant_id')
+            if not merchant_id or not self.claim_merchant(merchant_id):
+                continue
+
+            logger.info(f"Normalizando catálogo do merchant {merchant_id}")
+
+            catalogs = self.ifood_api.get_merchant_catalogs(merchant_id, access_token)
+            for catalog in catalogs or []:
+                if self.drain_expired():
+                    break
+                catalog_id = catalog.get('catalogId')
+                if not catalog_id:
+                    continue
+
+                categories = self.ifood_api.get_catalog_categories(
+                    merchant_id,
+                    catalog_id,
+                    access_token
+                )
+                self.normalize_categories(categories or [], merchant_id, user_id)
+
+            if self.drain_expired():
+                # Catálogo parcial: descarta e deixa o próximo ciclo refazer o merchant
+                discarded = self.pending_count()
+                for rows in self.pending.values():
+                    rows.clear()
+                logger.warning(
+                    f"⏱️ Prazo de shutdown esgotado; {discarded} linhas pendentes "
+                    f"do merchant {merchant_id} descartadas"
+                )
+                return
+
+            self.flush()
+            self.mark_merchant_synced(merchant_id)
+
+    def normalize_categories(self, categories: List[Dict], merchant_id: str, user_id: str):
+        """
+        Converte a árvore categoria -> itens -> grupos -> opções em linhas
+        das tabelas normalizadas, acumulando-as nos buffers pendentes
+
+        Args:
+            categories: Resposta de get_catalog_categories (com itens)
+            merchant_id: ID do merchant
+            user_id: ID do usuário dono do merchant
+        """
+        merchant_id = _intern(merchant_id)
+        user_id = _intern(user_id)
+        categories_buf = self.pending['ifood_categories']
+        items_buf = self.pending['ifood_items']
+        groups_buf = self.pending['ifood_option_groups']
+        options_buf = self.pending['ifood_item_options']
+
+        for category in categories:
+            category_id = category.get('id')
+            if not category_id:
+                continue
+
+            categories_buf[category_id] = {
+                'id': category_id,
+                'name': category.get('name', ''),
+                'status': category.get('status', 'AVAILABLE'),
+                'template': category.get('template', 'DEFAULT'),
+                'merchant_id': merchant_id,
+                'user_id': user_id,
+            }
+
+            for item in category.get('items') or []:
+                item_id = item.get('id')
+                if not item_id:
+                    continue
+
+                price, original_price = _price_values(item.get('price'))
+                items_buf[item_id] = {
+                    'item_id': item_id,
+                    'merchant_id': merchant_id,
+                    'product_id': item.get('productId'),
+                    'category_id': category_id,
+                    'name': item.get('name', ''),
+                    'description': item.get('description'),
+                    'price': price,
+                    'original_price': original_price,
+                    'status': item.get('status', 'AVAILABLE'),
+                    'image_path': item.get('imagePath'),
+                    'external_code': item.get('externalCode'),
+                    'serving': item.get('serving'),
+                    'dietary_restrictions': item.get('dietaryRestrictions'),
+                    'tags': item.get('tags'),
+                    'user_id': user_id,
+                }
+
+                for group in item.get('optionGroups') or []:
+                    group_id = group.get('id')
+                    if not group_id:
+                        continue
+
+                    groups_buf[group_id] = {
+                        'group_id': group_id,
+                        'item_id': item_id,
+                        'name': group.get('name', ''),
+                        'status': group.get('status', 'AVAILABLE'),
+                        'type': group.get('optionGroupType'),
+                        'min_selection': group.get('min', 0),
+                        'max_selection': group.get('max', 1),
+                        'user_id': user_id,
+                    }
+
+                    for option in group.get('options') or []:
+                        option_id = option.get('id')
+                        if not option_id:
+                            continue
+
+                        price, original_price = _price_values(option.get('price'))
+                        options_buf[option_id] = {
+                            'option_id': option_id,
+                            'item_id': item_id,
+                            'option_group_id': group_id,
+                            'product_id': option.get('productId'),
+                            'name': option.get('name'),
+                            'status': option.get('status', 'AVAILABLE'),
+                            'price': price,
+                            'original_price': original_price,
+                            'min_quantity': option.get('min', 0),
+                            'max_quantity': option.get('max', 1),
+                            'user_id': user_id,
+                        }
+
+    def pending_count(self) -> int:
+        """Total de linhas aguardando gravação"""
+        return sum(len(rows) for rows in self.pending.values())
+
+    def flush(self) -> Optional[Dict[str, int]]:
+        """
+        Grava os buffers pendentes com upserts em lote, na ordem de dependência
+
+        Returns:
+            Linhas gravadas por tabela
+        """
+        written = {}
+        try:
+            for table, conflict_key in WRITE_ORDER:
+                rows = list(self.pending[table].values())
+                if not rows:
+                    continue
+
+                if self.dry_run:
+                    logger.info(f"[DRY RUN] {len(rows)} linhas seriam gravadas em {table}")
+                else:
+                    self.supabase.bulk_upsert(
+                        table,
+                        rows,
+                        on_conflict=conflict_key,
+                        chunk_size=self.chunk_size
+                    )
+
+                self.stats[table] += len(rows)
+                CATALOG_ROWS.labels(table).inc(len(rows))
+                written[table] = len(rows)
+                self.pending[table].clear()
+        except Exception:
+            # Filhos de uma tabela que falhou violariam as FKs: descarta o
+            # restante e deixa o próximo ciclo regravar o merchant inteiro
+            for rows in self.pending.values():
+                rows.clear()
+            raise
+
+        return written
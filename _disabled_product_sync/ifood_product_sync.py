@@ -4,11 +4,16 @@ Baseado no fluxo N8N para polling e atualização de produtos
 """
 
 import logging
+import sys
+import threading
 import time
 from datetime import datetime
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Union
 import json
-from dataclasses import dataclass
+from dataclasses import MISSING, dataclass, field, fields, make_dataclass
+
+from metrics import REGISTRY
+from token_store import token_version
 
 # Configurar logging
 logging.basicConfig(
@@ -18,9 +23,87 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-@dataclass
-class Product:
-    """Classe para representar um produto"""
+# Métricas do ciclo de sincronização (expostas em /metrics)
+SYNC_CYCLES = REGISTRY.counter(
+    'sync_cycles_total',
+    'Ciclos de sincronização por resultado',
+    ['result']
+)
+SYNC_CYCLE_DURATION = REGISTRY.histogram(
+    'sync_cycle_duration_seconds',
+    'Duração dos ciclos de sincronização',
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800)
+)
+SYNC_LAST_SUCCESS = REGISTRY.gauge(
+    'sync_last_success_timestamp_seconds',
+    'Unix timestamp do último ciclo concluído sem erro'
+)
+SYNC_MERCHANT_ERRORS = REGISTRY.counter(
+    'sync_merchant_errors_total',
+    'Merchants cujo processamento falhou dentro de um ciclo'
+)
+SYNC_MERCHANT_LAST_SYNC = REGISTRY.gauge(
+    'sync_merchant_last_sync_timestamp_seconds',
+    'Unix timestamp da última sincronização concluída por merchant',
+    ['merchant_id']
+)
+SYNC_PRODUCTS = REGISTRY.counter(
+    'sync_products_total',
+    'Produtos processados por resultado (created/updated/skipped/error)',
+    ['result']
+)
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Interna strings repetidas (merchant_id, client_id, categorias) entre produtos"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class _ProductRow:
+    """Conversão compartilhada entre Product e FrozenProduct"""
+
+    __slots__ = ()
+
+    def to_db_row(self, is_active: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Converte o produto diretamente para o formato da tabela products
+
+        Args:
+            is_active: Status já normalizado (usa o status bruto se omitido)
+
+        Returns:
+            Dict pronto para insert/update, sem campos None
+        """
+        row = {
+            'item_id': self.item_id,
+            'name': self.name,
+            'description': self.description,
+            'merchant_id': self.merchant_id,
+            'is_active': is_active if is_active is not None else self.status,
+            'price': self.price,
+            'imagePath': self.image_path,
+            'product_id': self.product_id,
+            'client_id': self.client_id,
+        }
+        if self.category_id is not None:
+            row['ifood_category_id'] = self.category_id
+        if self.category_name is not None:
+            row['ifood_category_name'] = self.category_name
+
+        # Remove campos None sem criar um segundo dict por produto
+        for key in [k for k, v in row.items() if v is None]:
+            del row[key]
+        return row
+
+
+@dataclass(slots=True)
+class Product(_ProductRow):
+    """
+    Registro compacto de um produto
+
+    Usa __slots__ (sem __dict__ por instância). Campos repetidos entre
+    milhares de itens do mesmo catálogo são internados em extract_product_data.
+    """
     item_id: str
     name: str
     description: str
@@ -31,6 +114,21 @@ class Product:
     merchant_id: str
     user_id: Optional[str] = None
     client_id: Optional[str] = None
+    category_id: Optional[str] = None
+    category_name: Optional[str] = None
+
+
+# Variante imutável (hashable). A construção é mais lenta por causa do
+# object.__setattr__ por campo, por isso é opcional (frozen_products=True).
+FrozenProduct = make_dataclass(
+    'FrozenProduct',
+    [(f.name, f.type) if f.default is MISSING else (f.name, f.type, field(default=f.default))
+     for f in fields(Product)],
+    bases=(_ProductRow,),
+    slots=True,
+    frozen=True
+)
+FrozenProduct.__module__ = __name__
 
 
 class IFoodProductSync:
@@ -39,56 +137,148 @@ class IFoodProductSync:
     Replica a funcionalidade do fluxo N8N em Python
     """
     
-    def __init__(self, supabase_client, ifood_api_client):
+    def __init__(self, supabase_client, ifood_api_client, frozen_products: bool = False,
+                 checkpoint=None, token_store=None):
         """
         Inicializa o sincronizador
         
         Args:
             supabase_client: Cliente Supabase configurado
             ifood_api_client: Cliente da API do iFood configurado
+            frozen_products: Se True, gera FrozenProduct (imutável) em vez de Product
+            checkpoint: SyncCheckpoint opcional para retomar ciclos interrompidos
+            token_store: PersistentTokenCache opcional (tokens em disco entre ciclos e restarts)
         """
         self.supabase = supabase_client
         self.ifood_api = ifood_api_client
         self.processed_items = set()
+        self.product_class = FrozenProduct if frozen_products else Product
+        self.checkpoint = checkpoint
+        self.token_store = token_store
+        
+        # Parada cooperativa (sinal recebido em outra thread)
+        self._stop_event = threading.Event()
+        self._drain_deadline: Optional[float] = None
+    
+    def request_stop(self, grace_seconds: float):
+        """
+        Pede a parada do ciclo em andamento
+        
+        Nenhum merchant novo é iniciado; o merchant em andamento tem até
+        grace_seconds para terminar seus lotes e gravações pendentes.
+        """
+        self._drain_deadline = time.monotonic() + grace_seconds
+        self._stop_event.set()
+    
+    @property
+    def stopping(self) -> bool:
+        return self._stop_event.is_set()
+    
+    def drain_expired(self) -> bool:
+        """Se o prazo para concluir o trabalho em andamento já acabou"""
+        return self.stopping and time.monotonic() > self._drain_deadline
+    
+    def claim_merchant(self, merchant_id: str) -> bool:
+        """
+        Decide se o merchant deve ser processado agora
+        
+        Returns:
+            False se uma parada foi pedida ou se o merchant já foi concluído
+            no ciclo retomado do checkpoint
+        """
+        if self.stopping:
+            return False
+        if self.checkpoint and self.checkpoint.is_done(merchant_id):
+            logger.info(f"⏭️ Merchant {merchant_id} já sincronizado neste ciclo, pulando")
+            return False
+        return True
         
     def run_sync_cycle(self):
         """
         Executa um ciclo completo de sincronização
         Equivalente ao fluxo completo do N8N
         """
+        started = time.perf_counter()
+        if self.stopping:
+            return
         try:
             logger.info("Iniciando ciclo de sincronização de produtos")
+            if self.checkpoint:
+                self.checkpoint.begin_cycle()
             
             # 1. Buscar tokens de acesso
             tokens = self.get_access_tokens()
             if not tokens:
                 logger.error("Nenhum token de acesso encontrado")
+                SYNC_CYCLES.labels('no_tokens').inc()
                 return
             
             for token_data in tokens:
+                if self.stopping:
+                    break
                 try:
                     self.process_merchant_products(token_data)
                 except Exception as e:
                     logger.error(f"Erro processando merchant {token_data.get('merchant_id')}: {e}")
+                    SYNC_MERCHANT_ERRORS.inc()
                     continue
+            
+            if self.stopping:
+                # Checkpoint fica no disco para o próximo processo retomar
+                logger.warning("🛑 Ciclo interrompido por shutdown; progresso salvo no checkpoint")
+                SYNC_CYCLES.labels('interrupted').inc()
+                return
                     
+            if self.checkpoint:
+                self.checkpoint.clear()
             logger.info("Ciclo de sincronização concluído")
+            SYNC_CYCLES.labels('ok').inc()
+            SYNC_LAST_SUCCESS.set(time.time())
             
         except Exception as e:
             logger.error(f"Erro no ciclo de sincronização: {e}")
+            SYNC_CYCLES.labels('error').inc()
             raise
+        finally:
+            SYNC_CYCLE_DURATION.observe(time.perf_counter() - started)
     
     def get_access_tokens(self) -> List[Dict]:
         """
         Busca tokens de acesso da tabela ifood_tokens
         Equivalente ao node "[GET] Pega o Token"
+        
+        Com token_store, consulta só as versões e busca as linhas completas
+        apenas dos tokens alterados; se o banco falhar, usa os tokens do disco.
         """
         try:
-            response = self.supabase.table('ifood_tokens').select("*").execute()
-            return response.data
+            if self.token_store is None:
+                response = self.supabase.table('ifood_tokens').select("*").execute()
+                return response.data
+            
+            response = self.supabase.table('ifood_tokens')\
+                .select("id,token_updated_at,updated_at")\
+                .execute()
+            # Por id: vários usuários podem compartilhar o mesmo client_id
+            versions = {row['id']: token_version(row) for row in response.data}
+            return self.token_store.reconcile(versions, self._fetch_token_rows)
         except Exception as e:
             logger.error(f"Erro ao buscar tokens: {e}")
-            return []
+            if self.token_store is None:
+                return []
+            tokens = list(self.token_store.get_many().values())
+            logger.warning(f"⚠️ Usando {len(tokens)} tokens do cache local")
+            return tokens
+    
+    def _fetch_token_rows(self, ids: List[str]) -> List[Dict]:
+        """Linhas completas de ifood_tokens para os ids (em lotes)"""
+        rows = []
+        for start in range(0, len(ids), 100):
+            response = self.supabase.table('ifood_tokens')\
+                .select("*")\
+                .in_('id', ids[start:start + 100])\
+                .execute()
+            rows.extend(response.data)
+        return rows
     
     def get_merchant_info(self, user_id: str) -> List[Dict]:
         """
@@ -122,7 +312,7 @@ class IFoodProductSync:
         
         for merchant in merchants:
             merchant_id = merchant.get('merchant_id')
-            if not merchant_id:
+            if not merchant_id or not self.claim_merchant(merchant_id):
                 continue
                 
             logger.info(f"Processando merchant {merchant_id}")
@@ -135,6 +325,8 @@ class IFoodProductSync:
                 continue
             
             for catalog in catalogs:
+                if self.drain_expired():
+                    break
                 catalog_id = catalog.get('catalogId')
                 if not catalog_id:
                     continue
@@ -151,6 +343,8 @@ class IFoodProductSync:
                 
                 # Processar produtos de cada categoria
                 for category in categories:
+                    if self.drain_expired():
+                        break
                     items = category.get('items', [])
                     self.process_category_items(
                         items, 
@@ -158,6 +352,17 @@ class IFoodProductSync:
                         user_id,
                         client_id
                     )
+            
+            if self.drain_expired():
+                logger.warning(f"⏱️ Prazo de shutdown esgotado; merchant {merchant_id} ficou incompleto")
+                return
+            self.mark_merchant_synced(merchant_id)
+    
+    def mark_merchant_synced(self, merchant_id: str):
+        """Registra a conclusão do merchant (lag por merchant e checkpoint)"""
+        SYNC_MERCHANT_LAST_SYNC.labels(merchant_id).set(time.time())
+        if self.checkpoint:
+            self.checkpoint.mark_done(merchant_id)
     
     def process_category_items(self, items: List[Dict], merchant_id: str, 
                               user_id: str, client_id: str):
@@ -187,7 +392,7 @@ class IFoodProductSync:
                 continue
     
     def extract_product_data(self, item: Dict, merchant_id: str, 
-                            user_id: str) -> Product:
+                            user_id: str, client_id: Optional[str] = None) -> Product:
         """
         Extrai dados do produto do item da API
         Equivalente aos nodes de filtragem "[FILTER] Filtra dados Importantes dos Produtos"
@@ -195,16 +400,19 @@ class IFoodProductSync:
         price_data = item.get('price', {})
         price_value = price_data.get('value', 0) if isinstance(price_data, dict) else 0
         
-        return Product(
+        return self.product_class(
             item_id=item.get('id', ''),
             name=item.get('name', ''),
             description=item.get('description', ''),
-            status=item.get('status', 'AVAILABLE'),
+            status=_intern(item.get('status', 'AVAILABLE')),
             product_id=item.get('productId', ''),
             image_path=item.get('imagePath', ''),
             price=price_value,
-            merchant_id=merchant_id,
-            user_id=user_id
+            merchant_id=_intern(merchant_id),
+            user_id=_intern(user_id),
+            client_id=_intern(client_id),
+            category_id=_intern(item.get('category_id')),
+            category_name=_intern(item.get('category_name'))
         )
     
     def get_existing_product(self, merchant_id: str, item_id: str) -> Optional[Dict]:
@@ -224,51 +432,60 @@ class IFoodProductSync:
             logger.error(f"Erro ao buscar produto existente: {e}")
             return None
     
-    def create_product(self, product: Product, client_id: str):
+    def create_product(self, product: Union[Product, Dict], client_id: str):
         """
         Cria novo produto no banco
         Equivalente ao node "[CREATE] Cria o Produto dentro do banco de dados"
+        
+        Aceita o Product ou a linha já convertida (dict), como a sincronização
+        integrada envia depois do ProductProcessor.
+        
+        Returns:
+            Linhas criadas, ou None se a gravação falhar
         """
         try:
-            product_data = {
-                'item_id': product.item_id,
-                'name': product.name,
-                'description': product.description,
-                'merchant_id': product.merchant_id,
-                'client_id': client_id,
-                'is_active': product.status,
-                'price': product.price,
-                'imagePath': product.image_path,
-                'product_id': product.product_id
-            }
+            product_data = dict(product) if isinstance(product, dict) else product.to_db_row()
+            if client_id is not None:
+                product_data['client_id'] = client_id
             
             response = self.supabase.table('products').insert(product_data).execute()
-            logger.info(f"Produto criado: {product.item_id}")
+            logger.info(f"Produto criado: {product_data['item_id']}")
             return response.data
             
         except Exception as e:
             logger.error(f"Erro ao criar produto: {e}")
             return None
     
-    def update_product_if_needed(self, new_product: Product, existing_product: Dict):
+    def update_product_if_needed(self, new_product: Union[Product, Dict], existing_product: Dict):
         """
         Atualiza produto se houver mudanças no status
         Equivalente aos nodes de UPDATE
+        
+        Aceita o Product ou a linha já convertida (dict, status em is_active).
         """
         try:
+            if isinstance(new_product, dict):
+                status = new_product.get('is_active')
+                merchant_id = new_product['merchant_id']
+                item_id = new_product['item_id']
+            else:
+                status = new_product.status
+                merchant_id = new_product.merchant_id
+                item_id = new_product.item_id
+            
             # Verificar se o status mudou
-            if existing_product.get('is_active') != new_product.status:
+            if existing_product.get('is_active') != status:
                 update_data = {
-                    'is_active': new_product.status
+                    'is_active': status
                 }
                 
                 response = self.supabase.table('products')\
                     .update(update_data)\
-                    .eq('merchant_id', new_product.merchant_id)\
-                    .eq('item_id', new_product.item_id)\
+                    .eq('merchant_id', merchant_id)\
+                    .eq('item_id', item_id)\
                     .execute()
                     
-                logger.info(f"Status do produto {new_product.item_id} atualizado para {new_product.status}")
+                logger.info(f"Status do produto {item_id} atualizado para {status}")
                 return response.data
                 
         except Exception as e:
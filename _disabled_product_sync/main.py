@@ -4,25 +4,32 @@ Script principal para sincronização de produtos iFood
 Implementa o polling automático equivalente ao Schedule Trigger do N8N
 """
 
+import os
 import sys
 import signal
+import argparse
 import logging
-import schedule
 import time
 from datetime import datetime
-from typing import Optional
-import colorlog
+from typing import TYPE_CHECKING, Optional
 
 from config import Config
-from supabase_client import SupabaseClient
-from ifood_api_client import IFoodAPIClient
-from ifood_product_sync import IFoodProductSync
-from product_processor import ProductProcessor
+from ifood_product_sync import IFoodProductSync, SYNC_PRODUCTS
+
+# Clientes (supabase, requests, numpy), colorlog e asyncio são importados
+# onde são usados, para que --help e processos curtos não paguem por eles
+if TYPE_CHECKING:
+    from job_scheduler import AsyncJobScheduler
+
+# Logger do módulo (usado por IFoodProductSyncIntegrated)
+logger = logging.getLogger(__name__)
 
 
 # Configurar logging colorido
 def setup_logging():
     """Configura o sistema de logging com cores"""
+    import colorlog
+    
     handler = colorlog.StreamHandler()
     handler.setFormatter(
         colorlog.ColoredFormatter(
@@ -59,10 +66,24 @@ class ProductSyncScheduler:
     Equivalente ao Schedule Trigger do N8N
     """
     
-    def __init__(self):
-        """Inicializa o scheduler"""
+    def __init__(self, supabase_client=None, ifood_client=None, token_store=None,
+                 install_signal_handlers: bool = True):
+        """
+        Inicializa o scheduler
+        
+        Args:
+            supabase_client: Cliente já construído (ex.: SQLiteSupabaseClient)
+            ifood_client: Cliente já construído (ex.: SimulatedIFoodAPI)
+            token_store: Cache de tokens em disco já aberto (compartilhado)
+            install_signal_handlers: Se SIGINT/SIGTERM pedem o shutdown; False
+                quando outro componente (ex.: o supervisor) cuida dos sinais
+        """
         self.logger = logging.getLogger(__name__)
         self.running = False
+        self.shutdown_requested = False
+        from product_processor import ProductProcessor
+        
+        self.scheduler: Optional['AsyncJobScheduler'] = None
         self.sync_system: Optional[IFoodProductSync] = None
         self.processor = ProductProcessor()
         self.last_sync = None
@@ -70,38 +91,72 @@ class ProductSyncScheduler:
         self.error_count = 0
         
         # Configurar manipuladores de sinal para shutdown gracioso
-        signal.signal(signal.SIGINT, self.handle_shutdown)
-        signal.signal(signal.SIGTERM, self.handle_shutdown)
+        if install_signal_handlers:
+            signal.signal(signal.SIGINT, self.handle_shutdown)
+            signal.signal(signal.SIGTERM, self.handle_shutdown)
         
-        self.initialize_clients()
+        self.initialize_clients(supabase_client, ifood_client, token_store)
     
-    def initialize_clients(self):
-        """Inicializa os clientes necessários"""
+    def initialize_clients(self, supabase_client=None, ifood_client=None, token_store=None):
+        """Inicializa os clientes necessários (ou usa os substitutos fornecidos)"""
+        from catalog_sync import IFoodCatalogSync
+        from sync_checkpoint import SyncCheckpoint
+        from token_store import open_token_store
+        
         try:
             self.logger.info("🚀 Inicializando sistema de sincronização...")
             
-            # Validar configurações
-            Config.validate()
-            
-            # Inicializar cliente Supabase
-            self.supabase_client = SupabaseClient(
-                url=Config.SUPABASE_URL,
-                key=Config.SUPABASE_KEY
-            )
+            if supabase_client is None:
+                # Validar configurações
+                Config.validate()
+                
+                # Inicializar cliente Supabase
+                from supabase_client import SupabaseClient
+                
+                supabase_client = SupabaseClient(
+                    url=Config.SUPABASE_URL,
+                    key=Config.SUPABASE_KEY
+                )
+            self.supabase_client = supabase_client
             
             # Inicializar cliente da API do iFood
-            self.ifood_client = IFoodAPIClient(
-                timeout=Config.IFOOD_API_TIMEOUT,
-                retry_attempts=Config.IFOOD_API_RETRY_ATTEMPTS
-            )
+            if ifood_client is None:
+                from ifood_api_client import IFoodAPIClient
+                
+                ifood_client = IFoodAPIClient(
+                    timeout=Config.IFOOD_API_TIMEOUT,
+                    retry_attempts=Config.IFOOD_API_RETRY_ATTEMPTS
+                )
+            self.ifood_client = ifood_client
             
-            # Criar sistema de sincronização integrado
-            self.sync_system = IFoodProductSyncIntegrated(
-                supabase_client=self.supabase_client,
-                ifood_api_client=self.ifood_client,
-                processor=self.processor,
-                config=Config
-            )
+            # Merchants concluídos do ciclo corrente, para retomar após restart
+            checkpoint = SyncCheckpoint(
+                Config.CHECKPOINT_FILE,
+                max_age_seconds=Config.SYNC_INTERVAL_MINUTES * 60
+            ) if Config.CHECKPOINT_FILE else None
+            
+            # Tokens em disco, compartilhados com a API e o refresh de tokens
+            if token_store is None:
+                token_store = open_token_store(Config.TOKEN_CACHE_FILE, Config.TOKEN_CACHE_KEY)
+            
+            # Criar sistema de sincronização conforme o modo configurado
+            if Config.SYNC_MODE == 'catalog':
+                self.sync_system = IFoodCatalogSync(
+                    supabase_client=self.supabase_client,
+                    ifood_api_client=self.ifood_client,
+                    config=Config,
+                    checkpoint=checkpoint,
+                    token_store=token_store
+                )
+            else:
+                self.sync_system = IFoodProductSyncIntegrated(
+                    supabase_client=self.supabase_client,
+                    ifood_api_client=self.ifood_client,
+                    processor=self.processor,
+                    config=Config,
+                    checkpoint=checkpoint,
+                    token_store=token_store
+                )
             
             self.logger.info("✅ Sistema inicializado com sucesso")
             
@@ -125,6 +180,9 @@ class ProductSyncScheduler:
             self.sync_system.run_sync_cycle()
             
             elapsed_time = time.time() - start_time
+            if self.sync_system.stopping:
+                self.logger.info(f"🛑 Sincronização #{self.sync_count} interrompida após {elapsed_time:.2f} segundos")
+                return
             self.last_sync = datetime.now()
             
             self.logger.info(f"✅ Sincronização #{self.sync_count} concluída em {elapsed_time:.2f} segundos")
@@ -147,34 +205,106 @@ class ProductSyncScheduler:
         self.logger.info(f"📋 Configurações:")
         self.logger.info(f"   - Intervalo: {Config.SYNC_INTERVAL_MINUTES} minutos")
         self.logger.info(f"   - Batch size: {Config.BATCH_SIZE} produtos")
+        self.logger.info(f"   - Sync mode: {Config.SYNC_MODE}")
         self.logger.info(f"   - Modo: {'DRY RUN' if Config.DRY_RUN else 'PRODUÇÃO'}")
         self.logger.info(f"   - Debug: {'Ativado' if Config.DEBUG_MODE else 'Desativado'}")
         self.logger.info("=" * 60)
         
-        # Executar primeira sincronização imediatamente
-        self.logger.info("🎯 Executando primeira sincronização...")
-        self.sync_job()
+        self.logger.info(f"⏰ Sincronização a cada {Config.SYNC_INTERVAL_MINUTES} minutos "
+                         f"(jitter até {Config.SCHEDULER_JITTER_SECONDS:.0f}s, "
+                         f"atrasos: {Config.MISSED_RUN_POLICY})")
+        self.logger.info("💡 Pressione Ctrl+C para parar")
         
-        # Agendar próximas execuções
-        schedule.every(Config.SYNC_INTERVAL_MINUTES).minutes.do(self.sync_job)
+        import asyncio
+        from metrics import start_metrics_server
         
-        self.logger.info(f"⏰ Próxima sincronização em {Config.SYNC_INTERVAL_MINUTES} minutos")
-        self.logger.info("💡 Pressione Ctrl+C para parar")
+        if Config.METRICS_PORT:
+            start_metrics_server(Config.METRICS_PORT)
         
-        # Loop principal
-        while self.running:
-            try:
-                schedule.run_pending()
-                time.sleep(1)
-            except KeyboardInterrupt:
-                break
+        asyncio.run(self.serve())
+        
+        # O agendador só retorna depois que o ciclo em andamento drenou
+        self.log_session_stats()
     
-    def handle_shutdown(self, signum, frame):
-        """Manipula o shutdown gracioso do sistema"""
-        self.logger.info("\n🛑 Sinal de shutdown recebido. Encerrando...")
+    async def serve(self):
+        """
+        Executa o job de sincronização no event loop corrente até stop()
+        
+        A primeira sincronização roda imediatamente, as próximas no intervalo.
+        """
+        from job_scheduler import AsyncJobScheduler
+        
+        self.scheduler = AsyncJobScheduler()
+        self.register_jobs(self.scheduler)
+        await self.scheduler.run()
+    
+    def stop(self):
+        """
+        Pede a parada: nenhum merchant novo, o atual tem
+        SHUTDOWN_GRACE_SECONDS para concluir; serve() retorna depois disso
+        """
         self.running = False
+        if self.sync_system:
+            self.sync_system.request_stop(Config.SHUTDOWN_GRACE_SECONDS)
+        if self.scheduler:
+            self.scheduler.stop()
+    
+    def profile_cycle(self, output_path: str, top: int = 30, context: Optional[dict] = None):
+        """
+        Executa exatamente um run_sync_cycle sob cProfile e tracemalloc
+        
+        Args:
+            output_path: Arquivo do relatório
+            top: Entradas por seção do relatório
+            context: Informações extras para o cabeçalho do relatório
+        """
+        from sync_profiler import profile_call
+        
+        self.logger.info(f"🔬 Perfilando um ciclo de sincronização (modo {Config.SYNC_MODE})...")
+        header = {'Modo': Config.SYNC_MODE, 'Batch size': Config.BATCH_SIZE}
+        header.update(context or {})
+        return profile_call(
+            self.sync_system.run_sync_cycle,
+            output_path,
+            top=top,
+            context=header
+        )
+    
+    def register_jobs(self, scheduler: 'AsyncJobScheduler'):
+        """Registra o job de sincronização em um agendador (possivelmente compartilhado)"""
+        interval = Config.SYNC_INTERVAL_MINUTES * 60
+        scheduler.add_job(
+            'product_sync',
+            self.sync_job,
+            interval=interval,
+            jitter=Config.SCHEDULER_JITTER_SECONDS,
+            missed_run_policy=Config.MISSED_RUN_POLICY,
+            deadline=interval
+        )
+    
+    def handle_shutdown(self, signum, frame):
+        """
+        Manipula o shutdown gracioso do sistema
+        
+        Não encerra o processo aqui: pede a parada ao sincronizador (nenhum
+        merchant novo, o atual tem SHUTDOWN_GRACE_SECONDS para concluir) e
+        ao agendador. run() retorna quando o trabalho em andamento termina.
+        Um segundo sinal força a saída imediata.
+        """
+        if self.shutdown_requested:
+            self.logger.warning("⚠️ Segundo sinal recebido. Saindo sem aguardar o ciclo em andamento")
+            # sys.exit esperaria a thread do ciclo (executor do asyncio)
+            os._exit(1)
         
-        # Estatísticas finais
+        self.shutdown_requested = True
+        self.logger.info(
+            f"\n🛑 Sinal de shutdown recebido. Concluindo trabalho em andamento "
+            f"(até {Config.SHUTDOWN_GRACE_SECONDS:.0f}s)..."
+        )
+        self.stop()
+    
+    def log_session_stats(self):
+        """Loga as estatísticas finais da sessão"""
         self.logger.info("=" * 60)
         self.logger.info("📊 ESTATÍSTICAS DA SESSÃO")
         self.logger.info(f"   - Total de sincronizações: {self.sync_count}")
@@ -183,7 +313,6 @@ class ProductSyncScheduler:
             self.logger.info(f"   - Última sincronização: {self.last_sync.strftime('%Y-%m-%d %H:%M:%S')}")
         self.logger.info("=" * 60)
         self.logger.info("👋 Sistema encerrado com sucesso")
-        sys.exit(0)
 
 
 class IFoodProductSyncIntegrated(IFoodProductSync):
@@ -191,8 +320,10 @@ class IFoodProductSyncIntegrated(IFoodProductSync):
     Versão integrada do sincronizador com processador
     """
     
-    def __init__(self, supabase_client, ifood_api_client, processor, config):
-        super().__init__(supabase_client, ifood_api_client)
+    def __init__(self, supabase_client, ifood_api_client, processor, config, checkpoint=None,
+                 token_store=None):
+        super().__init__(supabase_client, ifood_api_client, checkpoint=checkpoint,
+                         token_store=token_store)
         self.processor = processor
         self.config = config
         self.stats = {
@@ -212,10 +343,11 @@ class IFoodProductSyncIntegrated(IFoodProductSync):
         # Preparar produtos para processamento
         products_to_process = []
         for item in items:
-            product = self.extract_product_data(item, merchant_id, user_id)
-            db_product = self.processor.prepare_product_for_db(
-                vars(product),
-                {'client_id': client_id}
+            # Product é slotted: converte direto para a linha do banco,
+            # sem o dict intermediário de vars()
+            product = self.extract_product_data(item, merchant_id, user_id, client_id)
+            db_product = product.to_db_row(
+                self.processor.normalize_product_status(product.status)
             )
             products_to_process.append(db_product)
         
@@ -226,6 +358,9 @@ class IFoodProductSyncIntegrated(IFoodProductSync):
         batches = self.processor.batch_products(unique_products, self.config.BATCH_SIZE)
         
         for batch in batches:
+            # Após o prazo de shutdown, não inicia novos lotes
+            if self.drain_expired():
+                break
             self.process_batch(batch, merchant_id)
     
     def process_batch(self, batch, merchant_id):
@@ -251,10 +386,12 @@ class IFoodProductSyncIntegrated(IFoodProductSync):
                     else:
                         self.stats['products_skipped'] += 1
                 else:
-                    # Criar novo produto
-                    if not self.config.DRY_RUN:
-                        self.create_product(product, product.get('client_id'))
-                    self.stats['products_created'] += 1
+                    # Criar novo produto (create_product registra a falha e devolve None)
+                    if self.config.DRY_RUN or \
+                            self.create_product(product, product.get('client_id')) is not None:
+                        self.stats['products_created'] += 1
+                    else:
+                        self.stats['errors'] += 1
                     
             except Exception as e:
                 logger.error(f"Erro processando produto: {e}")
@@ -271,7 +408,13 @@ class IFoodProductSyncIntegrated(IFoodProductSync):
         }
         
         # Executar sincronização
-        super().run_sync_cycle()
+        try:
+            super().run_sync_cycle()
+        finally:
+            SYNC_PRODUCTS.labels('created').inc(self.stats['products_created'])
+            SYNC_PRODUCTS.labels('updated').inc(self.stats['products_updated'])
+            SYNC_PRODUCTS.labels('skipped').inc(self.stats['products_skipped'])
+            SYNC_PRODUCTS.labels('error').inc(self.stats['errors'])
         
         # Logar estatísticas
         logger.info(f"📊 Estatísticas do ciclo:")
@@ -281,16 +424,78 @@ class IFoodProductSyncIntegrated(IFoodProductSync):
         logger.info(f"   - Erros: {self.stats['errors']}")
 
 
-def main():
+def build_parser() -> argparse.ArgumentParser:
+    """Argumentos de linha de comando da sincronização"""
+    parser = argparse.ArgumentParser(description="Sincronização de produtos iFood")
+    parser.add_argument("--profile", action="store_true",
+                        help="Executa um único ciclo com cProfile + tracemalloc e sai")
+    parser.add_argument("--profile-output", default="sync_profile.txt",
+                        help="Arquivo do relatório de perfil (padrão: sync_profile.txt)")
+    parser.add_argument("--profile-top", type=int, default=30,
+                        help="Entradas por seção do relatório (padrão: 30)")
+    
+    simulation = parser.add_argument_group("simulação (SQLite + API simulada, sem rede)")
+    simulation.add_argument("--simulate", action="store_true",
+                            help="Usa SQLiteSupabaseClient e SimulatedIFoodAPI")
+    simulation.add_argument("--sim-db", default=":memory:",
+                            help="Arquivo SQLite da simulação (padrão: em memória)")
+    simulation.add_argument("--sim-tokens", type=int, default=5,
+                            help="Tokens (usuários) simulados")
+    simulation.add_argument("--sim-merchants", type=int, default=2,
+                            help="Merchants por token")
+    simulation.add_argument("--sim-categories", type=int, default=10,
+                            help="Categorias por catálogo")
+    simulation.add_argument("--sim-items", type=int, default=50,
+                            help="Itens por categoria")
+    simulation.add_argument("--sim-latency", type=float, default=0.0,
+                            help="Latência artificial por chamada à API simulada (s)")
+    simulation.add_argument("--sim-seed", type=int, default=42,
+                            help="Semente da simulação")
+    return parser
+
+
+def build_simulation(args):
+    """Cria os substitutos locais e popula tokens/merchants"""
+    from local_standins import SQLiteSupabaseClient, SimulatedIFoodAPI, seed_simulation
+    
+    supabase_client = SQLiteSupabaseClient(args.sim_db)
+    ifood_client = SimulatedIFoodAPI(
+        categories_per_catalog=args.sim_categories,
+        items_per_category=args.sim_items,
+        latency=args.sim_latency,
+        seed=args.sim_seed
+    )
+    merchant_ids = seed_simulation(supabase_client, n_tokens=args.sim_tokens,
+                                   merchants_per_token=args.sim_merchants)
+    ifood_client.prefetch(merchant_ids)
+    context = {
+        'Simulação': (f"{args.sim_tokens} tokens x {args.sim_merchants} merchants, "
+                      f"{args.sim_categories} categorias x {args.sim_items} itens, "
+                      f"seed {args.sim_seed}")
+    }
+    return supabase_client, ifood_client, context
+
+
+def main(argv=None):
     """Função principal"""
+    args = build_parser().parse_args(argv)
+    
     # Configurar logging
     logger = setup_logging()
     
+    supabase_client = ifood_client = None
+    context = {}
+    if args.simulate:
+        supabase_client, ifood_client, context = build_simulation(args)
+    
     # Criar e executar scheduler
-    scheduler = ProductSyncScheduler()
+    scheduler = ProductSyncScheduler(supabase_client, ifood_client)
     
     try:
-        scheduler.run()
+        if args.profile:
+            scheduler.profile_cycle(args.profile_output, top=args.profile_top, context=context)
+        else:
+            scheduler.run()
     except Exception as e:
         logger.critical(f"Erro fatal: {e}")
         sys.exit(1)
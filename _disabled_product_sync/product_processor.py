@@ -4,12 +4,35 @@ Processador de produtos com lógica de deduplicação e validação
 
 import logging
 import json
-from typing import List, Dict, Set, Tuple
+from typing import Any, List, Dict, Optional, Set, Tuple
 from collections import defaultdict
 
+try:
+    import numpy as np
+except ImportError:  # numpy é opcional: só a API em lote depende dele
+    np = None
+
 logger = logging.getLogger(__name__)
 
 
+# Campos obrigatórios validados em validate_product / process_columnar_batch
+REQUIRED_FIELDS = ['item_id', 'merchant_id', 'name']
+
+# Mapeamento de status do iFood/legado para o status normalizado
+STATUS_MAP = {
+    'AVAILABLE': 'AVAILABLE',
+    'UNAVAILABLE': 'UNAVAILABLE',
+    'ACTIVE': 'AVAILABLE',
+    'INACTIVE': 'UNAVAILABLE',
+    'ENABLED': 'AVAILABLE',
+    'DISABLED': 'UNAVAILABLE',
+    '1': 'AVAILABLE',
+    '0': 'UNAVAILABLE',
+    'true': 'AVAILABLE',
+    'false': 'UNAVAILABLE'
+}
+
+
 class ProductProcessor:
     """
     Classe para processar e dedupplicar produtos
@@ -138,10 +161,9 @@ class ProductProcessor:
         Returns:
             Tupla com (é válido, lista de erros)
         """
-        required_fields = ['item_id', 'merchant_id', 'name']
         errors = []
         
-        for field in required_fields:
+        for field in REQUIRED_FIELDS:
             if not product.get(field):
                 errors.append(f"Campo obrigatório ausente: {field}")
         
@@ -166,20 +188,7 @@ class ProductProcessor:
         Returns:
             Status normalizado
         """
-        status_map = {
-            'AVAILABLE': 'AVAILABLE',
-            'UNAVAILABLE': 'UNAVAILABLE',
-            'ACTIVE': 'AVAILABLE',
-            'INACTIVE': 'UNAVAILABLE',
-            'ENABLED': 'AVAILABLE',
-            'DISABLED': 'UNAVAILABLE',
-            '1': 'AVAILABLE',
-            '0': 'UNAVAILABLE',
-            'true': 'AVAILABLE',
-            'false': 'UNAVAILABLE'
-        }
-        
-        normalized = status_map.get(str(status).upper(), 'AVAILABLE')
+        normalized = STATUS_MAP.get(str(status).upper(), 'AVAILABLE')
         return normalized
     
     def batch_products(self, products: List[Dict], batch_size: int = 100) -> List[List[Dict]]:
@@ -284,4 +293,188 @@ class ProductProcessor:
         # Remover campos None
         db_product = {k: v for k, v in db_product.items() if v is not None}
         
-        return db_product
\ No newline at end of file
+        return db_product
+    
+    def to_columnar(self, products: List[Dict]) -> Dict[str, Any]:
+        """
+        Converte uma lista de produtos (formato da API ou do banco) em colunas
+        
+        Args:
+            products: Lista de produtos
+            
+        Returns:
+            Dicionário coluna -> numpy array (dtype object)
+        """
+        _require_numpy()
+        
+        def column(name: str, fallback: Optional[str] = None, default: Any = None):
+            if fallback:
+                values = [p.get(name, p.get(fallback, default)) for p in products]
+            else:
+                values = [p.get(name, default) for p in products]
+            array = np.empty(len(values), dtype=object)
+            array[:] = values
+            return array
+        
+        return {
+            'item_id': column('item_id', 'id'),
+            'name': column('name', default=''),
+            'description': column('description', default=''),
+            'merchant_id': column('merchant_id'),
+            'status': column('status', default='AVAILABLE'),
+            'price': column('price', default=0),
+            'imagePath': column('imagePath', default=''),
+            'product_id': column('productId', 'product_id', default='')
+        }
+    
+    def process_columnar_batch(self, batch: Dict[str, Any],
+                               additional_data: Dict = None) -> Tuple[Dict[str, Any], List[Dict]]:
+        """
+        Versão em lote de prepare_product_for_db + validate_product
+        
+        Normaliza status, extrai preços e valida campos obrigatórios e preços
+        com operações vetorizadas sobre colunas, produzindo o mesmo resultado
+        que o processamento linha a linha.
+        
+        Args:
+            batch: Colunas (ver to_columnar); 'price' pode ser numérico ou
+                   conter objetos {'value': ...} da API
+            additional_data: Valores escalares adicionados a todas as linhas
+            
+        Returns:
+            Tupla com (colunas das linhas válidas, relatório de erros). O
+            relatório tem um dict {'index', 'item_id', 'errors'} por linha
+            inválida, com as mesmas mensagens de validate_product. A coluna
+            'price' sai como float64 (NaN quando ausente).
+        """
+        _require_numpy()
+        
+        size = len(batch['item_id'])
+        columns = {
+            name: np.asarray(batch[name], dtype=object)
+            for name in ('item_id', 'name', 'merchant_id')
+        }
+        
+        # Status: normaliza apenas os valores distintos e espalha pelo índice
+        statuses = np.asarray(batch.get('status', np.full(size, 'AVAILABLE', dtype=object)))
+        distinct, inverse = np.unique(statuses.astype(str), return_inverse=True)
+        normalized = np.array(
+            [STATUS_MAP.get(value.upper(), 'AVAILABLE') for value in distinct],
+            dtype=object
+        )
+        is_active = normalized[inverse]
+        
+        prices, price_present, price_invalid = _extract_prices(batch.get('price'), size)
+        
+        # Validação: cada coluna obrigatória precisa ser "truthy"
+        missing = {
+            field: ~columns[field].astype(bool)
+            for field in REQUIRED_FIELDS
+        }
+        negative = price_present & ~price_invalid & (np.nan_to_num(prices) < 0)
+        invalid = price_invalid | negative
+        for mask in missing.values():
+            invalid = invalid | mask
+        
+        errors = []
+        for idx in np.flatnonzero(invalid):
+            row_errors = [
+                f"Campo obrigatório ausente: {field}"
+                for field in REQUIRED_FIELDS
+                if missing[field][idx]
+            ]
+            if price_invalid[idx]:
+                row_errors.append("Preço inválido")
+            elif negative[idx]:
+                row_errors.append("Preço não pode ser negativo")
+            errors.append({
+                'index': int(idx),
+                'item_id': columns['item_id'][idx],
+                'errors': row_errors
+            })
+        
+        valid = ~invalid
+        result = {
+            'item_id': columns['item_id'][valid],
+            'name': columns['name'][valid],
+            'description': np.asarray(batch.get('description', np.full(size, '', dtype=object)), dtype=object)[valid],
+            'merchant_id': columns['merchant_id'][valid],
+            'is_active': is_active[valid],
+            'price': prices[valid],
+            'imagePath': np.asarray(batch.get('imagePath', np.full(size, '', dtype=object)), dtype=object)[valid],
+            'product_id': np.asarray(batch.get('product_id', np.full(size, '', dtype=object)), dtype=object)[valid]
+        }
+        valid_count = int(valid.sum())
+        for key, value in (additional_data or {}).items():
+            result[key] = np.full(valid_count, value, dtype=object)
+        
+        logger.info(f"Lote colunar: {size} produtos -> {valid_count} válidos, {len(errors)} inválidos")
+        return result, errors
+    
+    def columnar_to_records(self, batch: Dict[str, Any]) -> List[Dict]:
+        """
+        Converte colunas de volta para linhas no formato de prepare_product_for_db
+        
+        Args:
+            batch: Colunas retornadas por process_columnar_batch
+            
+        Returns:
+            Lista de produtos sem campos None/NaN
+        """
+        _require_numpy()
+        
+        names = list(batch.keys())
+        prices = batch.get('price')
+        price_list = [None if v != v else v for v in prices.tolist()] if prices is not None else None
+        records = []
+        for values in zip(*(price_list if name == 'price' else batch[name].tolist() for name in names)):
+            records.append({k: v for k, v in zip(names, values) if v is not None})
+        return records
+
+
+def _require_numpy():
+    """Garante que o numpy está disponível para a API em lote"""
+    if np is None:
+        raise ImportError("numpy é necessário para o processamento em lote (pip install numpy)")
+
+
+def _extract_prices(column: Any, size: int) -> Tuple[Any, Any, Any]:
+    """
+    Extrai o preço numérico de uma coluna de preços
+    
+    Returns:
+        Tupla (preços float64, máscara de preço "truthy", máscara de preço inválido)
+    """
+    if column is None:
+        zeros = np.zeros(size, dtype=np.float64)
+        return zeros, np.zeros(size, dtype=bool), np.zeros(size, dtype=bool)
+    
+    values = np.asarray(column)
+    if values.dtype.kind in 'iuf':
+        prices = values.astype(np.float64)
+        present = prices != 0
+        return prices, present, np.zeros(size, dtype=bool)
+    
+    values = values.astype(object)
+    # Objetos de preço da API ({'value': ...}) são achatados em uma passada
+    has_dict = np.frompyfunc(lambda v: isinstance(v, dict), 1, 1)(values).astype(bool)
+    if has_dict.any():
+        values = values.copy()
+        values[has_dict] = [v.get('value', 0) for v in values[has_dict]]
+    
+    # Só preços "truthy" são convertidos/validados (igual a validate_product);
+    # None vira NaN e os demais valores falsy viram 0
+    present = values.astype(bool)
+    missing = np.frompyfunc(lambda v: v is None, 1, 1)(values).astype(bool)
+    prices = np.where(missing, np.nan, 0.0)
+    invalid = np.zeros(size, dtype=bool)
+    try:
+        prices[present] = values[present].astype(np.float64)
+    except (TypeError, ValueError):
+        for idx in np.flatnonzero(present):
+            try:
+                prices[idx] = float(values[idx])
+            except (TypeError, ValueError):
+                prices[idx] = np.nan
+                invalid[idx] = True
+    return prices, present, invalid
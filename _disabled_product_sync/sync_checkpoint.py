@@ -0,0 +1,99 @@
+"""
+Checkpoint do ciclo de sincronização
+
+Guarda em disco os merchants já concluídos no ciclo corrente. Se o processo
+for encerrado no meio de um ciclo (deploy, SIGTERM), o próximo processo
+retoma o mesmo ciclo pulando esses merchants, em vez de refazer as chamadas
+à API e as gravações no banco.
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class SyncCheckpoint:
+    """
+    Merchants concluídos no ciclo corrente, persistidos em um arquivo JSON
+    """
+
+    def __init__(self, path: str, max_age_seconds: float):
+        """
+        Args:
+            path: Arquivo do checkpoint
+            max_age_seconds: Idade máxima de um ciclo interrompido para ser
+                retomado (normalmente o intervalo de sincronização)
+        """
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self.cycle_started_at: Optional[float] = None
+        self.completed: Set[str] = set()
+
+    def begin_cycle(self) -> int:
+        """
+        Inicia um ciclo, retomando o checkpoint anterior se ainda for válido
+
+        Returns:
+            Número de merchants que serão pulados
+        """
+        self.cycle_started_at = time.time()
+        self.completed = set()
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Checkpoint ilegível, ignorando: {e}")
+            return 0
+
+        started_at = data.get('cycle_started_at') or 0
+        if self.cycle_started_at - started_at > self.max_age_seconds:
+            logger.info("🗑️ Checkpoint expirado, iniciando ciclo completo")
+            self.clear()
+            return 0
+
+        # Mantém o início original para que reinícios seguidos não
+        # estendam o mesmo ciclo indefinidamente
+        self.cycle_started_at = started_at
+        self.completed = set(data.get('completed_merchants', []))
+        if self.completed:
+            logger.info(f"♻️ Retomando ciclo interrompido: {len(self.completed)} merchants já concluídos")
+        return len(self.completed)
+
+    def is_done(self, merchant_id: str) -> bool:
+        return merchant_id in self.completed
+
+    def mark_done(self, merchant_id: str):
+        """Registra o merchant como concluído e persiste o checkpoint"""
+        self.completed.add(merchant_id)
+        self.save()
+
+    def save(self):
+        """Grava o checkpoint de forma atômica (arquivo temporário + replace)"""
+        data = {
+            'cycle_started_at': self.cycle_started_at,
+            'completed_merchants': sorted(self.completed),
+        }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"❌ Erro ao salvar checkpoint: {e}")
+
+    def clear(self):
+        """Remove o checkpoint (ciclo concluído por completo)"""
+        self.completed = set()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"❌ Erro ao remover checkpoint: {e}")
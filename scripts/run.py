@@ -10,6 +10,10 @@ Uso:
     python run.py --api-server              # Inicia servidor API
     python run.py --token-check             # Verifica tokens
     python run.py --merchant-status         # Verifica status das lojas
+    python run.py --jobs                    # Sincronização + renovação de tokens
+    python run.py --supervisor              # Sincronização + tokens + API em um processo
+    python run.py --events-poller           # Polling de eventos de pedidos
+    python run.py --profile [--simulate]    # Perfil de um ciclo de sincronização
 """
 
 import sys
@@ -18,18 +22,31 @@ import argparse
 import subprocess
 from pathlib import Path
 
+ROOT = Path(__file__).resolve().parent.parent
+
 # Adicionar src ao path
-sys.path.insert(0, str(Path(__file__).parent / "src"))
+sys.path.insert(0, str(ROOT / "src"))
+
 
-def run_api_server():
-    """Inicia servidor API"""
+def add_service_paths():
+    """Torna importáveis os módulos da sincronização e dos serviços Python"""
+    for path in ("src", "_disabled_product_sync", "services/python_services"):
+        path = str(ROOT / path)
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+def run_api_server(host, port):
+    """Inicia servidor API (services/python_services/api_server.py)"""
     print("🌐 Iniciando servidor API...")
+    add_service_paths()
     try:
-        from src.api_server import main
-        main()
-    except ImportError:
-        print("❌ Erro: Não foi possível importar o servidor API")
-        print("💡 Verifique se o arquivo api_server.py está na pasta src/")
+        import uvicorn
+        from api_server import app
+    except ImportError as e:
+        print(f"❌ Erro: Não foi possível importar o servidor API ({e})")
+        print("💡 Instale as dependências de services/python_services/requirements.txt")
+        return
+    uvicorn.run(app, host=host, port=port)
 
 def run_token_check():
     """Verifica status dos tokens"""
@@ -43,11 +60,154 @@ def run_token_check():
 def run_merchant_status():
     """Verifica status das lojas"""
     print("🏪 Verificando status das lojas...")
-    try:
-        from src.ifood_merchant_status_service import main
-        main()
-    except ImportError:
-        print("❌ Erro: Não foi possível importar o serviço de status")
+    # O serviço Python de status foi removido; o status das lojas é
+    # atendido pelo serviço Node (rotas /merchants/...)
+    print("❌ Não há serviço Python de status das lojas")
+    print("💡 Use o serviço Node em services/ifood-token-service (rotas /merchants/...)")
+
+def run_jobs():
+    """Executa a sincronização de produtos e a renovação de tokens em um único event loop"""
+    print("⏰ Iniciando jobs agendados (sincronização de produtos + renovação de tokens)...")
+    add_service_paths()
+
+    import asyncio
+    from config import Config
+    from job_scheduler import AsyncJobScheduler
+    from main import ProductSyncScheduler, setup_logging
+    from ifood_token_refresh_service import IFoodTokenRefreshService
+
+    setup_logging()
+    scheduler = AsyncJobScheduler()
+
+    product_sync = ProductSyncScheduler()
+    product_sync.scheduler = scheduler
+    product_sync.register_jobs(scheduler)
+
+    token_refresher = IFoodTokenRefreshService(
+        Config.SUPABASE_URL,
+        Config.SUPABASE_KEY
+    )
+    token_refresher.register_jobs(scheduler)
+
+    # SIGINT/SIGTERM (handlers do ProductSyncScheduler) drenam o ciclo em andamento
+    asyncio.run(scheduler.run())
+    product_sync.log_session_stats()
+
+def run_supervisor(host, port):
+    """
+    Executa sincronização de produtos, renovação de tokens e a API em um único processo
+    
+    Com EVENTS_POLLING_ENABLED, o polling de eventos de pedidos roda junto.
+    Os serviços rodam no mesmo event loop e compartilham a sessão HTTP
+    (pool de conexões com iFood e Supabase), o cliente Supabase, o cache de
+    tokens e o registro de métricas. Um serviço que falha é reiniciado sem
+    derrubar os outros.
+    """
+    print("🧭 Iniciando supervisor (sincronização + renovação de tokens + API)...")
+    add_service_paths()
+
+    import asyncio
+    import requests
+    import uvicorn
+    from requests.adapters import HTTPAdapter
+    from config import Config
+    from ifood_api_client import IFoodAPIClient
+    from main import ProductSyncScheduler, setup_logging
+    from metrics import start_metrics_server
+    from supabase_client import SupabaseClient
+    from supervisor import ServiceSupervisor
+    from events_poller import build_events_poller
+    from token_store import default_token_store
+    from ifood_token_refresh_service import IFoodTokenRefreshService
+    from api_server import app
+
+    class EmbeddedServer(uvicorn.Server):
+        """uvicorn sem handlers de sinal próprios: o supervisor cuida deles"""
+
+        def install_signal_handlers(self):
+            pass
+
+        def stop(self):
+            self.should_exit = True
+
+    setup_logging()
+    Config.validate()
+
+    # Recursos compartilhados: construídos uma vez e reaproveitados nos reinícios
+    refresh_workers = int(os.getenv('TOKEN_REFRESH_MAX_WORKERS', '16'))
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4,
+                          pool_maxsize=refresh_workers + Config.MAX_CONCURRENT_MERCHANTS)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    token_store = default_token_store()
+    supabase_client = SupabaseClient(url=Config.SUPABASE_URL, key=Config.SUPABASE_KEY)
+    ifood_client = IFoodAPIClient(
+        timeout=Config.IFOOD_API_TIMEOUT,
+        retry_attempts=Config.IFOOD_API_RETRY_ATTEMPTS,
+        session=session
+    )
+
+    supervisor = ServiceSupervisor()
+    supervisor.add('product_sync', lambda: ProductSyncScheduler(
+        supabase_client=supabase_client,
+        ifood_client=ifood_client,
+        token_store=token_store,
+        install_signal_handlers=False
+    ))
+    supervisor.add('token_refresh', lambda: IFoodTokenRefreshService(
+        Config.SUPABASE_URL,
+        Config.SUPABASE_KEY,
+        max_workers=refresh_workers,
+        token_store=token_store,
+        session=session
+    ))
+    supervisor.add('api', lambda: EmbeddedServer(uvicorn.Config(
+        app, host=host, port=port, log_config=None
+    )))
+    if Config.EVENTS_POLLING_ENABLED:
+        supervisor.add('events_polling', build_events_poller)
+
+    # /metrics da API e METRICS_PORT expõem o mesmo registro (todos os serviços)
+    if Config.METRICS_PORT:
+        start_metrics_server(Config.METRICS_PORT)
+
+    asyncio.run(supervisor.run())
+    for service in supervisor.services.values():
+        stats = service.stats()
+        print(f"   {stats['name']}: {stats['restarts']} reinícios"
+              + (f" (último erro: {stats['last_error']})" if stats['last_error'] else ""))
+
+def run_events_poller():
+    """Executa o polling de eventos de pedidos (ifood_events / ifood_polling_log)"""
+    print("📡 Iniciando polling de eventos de pedidos...")
+    add_service_paths()
+
+    import asyncio
+    from config import Config
+    from events_poller import build_events_poller
+    from main import setup_logging
+    from metrics import start_metrics_server
+    from supervisor import ServiceSupervisor
+
+    setup_logging()
+    Config.validate()
+    if Config.METRICS_PORT:
+        start_metrics_server(Config.METRICS_PORT)
+
+    # Supervisor com um único serviço: reinício após falhas e shutdown por sinal
+    supervisor = ServiceSupervisor()
+    supervisor.add('events_polling', build_events_poller)
+    asyncio.run(supervisor.run())
+
+def run_profile(extra_args):
+    """Perfila um ciclo de sincronização (argumentos repassados ao main da sincronização)"""
+    print("🔬 Perfilando um ciclo de sincronização...")
+    add_service_paths()
+
+    from main import main as sync_main
+    sync_main(["--profile", *extra_args])
 
 def show_status():
     """Mostra status geral do sistema"""
@@ -86,28 +246,52 @@ Exemplos de uso:
   python run.py --api-server        # Iniciar servidor API
   python run.py --token-check       # Verificar tokens
   python run.py --status            # Mostrar status geral
+  python run.py --profile --simulate --sim-items 200
         """
     )
 
     parser.add_argument("--api-server", action="store_true",
                        help="Iniciar servidor API")
+    parser.add_argument("--supervisor", action="store_true",
+                       help="Executar sincronização, renovação de tokens e API em um único processo")
+    parser.add_argument("--events-poller", action="store_true",
+                       help="Executar o polling de eventos de pedidos")
+    parser.add_argument("--host", default="0.0.0.0",
+                       help="Endereço da API (--api-server, --supervisor)")
+    parser.add_argument("--port", type=int, default=8000,
+                       help="Porta da API (--api-server, --supervisor)")
     parser.add_argument("--token-check", action="store_true",
                        help="Verificar status dos tokens")
     parser.add_argument("--merchant-status", action="store_true",
                        help="Verificar status das lojas")
     parser.add_argument("--status", action="store_true",
                        help="Mostrar status geral do sistema")
+    parser.add_argument("--jobs", action="store_true",
+                       help="Executar sincronização de produtos e renovação de tokens")
+    parser.add_argument("--profile", action="store_true",
+                       help="Perfilar um ciclo de sincronização (CPU + alocações); "
+                            "demais opções (--simulate, --profile-output...) vão para a sincronização")
     
-    args = parser.parse_args()
+    args, extra_args = parser.parse_known_args()
+    if extra_args and not args.profile:
+        parser.error(f"argumentos não reconhecidos: {' '.join(extra_args)}")
 
     if args.api_server:
-        run_api_server()
+        run_api_server(args.host, args.port)
+    elif args.supervisor:
+        run_supervisor(args.host, args.port)
+    elif args.events_poller:
+        run_events_poller()
     elif args.token_check:
         run_token_check()
     elif args.merchant_status:
         run_merchant_status()
     elif args.status:
         show_status()
+    elif args.jobs:
+        run_jobs()
+    elif args.profile:
+        run_profile(extra_args)
     else:
         print("🚀 iFood Integration Hub")
         print("=" * 50)
@@ -116,6 +300,7 @@ Exemplos de uso:
         print("🔧 Comandos principais:")
         print("  python run.py --status           # Status do sistema")
         print("  python run.py --token-check      # Verificar tokens")
+        print("  python run.py --supervisor       # Sincronização + tokens + API")
         print()
         print("📁 Estrutura do projeto:")
         print("  src/                 # Código Python")
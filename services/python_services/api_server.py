@@ -1,10 +1,38 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from ifood_token_service import IFoodTokenService
+from fastapi.responses import Response
+from pydantic import BaseModel, Field
+from ifood_token_service import AsyncIFoodTokenService, TokenRequest as ServiceTokenRequest
+from typing import List
+import logging
 import os
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
 from dotenv import load_dotenv
 
+# Shared modules (metrics) live in the repository's src/ directory
+_SRC_DIR = str(Path(__file__).resolve().parents[2] / "src")
+if _SRC_DIR not in sys.path:
+    sys.path.append(_SRC_DIR)
+
+from metrics import CONTENT_TYPE, REGISTRY
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'api_http_requests_total',
+    'HTTP requests handled by the token API by route and status code',
+    ['method', 'route', 'status']
+)
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    'api_http_request_duration_seconds',
+    'HTTP request latency of the token API by route',
+    ['method', 'route']
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
 # Load environment variables
 load_dotenv()
 
@@ -19,6 +47,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count and time every request (labelled by route template, not raw path)"""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get('route')
+        route_path = getattr(route, 'path', 'unmatched')
+        HTTP_REQUESTS.labels(request.method, route_path, str(status)).inc()
+        HTTP_REQUEST_DURATION.labels(request.method, route_path).observe(time.perf_counter() - started)
+
+@lru_cache(maxsize=1)
+def get_token_service() -> AsyncIFoodTokenService:
+    """
+    Process-wide AsyncIFoodTokenService
+
+    Built on first use and reused by every request, so the pooled HTTP
+    session and the in-memory token cache survive across calls. Upstream
+    calls are awaited, keeping the event loop free while iFood or Supabase
+    respond.
+    """
+    supabase_url = os.getenv('SUPABASE_URL')
+    supabase_key = os.getenv('SUPABASE_ANON_KEY')
+    
+    if not supabase_url or not supabase_key:
+        raise HTTPException(
+            status_code=500, 
+            detail="Missing Supabase configuration"
+        )
+    return AsyncIFoodTokenService(supabase_url, supabase_key)
+
+@app.on_event("shutdown")
+async def close_token_service():
+    """Close the pooled upstream connections"""
+    if get_token_service.cache_info().currsize:
+        await get_token_service().close()
+
 class TokenRequest(BaseModel):
     clientId: str
     clientSecret: str
@@ -31,19 +100,9 @@ async def create_token(request: TokenRequest):
     Replicates the N8N webhook functionality
     """
     try:
-        # Get Supabase configuration
-        supabase_url = os.getenv('SUPABASE_URL')
-        supabase_key = os.getenv('SUPABASE_ANON_KEY')
-        
-        if not supabase_url or not supabase_key:
-            raise HTTPException(
-                status_code=500, 
-                detail="Missing Supabase configuration"
-            )
-        
-        # Initialize service and process request
-        service = IFoodTokenService(supabase_url, supabase_key)
-        result = service.process_token_request(
+        # Shared service: cached tokens are answered without touching Supabase
+        service = get_token_service()
+        result = await service.process_token_request(
             request.clientId,
             request.clientSecret,
             request.user_id
@@ -65,11 +124,59 @@ async def create_token(request: TokenRequest):
             detail=f"Internal server error: {str(e)}"
         )
 
+class TokenBatchRequest(BaseModel):
+    tokens: List[TokenRequest] = Field(min_length=1, max_length=int(os.getenv('TOKEN_BATCH_MAX_SIZE', '500')))
+
+@app.post("/tokens/batch")
+async def create_tokens_batch(request: TokenBatchRequest):
+    """
+    Create or retrieve iFood access tokens for many credentials at once
+
+    Existing tokens are looked up in one Supabase query, missing ones are
+    generated concurrently and stored with one bulk upsert. Each entry gets
+    its own result, so partial failures don't fail the whole batch.
+    """
+    try:
+        service = get_token_service()
+        results = await service.process_batch([
+            ServiceTokenRequest(
+                client_id=entry.clientId,
+                client_secret=entry.clientSecret,
+                user_id=entry.user_id
+            )
+            for entry in request.tokens
+        ])
+
+        succeeded = sum(1 for result in results if result['success'])
+        return {
+            "success": succeeded == len(results),
+            "total": len(results),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "results": [
+                {"clientId": entry.clientId, **result}
+                for entry, result in zip(request.tokens, results)
+            ]
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error: {str(e)}"
+        )
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "ifood-token-service"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text-format metrics for this process"""
+    return Response(content=REGISTRY.render(), headers={"Content-Type": CONTENT_TYPE})
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
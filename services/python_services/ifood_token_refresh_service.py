@@ -1,12 +1,29 @@
 import requests
+from requests.adapters import HTTPAdapter
 import json
+import sys
 import time
-import schedule
+import asyncio
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from pathlib import Path
+from typing import Any, List, Dict, Optional
 import os
 from dataclasses import dataclass
 import logging
+from ifood_token_service import TOKEN_UPSERT_CONFLICT, parse_expires_at
+
+# Shared modules (job scheduler, metrics, models) live in the repository's src/ directory
+_SRC_DIR = str(Path(__file__).resolve().parents[2] / "src")
+if _SRC_DIR not in sys.path:
+    sys.path.append(_SRC_DIR)
+
+from ifood_models import OAuthToken
+from job_scheduler import AsyncJobScheduler
+from metrics import REGISTRY, start_metrics_server
+from token_store import PersistentTokenCache, default_token_store, token_version
 
 # Configure logging
 logging.basicConfig(
@@ -15,6 +32,37 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+TOKEN_REFRESHES = REGISTRY.counter(
+    'token_refresh_total',
+    'Token refresh attempts by result (success, api_error, db_error)',
+    ['result']
+)
+TOKEN_REFRESH_DURATION = REGISTRY.histogram(
+    'token_refresh_request_duration_seconds',
+    'Duration of a single iFood OAuth token request'
+)
+TOKEN_REFRESH_JOB_DURATION = REGISTRY.histogram(
+    'token_refresh_job_duration_seconds',
+    'Duration of a full refresh_all_tokens run',
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800)
+)
+TOKEN_REFRESH_LAST_RUN = REGISTRY.gauge(
+    'token_refresh_last_run_timestamp_seconds',
+    'Unix timestamp of the last completed refresh job'
+)
+TOKEN_REFRESH_QUEUE_SIZE = REGISTRY.gauge(
+    'token_refresh_queue_size',
+    'Tokens tracked by the expiry-driven refresh queue'
+)
+TOKEN_REFRESH_NEXT_DUE = REGISTRY.gauge(
+    'token_refresh_next_due_timestamp_seconds',
+    'Unix timestamp at which the next token is due for refresh'
+)
+TOKEN_REFRESH_FAILING = REGISTRY.gauge(
+    'token_refresh_failing_tokens',
+    'Tokens whose last expiry-driven refresh failed (retried with backoff)'
+)
+
 @dataclass
 class TokenRecord:
     """Data structure for token record from database"""
@@ -35,6 +83,35 @@ class RefreshResult:
     new_token: Optional[str] = None
     error: Optional[str] = None
     updated_at: Optional[str] = None
+    expires_at: Optional[int] = None  # Unix timestamp derived from expiresIn
+    duration: float = 0.0  # seconds spent on this token (rate-limit wait excluded)
+
+class PerClientRateLimiter:
+    """
+    Enforces a minimum interval between requests for the same client_id
+
+    Different client_ids never wait on each other, so the limiter does not
+    serialize the pool; it only spaces out repeated calls with one set of
+    credentials (duplicate rows, retries, overlapping jobs).
+    """
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_allowed: Dict[str, float] = {}
+
+    def acquire(self, client_id: str) -> float:
+        """Block until client_id may issue a request; returns seconds waited"""
+        if self.min_interval <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_allowed.get(client_id, 0.0))
+            self._next_allowed[client_id] = slot + self.min_interval
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+        return wait
 
 class IFoodTokenRefreshService:
     """
@@ -47,11 +124,32 @@ class IFoodTokenRefreshService:
     4. Update the token in the database
     """
     
-    IFOOD_TOKEN_URL = "https://merchant-api.ifood.com.br/authentication/v1.0/oauth/token"
+    # Overridable for the iFood sandbox or local stand-ins (load tests)
+    IFOOD_TOKEN_URL = os.getenv(
+        'IFOOD_TOKEN_URL', "https://merchant-api.ifood.com.br/authentication/v1.0/oauth/token"
+    )
     GRANT_TYPE = "client_credentials"
     
-    def __init__(self, supabase_url: str, supabase_key: str):
-        """Initialize the service with Supabase credentials"""
+    def __init__(self, supabase_url: str, supabase_key: str,
+                 max_workers: Optional[int] = None,
+                 min_interval_per_client: Optional[float] = None,
+                 token_store: Optional[PersistentTokenCache] = None,
+                 session: Optional[requests.Session] = None):
+        """
+        Initialize the service with Supabase credentials
+
+        Args:
+            supabase_url: Supabase project URL
+            supabase_key: Supabase API key
+            max_workers: Concurrent refreshes (env TOKEN_REFRESH_MAX_WORKERS, default 16);
+                1 refreshes sequentially
+            min_interval_per_client: Minimum seconds between iFood calls for the same
+                client_id (env TOKEN_REFRESH_MIN_INTERVAL_SECONDS, default 0.5)
+            token_store: Local token cache (defaults to the one configured by
+                TOKEN_CACHE_FILE, if any)
+            session: Pooled HTTP session shared with other components (the
+                supervisor); its pool should hold at least max_workers connections
+        """
         self.supabase_url = supabase_url
         self.supabase_key = supabase_key
         self.headers = {
@@ -59,43 +157,95 @@ class IFoodTokenRefreshService:
             "Authorization": f"Bearer {supabase_key}",
             "Content-Type": "application/json"
         }
+
+        if max_workers is None:
+            max_workers = int(os.getenv('TOKEN_REFRESH_MAX_WORKERS', '16'))
+        if min_interval_per_client is None:
+            min_interval_per_client = float(os.getenv('TOKEN_REFRESH_MIN_INTERVAL_SECONDS', '0.5'))
+        self.max_workers = max(1, max_workers)
+        self.rate_limiter = PerClientRateLimiter(min_interval_per_client)
+        self.writeback_chunk_size = int(os.getenv('TOKEN_WRITEBACK_CHUNK_SIZE', '500'))
+        self.token_store = token_store if token_store is not None else default_token_store()
+
+        self.scheduler: Optional[AsyncJobScheduler] = None
+
+        # One pooled session shared by all workers (keep-alive to iFood and Supabase)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
     
     def get_all_tokens(self) -> List[TokenRecord]:
         """
         Get all tokens from ifood_tokens table
         Replicates: "Get many rows" node
+
+        With a local token store only the versions are listed; full rows are
+        fetched just for the tokens that changed since the last load. If the
+        database is unreachable the stored rows are used as-is.
         """
         try:
             logger.info("📊 Fetching all tokens from database...")
+            if self.token_store is not None:
+                tokens_data = self._load_tokens_via_store()
+            else:
+                tokens_data = self._fetch_token_rows()
+            logger.info(f"✅ Found {len(tokens_data)} tokens in database")
             
-            response = requests.get(
+        except Exception as e:
+            logger.error(f"❌ Error fetching tokens from database: {str(e)}")
+            if self.token_store is None:
+                return []
+            tokens_data = list(self.token_store.get_many().values())
+            logger.warning(f"⚠️ Using {len(tokens_data)} tokens from the local token cache")
+
+        tokens = []
+        for token_data in tokens_data:
+            tokens.append(TokenRecord(
+                id=token_data['id'],
+                client_id=token_data['client_id'],
+                client_secret=token_data['client_secret'],
+                access_token=token_data['access_token'],
+                expires_at=token_data['expires_at'],
+                user_id=token_data['user_id'],
+                created_at=token_data.get('created_at', ''),
+                updated_at=token_data.get('token_updated_at', '')
+            ))
+        
+        return tokens
+
+    def _fetch_token_rows(self, ids: Optional[List[str]] = None,
+                          select: str = "*") -> List[Dict]:
+        """Rows of ifood_tokens (all of them, or the given ids in chunks)"""
+        if ids is None:
+            batches = [None]
+        else:
+            batches = [ids[start:start + 100] for start in range(0, len(ids), 100)]
+
+        rows = []
+        for batch in batches:
+            params = {"select": select}
+            if batch is not None:
+                quoted = ','.join('"' + str(row_id).replace('"', '\\"') + '"' for row_id in batch)
+                params["id"] = f"in.({quoted})"
+            response = self.session.get(
                 f"{self.supabase_url}/rest/v1/ifood_tokens",
                 headers=self.headers,
-                params={"select": "*"}
+                params=params
             )
             response.raise_for_status()
-            
-            tokens_data = response.json()
-            logger.info(f"✅ Found {len(tokens_data)} tokens in database")
-            
-            tokens = []
-            for token_data in tokens_data:
-                tokens.append(TokenRecord(
-                    id=token_data['id'],
-                    client_id=token_data['client_id'],
-                    client_secret=token_data['client_secret'],
-                    access_token=token_data['access_token'],
-                    expires_at=token_data['expires_at'],
-                    user_id=token_data['user_id'],
-                    created_at=token_data.get('created_at', ''),
-                    updated_at=token_data.get('token_updated_at', '')
-                ))
-            
-            return tokens
-            
-        except Exception as e:
-            logger.error(f"❌ Error fetching tokens from database: {str(e)}")
-            return []
+            rows.extend(response.json())
+        return rows
+
+    def _load_tokens_via_store(self) -> List[Dict]:
+        # Keyed by id: several users can share one client_id
+        versions = {
+            row['id']: token_version(row)
+            for row in self._fetch_token_rows(select="id,token_updated_at,updated_at")
+        }
+        return self.token_store.reconcile(versions, self._fetch_token_rows)
     
     def refresh_single_token(self, token: TokenRecord) -> RefreshResult:
         """
@@ -119,15 +269,19 @@ class IFoodTokenRefreshService:
             }
             
             # Make request to iFood API
-            response = requests.post(
-                self.IFOOD_TOKEN_URL,
-                headers=ifood_headers,
-                data=token_data
-            )
+            started = time.perf_counter()
+            try:
+                response = self.session.post(
+                    self.IFOOD_TOKEN_URL,
+                    headers=ifood_headers,
+                    data=token_data
+                )
+            finally:
+                TOKEN_REFRESH_DURATION.observe(time.perf_counter() - started)
             
             if response.status_code == 200:
-                api_response = response.json()
-                new_access_token = api_response['accessToken']
+                payload = OAuthToken.model_validate_json(response.content)
+                new_access_token = payload.access_token
                 updated_at = datetime.now().isoformat()
                 
                 logger.info(f"✅ New token generated for {token.client_id[:8]}")
@@ -135,7 +289,8 @@ class IFoodTokenRefreshService:
                     success=True,
                     client_id=token.client_id,
                     new_token=new_access_token,
-                    updated_at=updated_at
+                    updated_at=updated_at,
+                    expires_at=int(time.time()) + payload.expires_in
                 )
             else:
                 error_msg = f"iFood API error: {response.status_code} - {response.text}"
@@ -155,10 +310,13 @@ class IFoodTokenRefreshService:
                 error=error_msg
             )
     
-    def update_token_in_database(self, result: RefreshResult) -> bool:
+    def update_token_in_database(self, token: TokenRecord, result: RefreshResult) -> bool:
         """
         Update token in database
         Replicates: "Atualiza Token de Acesso" node
+
+        The row is matched on its id: client_id is not unique, and a PATCH
+        by client_id would give every user of the app this user's token.
         """
         if not result.success:
             return False
@@ -171,12 +329,14 @@ class IFoodTokenRefreshService:
                 "access_token": result.new_token,
                 "token_updated_at": result.updated_at
             }
+            if result.expires_at is not None:
+                update_data["expires_at"] = result.expires_at
             
             # Update token in Supabase
-            response = requests.patch(
+            response = self.session.patch(
                 f"{self.supabase_url}/rest/v1/ifood_tokens",
                 headers=self.headers,
-                params={"client_id": f"eq.{result.client_id}"},
+                params={"id": f"eq.{token.id}"},
                 json=update_data
             )
             
@@ -191,18 +351,143 @@ class IFoodTokenRefreshService:
             logger.error(f"❌ Error updating token in database: {str(e)}")
             return False
     
-    def refresh_all_tokens(self) -> Dict[str, int]:
+    def write_back_tokens(self, tokens: List[TokenRecord], results: List[RefreshResult]) -> int:
+        """
+        Write refreshed tokens back with chunked bulk upserts on id
+
+        Rows are matched on the primary key every TokenRecord carries
+        (client_id has no unique constraint in ifood_tokens). One POST per
+        chunk (Prefer: resolution=merge-duplicates) instead of one PATCH per
+        token. Full rows are sent because PostgREST runs the
+        upsert as INSERT ... ON CONFLICT, which checks NOT NULL columns before
+        resolving the conflict. If a chunk is rejected, its rows fall back to
+        individual PATCHes so one bad row fails alone.
+
+        Args:
+            tokens: Token records, aligned with results
+            results: Refresh results; failed writes are flagged in place
+
+        Returns:
+            Number of tokens written
+        """
+        pending = [(token, result) for token, result in zip(tokens, results) if result.success]
+        if not pending:
+            return 0
+
+        written = 0
+        stored_rows = []
+        headers = {**self.headers, "Prefer": "resolution=merge-duplicates,return=minimal"}
+        for start in range(0, len(pending), self.writeback_chunk_size):
+            chunk = pending[start:start + self.writeback_chunk_size]
+            rows = [
+                {
+                    "id": token.id,
+                    "client_id": token.client_id,
+                    "client_secret": token.client_secret,
+                    "user_id": token.user_id,
+                    "access_token": result.new_token,
+                    "expires_at": result.expires_at,
+                    "token_updated_at": result.updated_at,
+                }
+                for token, result in chunk
+            ]
+
+            try:
+                response = self.session.post(
+                    f"{self.supabase_url}/rest/v1/ifood_tokens",
+                    headers=headers,
+                    params={"on_conflict": TOKEN_UPSERT_CONFLICT},
+                    json=rows
+                )
+                bulk_ok = response.status_code in [200, 201, 204]
+                if not bulk_ok:
+                    logger.error(f"❌ Bulk token upsert failed: {response.status_code} - {response.text}")
+            except Exception as e:
+                bulk_ok = False
+                logger.error(f"❌ Bulk token upsert failed: {str(e)}")
+
+            if bulk_ok:
+                logger.info(f"💾 {len(chunk)} tokens written back in one upsert")
+                written += len(chunk)
+                stored_rows.extend(rows)
+                continue
+
+            # Per-row fallback isolates the rows the database rejects
+            logger.warning(f"⚠️ Falling back to per-token updates for {len(chunk)} tokens")
+            for row, (token, result) in zip(rows, chunk):
+                if self.update_token_in_database(token, result):
+                    written += 1
+                    stored_rows.append(row)
+                else:
+                    result.success = False
+                    result.error = "Database update failed"
+
+        if self.token_store is not None:
+            # Other processes sharing the cache pick up the new tokens without
+            # querying; the next load re-fetches them once to get updated_at
+            self.token_store.put_many(stored_rows)
+
+        return written
+
+    def refresh_one(self, token: TokenRecord) -> RefreshResult:
+        """
+        Refresh one token via iFood (the unit of work of the pool)
+
+        The per-client_id rate limit is applied before the iFood call and is
+        not counted in the recorded duration.
+        """
+        self.rate_limiter.acquire(token.client_id)
+        started = time.perf_counter()
+        result = self.refresh_single_token(token)
+        result.duration = time.perf_counter() - started
+        return result
+
+    def refresh_tokens(self, tokens: List[TokenRecord]) -> List[RefreshResult]:
+        """
+        Refresh tokens concurrently on a bounded worker pool, then write all
+        successful results back in bulk
+
+        Returns:
+            One RefreshResult per token, in the input order
+        """
+        if not tokens:
+            return []
+
+        workers = min(self.max_workers, len(tokens))
+        if workers == 1:
+            results = [self.refresh_one(token) for token in tokens]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="token-refresh") as pool:
+                results = list(pool.map(self.refresh_one, tokens))
+
+        refreshed = {result.client_id for result in results if result.success}
+        self.write_back_tokens(tokens, results)
+
+        for result in results:
+            if result.success:
+                TOKEN_REFRESHES.labels('success').inc()
+            elif result.client_id in refreshed:
+                TOKEN_REFRESHES.labels('db_error').inc()
+            else:
+                TOKEN_REFRESHES.labels('api_error').inc()
+        return results
+
+    def refresh_all_tokens(self) -> Dict[str, Any]:
         """
         Main method to refresh all tokens
-        Replicates the complete N8N workflow
+        Replicates the complete N8N workflow, refreshing tokens concurrently
         """
         logger.info("🚀 Starting token refresh job...")
+        job_started = time.perf_counter()
         
         # Statistics
         stats = {
             "total": 0,
             "successful": 0,
-            "failed": 0
+            "failed": 0,
+            "duration_seconds": 0.0,
+            "slowest_seconds": 0.0,
+            "errors": []
         }
         
         try:
@@ -214,30 +499,31 @@ class IFoodTokenRefreshService:
                 logger.info("📭 No tokens found in database")
                 return stats
             
-            # Step 2: Refresh each token
-            for token in tokens:
-                logger.info(f"Processing token {stats['successful'] + stats['failed'] + 1}/{stats['total']}")
-                
-                # Step 2a: Refresh token via iFood API
-                refresh_result = self.refresh_single_token(token)
-                
-                if refresh_result.success:
-                    # Step 2b: Update token in database
-                    if self.update_token_in_database(refresh_result):
-                        stats["successful"] += 1
-                    else:
-                        stats["failed"] += 1
+            # Step 2: Refresh every token (iFood API + database update) on the pool
+            logger.info(f"⚡ Refreshing {len(tokens)} tokens with up to "
+                        f"{min(self.max_workers, len(tokens))} workers")
+            results = self.refresh_tokens(tokens)
+            
+            for result in results:
+                if result.success:
+                    stats["successful"] += 1
                 else:
                     stats["failed"] += 1
-                
-                # Small delay between requests to respect rate limits
-                time.sleep(0.5)
+                    stats["errors"].append({"client_id": result.client_id, "error": result.error})
+                logger.debug(f"⏱️ {result.client_id[:8]}: {result.duration * 1000:.0f}ms "
+                             f"({'ok' if result.success else result.error})")
+            stats["slowest_seconds"] = max(result.duration for result in results)
             
             # Final statistics
+            stats["duration_seconds"] = time.perf_counter() - job_started
             logger.info("📊 Token refresh job completed:")
             logger.info(f"  Total tokens: {stats['total']}")
             logger.info(f"  Successful: {stats['successful']}")
             logger.info(f"  Failed: {stats['failed']}")
+            logger.info(f"  Job time: {stats['duration_seconds']:.2f}s "
+                        f"(slowest token: {stats['slowest_seconds']:.2f}s)")
+            for error in stats["errors"]:
+                logger.warning(f"  ❌ {error['client_id'][:8]}: {error['error']}")
             
             return stats
             
@@ -245,32 +531,215 @@ class IFoodTokenRefreshService:
             logger.error(f"❌ Error in refresh job: {str(e)}")
             stats["failed"] = stats["total"]
             return stats
+        finally:
+            TOKEN_REFRESH_JOB_DURATION.observe(time.perf_counter() - job_started)
+            TOKEN_REFRESH_LAST_RUN.set(time.time())
     
+    def register_jobs(self, scheduler: AsyncJobScheduler, interval_hours: float = 2,
+                      jitter_seconds: Optional[float] = None, mode: Optional[str] = None):
+        """
+        Register the refresh job on a (possibly shared) scheduler
+
+        mode (env TOKEN_REFRESH_MODE):
+        - 'expiry' (default): ExpiryRefreshQueue refreshes each token a margin
+          before it expires and sleeps until the next one is due
+        - 'interval': refresh every token every interval_hours; runs are
+          single-flight, missed runs are skipped, and a random jitter spreads
+          instances across the interval instead of all firing at :50
+        """
+        mode = mode or os.getenv('TOKEN_REFRESH_MODE', 'expiry')
+        if mode == 'expiry':
+            self.expiry_queue = ExpiryRefreshQueue(self)
+            scheduler.add_job(
+                'token_refresh',
+                self.expiry_queue.run_due,
+                interval=self.expiry_queue.reload_interval,
+                deadline=self.expiry_queue.margin
+            )
+            return
+
+        if jitter_seconds is None:
+            jitter_seconds = float(os.getenv('TOKEN_REFRESH_JITTER_SECONDS', '300'))
+
+        interval = interval_hours * 3600
+        scheduler.add_job(
+            'token_refresh',
+            self.refresh_all_tokens,
+            interval=interval,
+            jitter=jitter_seconds,
+            deadline=interval / 4
+        )
+
     def start_scheduler(self):
         """
         Start the scheduled token refresh service
-        Replicates: Schedule Trigger (every 2 hours at minute 50)
+        Replicates: Schedule Trigger (every 2 hours), with jitter
         """
         logger.info("⏰ Starting iFood Token Refresh Scheduler...")
-        logger.info("📅 Schedule: Every 2 hours at minute 50")
-        
-        # Schedule job every 2 hours at minute 50
-        # This replicates the N8N schedule exactly
-        schedule.every(2).hours.at(":50").do(self.refresh_all_tokens)
-        
-        # Also run immediately for testing (optional)
-        logger.info("🧪 Running initial refresh job...")
-        self.refresh_all_tokens()
-        
+        if os.getenv('TOKEN_REFRESH_MODE', 'expiry') == 'expiry':
+            logger.info("📅 Schedule: each token shortly before it expires")
+        else:
+            logger.info("📅 Schedule: Every 2 hours (initial run on startup, with jitter)")
+
+        # Same setting (and default) as the sync services
+        from config import Config
+        if Config.METRICS_PORT:
+            start_metrics_server(Config.METRICS_PORT)
+
         logger.info("🔄 Scheduler started. Press Ctrl+C to stop.")
-        
+
         try:
-            while True:
-                schedule.run_pending()
-                time.sleep(60)  # Check every minute
+            asyncio.run(self.serve())
         except KeyboardInterrupt:
             logger.info("🛑 Scheduler stopped by user")
 
+    async def serve(self):
+        """Run the refresh job on the current event loop until stop() is called"""
+        self.scheduler = AsyncJobScheduler()
+        self.register_jobs(self.scheduler)
+        await self.scheduler.run()
+
+    def stop(self):
+        """Stop scheduling refreshes; a refresh in progress finishes first"""
+        if self.scheduler is not None:
+            self.scheduler.stop()
+
+class ExpiryRefreshQueue:
+    """
+    Expiry-driven refresh: a min-heap of tokens ordered by refresh time
+
+    Each token is refreshed `margin` seconds before its expires_at; the new
+    expiry (from expiresIn) is written back and the token is pushed again.
+    run_due() returns the delay until the next due token, which the
+    AsyncJobScheduler uses as the next sleep. The table is re-read every
+    reload_interval to pick up new, removed or externally refreshed tokens;
+    a reload that fails or comes back empty keeps the current heap and is
+    retried after retry_delay.
+
+    Rows are tracked by id, since several users can share one client_id.
+    A failed refresh is retried with exponential backoff (retry_delay,
+    doubling, capped at the margin); the attempt count survives reloads
+    and is reset by a success or a new client_secret.
+    """
+
+    def __init__(self, service: 'IFoodTokenRefreshService',
+                 margin_seconds: Optional[float] = None,
+                 reload_interval: Optional[float] = None,
+                 retry_delay: Optional[float] = None):
+        """
+        Args:
+            service: Refresh service used for DB access and the concurrent refresh
+            margin_seconds: Refresh this long before expiry (env TOKEN_REFRESH_MARGIN_SECONDS, default 900)
+            reload_interval: Seconds between table reloads (env TOKEN_REFRESH_RELOAD_SECONDS, default 600)
+            retry_delay: First delay before retrying a failed refresh, doubled on each
+                further failure (env TOKEN_REFRESH_RETRY_SECONDS, default 60)
+        """
+        self.service = service
+        self.margin = margin_seconds if margin_seconds is not None else \
+            float(os.getenv('TOKEN_REFRESH_MARGIN_SECONDS', '900'))
+        self.reload_interval = reload_interval if reload_interval is not None else \
+            float(os.getenv('TOKEN_REFRESH_RELOAD_SECONDS', '600'))
+        self.retry_delay = retry_delay if retry_delay is not None else \
+            float(os.getenv('TOKEN_REFRESH_RETRY_SECONDS', '60'))
+
+        self._heap: List[tuple] = []  # (refresh_at, token id)
+        self._tokens: Dict[str, TokenRecord] = {}
+        self._failures: Dict[str, tuple] = {}  # token id -> (attempts, retry_at, client_secret)
+        self._next_reload = 0.0
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def load(self, tokens: List[TokenRecord]):
+        """Rebuild the heap from the current table contents"""
+        self._tokens = {str(token.id): token for token in tokens}
+        # Tokens still backing off keep their retry time; a new secret starts over
+        self._failures = {
+            token_id: failure for token_id, failure in self._failures.items()
+            if token_id in self._tokens and self._tokens[token_id].client_secret == failure[2]
+        }
+        self._heap = []
+        for token_id, token in self._tokens.items():
+            refresh_at = parse_expires_at(token.expires_at) - self.margin
+            if token_id in self._failures:
+                refresh_at = max(refresh_at, self._failures[token_id][1])
+            self._heap.append((refresh_at, token_id))
+        heapq.heapify(self._heap)
+        self._update_gauges()
+
+    def push(self, token_id: str, refresh_at: float):
+        heapq.heappush(self._heap, (refresh_at, token_id))
+
+    def pop_due(self, now: float) -> List[TokenRecord]:
+        """Remove and return every token whose refresh time has passed"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, token_id = heapq.heappop(self._heap)
+            token = self._tokens.get(token_id)
+            if token is not None:
+                due.append(token)
+        return due
+
+    def retry_in(self, attempts: int) -> float:
+        """Backoff before the next try after `attempts` consecutive failures"""
+        return min(self.retry_delay * 2 ** (attempts - 1), self.margin)
+
+    def next_due_at(self) -> Optional[float]:
+        return self._heap[0][0] if self._heap else None
+
+    def run_due(self) -> float:
+        """
+        Refresh the tokens that are due and reschedule them
+
+        Returns:
+            Seconds until the next token is due (or the next table reload)
+        """
+        now = time.time()
+        if now >= self._next_reload:
+            tokens = self.service.get_all_tokens()
+            if tokens or not self._tokens:
+                self.load(tokens)
+                self._next_reload = now + self.reload_interval
+            else:
+                # get_all_tokens() returns [] on errors too: dropping the heap
+                # would stop every refresh until the next reload
+                logger.warning(f"⚠️ Token reload returned no rows, keeping {len(self)} "
+                               f"tracked tokens and retrying in {self.retry_delay:.0f}s")
+                self._next_reload = now + self.retry_delay
+
+        due = self.pop_due(now)
+        if due:
+            logger.info(f"🔄 {len(due)} tokens due for refresh ({len(self)} tracked)")
+            for token, result in zip(due, self.service.refresh_tokens(due)):
+                token_id = str(token.id)
+                if result.success and result.expires_at is not None:
+                    token.access_token = result.new_token
+                    token.expires_at = result.expires_at
+                    self._failures.pop(token_id, None)
+                    self.push(token_id, result.expires_at - self.margin)
+                else:
+                    attempts = self._failures.get(token_id, (0,))[0] + 1
+                    delay = self.retry_in(attempts)
+                    retry_at = time.time() + delay
+                    self._failures[token_id] = (attempts, retry_at, token.client_secret)
+                    log = logger.error if attempts >= 3 else logger.warning
+                    log(f"⚠️ Refresh failed for {token.client_id[:8]} (user {token.user_id}), "
+                        f"attempt {attempts}, retrying in {delay:.0f}s: {result.error}")
+                    self.push(token_id, retry_at)
+            TOKEN_REFRESH_LAST_RUN.set(time.time())
+
+        self._update_gauges()
+        next_due = self.next_due_at()
+        wake_at = self._next_reload if next_due is None else min(next_due, self._next_reload)
+        return max(1.0, wake_at - time.time())
+
+    def _update_gauges(self):
+        TOKEN_REFRESH_QUEUE_SIZE.set(len(self._tokens))
+        TOKEN_REFRESH_FAILING.set(len(self._failures))
+        next_due = self.next_due_at()
+        if next_due is not None:
+            TOKEN_REFRESH_NEXT_DUE.set(next_due)
+
 def run_refresh_service():
     """Run the token refresh service"""
     try:
@@ -1,15 +1,39 @@
-import requests
 import json
+import sys
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Dict, Optional, Tuple
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
 import os
 from dataclasses import dataclass
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Shared modules (metrics, models) live in the repository's src/ directory
+_SRC_DIR = str(Path(__file__).resolve().parents[2] / "src")
+if _SRC_DIR not in sys.path:
+    sys.path.append(_SRC_DIR)
+
+from ifood_models import OAuthToken
+from metrics import REGISTRY
+from token_store import PersistentTokenCache, default_token_store, parse_expires_at
+
+# Logging is configured by the entry point (api_server, __main__, Lambda runtime);
+# this module is also imported by the refresher and must not reconfigure it.
+# requests, aiohttp and asyncio are imported where they are first needed, so
+# each entry point only loads the HTTP stack it actually uses.
 logger = logging.getLogger(__name__)
 
+TOKEN_CACHE_LOOKUPS = REGISTRY.counter(
+    'token_cache_lookups_total',
+    'Token cache lookups by result (hit, disk_hit, miss)',
+    ['result']
+)
+TOKEN_REQUESTS_COALESCED = REGISTRY.counter(
+    'token_requests_coalesced_total',
+    'Token requests answered by joining an in-flight generation for the same client'
+)
+
 @dataclass
 class TokenRequest:
     """Data structure for token request"""
@@ -17,6 +41,141 @@ class TokenRequest:
     client_secret: str
     user_id: str
 
+class TokenCache:
+    """
+    Process-wide cache of valid tokens keyed by client_id
+
+    Entries are served until `margin_seconds` before their expires_at, so a
+    cached token is never handed out right as it expires. Memory misses fall
+    back to the optional on-disk store (TOKEN_CACHE_FILE), which survives
+    restarts and is shared with the refresher and the product sync.
+
+    Hits, from memory or disk, are only checked against expires_at, not
+    against the row version in the database. The disk store is kept current
+    by the Python writers (store_token here, the refresher's write-back) and
+    reconciled with the database on every refresher load; a row replaced by
+    another writer (e.g. the Node token service) can still be served until
+    that reconcile or until the token expires.
+
+    Async callers use aget/aget_many/aput_many, which run the disk store
+    (SQLite and Fernet) in a worker thread instead of on the event loop.
+    """
+
+    _DEFAULT_STORE = object()
+
+    def __init__(self, margin_seconds: float = 300, store=_DEFAULT_STORE):
+        """
+        Args:
+            margin_seconds: Stop serving a token this long before it expires
+            store: PersistentTokenCache, None to disable it, or omitted to use
+                the process store configured by TOKEN_CACHE_FILE (resolved on
+                first use, after the entry point has loaded its .env)
+        """
+        self.margin_seconds = margin_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[float, Dict]] = {}
+        self._store = store
+
+    @property
+    def store(self) -> Optional[PersistentTokenCache]:
+        if self._store is TokenCache._DEFAULT_STORE:
+            self._store = default_token_store()
+        return self._store
+
+    def get(self, client_id: str) -> Optional[Dict]:
+        """Cached token for client_id, or None if absent or about to expire"""
+        token = self._memory_get(client_id)
+        return token if token is not None else self._disk_get(client_id)
+
+    async def aget(self, client_id: str) -> Optional[Dict]:
+        """get() for async callers: the disk fallback runs in a worker thread"""
+        return (await self.aget_many([client_id])).get(client_id)
+
+    async def aget_many(self, client_ids: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Cached tokens by client_id, for async callers
+
+        Memory hits are answered inline; the misses go to the disk store
+        (SQLite + decryption) in a single worker-thread call, so the event
+        loop is never blocked on disk.
+        """
+        found, misses = {}, []
+        for client_id in client_ids:
+            token = self._memory_get(client_id)
+            if token is not None:
+                found[client_id] = token
+            else:
+                misses.append(client_id)
+        if misses:
+            import asyncio
+            disk = await asyncio.to_thread(
+                lambda: {client_id: self._disk_get(client_id) for client_id in misses}
+            )
+            found.update((client_id, token) for client_id, token in disk.items()
+                         if token is not None)
+        return found
+
+    def _memory_get(self, client_id: str) -> Optional[Dict]:
+        entry = self._entries.get(client_id)
+        if entry is not None and time.time() < entry[0]:
+            TOKEN_CACHE_LOOKUPS.labels('hit').inc()
+            return entry[1]
+        if entry is not None:
+            self.invalidate(client_id)
+        return None
+
+    def _disk_get(self, client_id: str) -> Optional[Dict]:
+        store = self.store
+        if store is not None:
+            token = store.get_for_client(client_id)
+            if token is not None and self._remember(client_id, token):
+                TOKEN_CACHE_LOOKUPS.labels('disk_hit').inc()
+                return token
+
+        TOKEN_CACHE_LOOKUPS.labels('miss').inc()
+        return None
+
+    def _remember(self, client_id: str, token: Dict) -> bool:
+        valid_until = parse_expires_at(token.get('expires_at')) - self.margin_seconds
+        if valid_until <= time.time():
+            return False
+        with self._lock:
+            self._entries[client_id] = (valid_until, token)
+        return True
+
+    def put(self, client_id: str, token: Dict):
+        """
+        Cache a token row (ignored if it is already inside the margin)
+
+        Only rows carrying their ifood_tokens id reach the disk store, which
+        is keyed by id since client_id is not unique.
+        """
+        if self._remember(client_id, token) and self.store is not None and token.get("id"):
+            self.store.put({**token, "client_id": client_id})
+
+    async def aput_many(self, tokens: Dict[str, Dict]):
+        """put() for async callers: one disk write, in a worker thread"""
+        rows = [{**token, "client_id": client_id} for client_id, token in tokens.items()
+                if self._remember(client_id, token) and token.get("id")]
+        if rows and self.store is not None:
+            import asyncio
+            await asyncio.to_thread(self.store.put_many, rows)
+
+    def invalidate(self, client_id: str):
+        with self._lock:
+            self._entries.pop(client_id, None)
+
+    def clear(self):
+        """Drop the in-memory entries (the on-disk store is kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# Shared by every IFoodTokenService in the process
+TOKEN_CACHE = TokenCache(float(os.getenv('TOKEN_CACHE_MARGIN_SECONDS', '300')))
+
 @dataclass
 class TokenResponse:
     """Data structure for token response"""
@@ -24,6 +183,61 @@ class TokenResponse:
     expires_in: int
     created_at: datetime
     expires_at: datetime
+
+def token_data_from_payload(payload: OAuthToken) -> Dict:
+    """Token data returned by generate_token for a validated OAuth payload"""
+    created_at = datetime.now()
+    token_response = TokenResponse(
+        access_token=payload.access_token,
+        expires_in=payload.expires_in,
+        created_at=created_at,
+        expires_at=created_at + timedelta(seconds=payload.expires_in)
+    )
+    return {
+        "access_token": token_response.access_token,
+        "expires_in": token_response.expires_in,
+        "created_at": token_response.created_at.isoformat(),
+        "expires_at": token_response.expires_at.isoformat()
+    }
+
+def token_row(request: TokenRequest, token_data: Dict) -> Dict:
+    """
+    ifood_tokens row for a freshly generated token
+
+    expires_at is written as epoch seconds (the column is a BIGINT), and
+    created_at is left to the column default so an update keeps the
+    original value.
+    """
+    return {
+        "client_id": request.client_id,
+        "client_secret": request.client_secret,
+        "access_token": token_data["access_token"],
+        "expires_at": int(parse_expires_at(token_data["expires_at"])),
+        "user_id": request.user_id,
+        "token_updated_at": datetime.now().isoformat()
+    }
+
+def token_response_data(row: Dict, token_data: Dict) -> Dict:
+    """
+    `data` returned for a freshly stored token
+
+    Keeps the original response contract: expires_at and created_at are the
+    ISO strings from generate_token, not the epoch stored in the database.
+    """
+    return {
+        "client_id": row["client_id"],
+        "client_secret": row["client_secret"],
+        "access_token": row["access_token"],
+        "expires_at": token_data["expires_at"],
+        "created_at": token_data["created_at"],
+        "user_id": row["user_id"],
+        "updated_at": row["token_updated_at"]
+    }
+
+# ifood_tokens is only unique on id and user_id (no constraint on client_id),
+# so tokens are matched by client_id with a select and bulk writes upsert on
+# the primary key of the rows found
+TOKEN_UPSERT_CONFLICT = "id"
     
 class IFoodTokenService:
     """
@@ -35,11 +249,24 @@ class IFoodTokenService:
     - Handles token validation and refresh
     """
     
-    IFOOD_TOKEN_URL = "https://merchant-api.ifood.com.br/authentication/v1.0/oauth/token"
+    # Overridable for the iFood sandbox or local stand-ins (load tests)
+    IFOOD_TOKEN_URL = os.getenv(
+        'IFOOD_TOKEN_URL', "https://merchant-api.ifood.com.br/authentication/v1.0/oauth/token"
+    )
     GRANT_TYPE = "client_credentials"
     
-    def __init__(self, supabase_url: str, supabase_key: str):
-        """Initialize the service with Supabase credentials"""
+    def __init__(self, supabase_url: str, supabase_key: str,
+                 session: Optional["requests.Session"] = None,
+                 cache: Optional[TokenCache] = None):
+        """
+        Initialize the service with Supabase credentials
+
+        Args:
+            supabase_url: Supabase project URL
+            supabase_key: Supabase API key
+            session: HTTP session to reuse (a pooled one is created if omitted)
+            cache: Token cache (defaults to the process-wide TOKEN_CACHE)
+        """
         self.supabase_url = supabase_url
         self.supabase_key = supabase_key
         self.headers = {
@@ -47,6 +274,16 @@ class IFoodTokenService:
             "Authorization": f"Bearer {supabase_key}",
             "Content-Type": "application/json"
         }
+        self.cache = cache if cache is not None else TOKEN_CACHE
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
     
     def check_existing_token(self, client_id: str) -> Optional[Dict]:
         """
@@ -55,9 +292,13 @@ class IFoodTokenService:
         Returns:
             Dict with token data if valid token exists, None otherwise
         """
+        cached = self.cache.get(client_id)
+        if cached is not None:
+            return cached
+
         try:
             # Query Supabase for existing token
-            response = requests.get(
+            response = self.session.get(
                 f"{self.supabase_url}/rest/v1/ifood_tokens",
                 headers=self.headers,
                 params={
@@ -74,10 +315,11 @@ class IFoodTokenService:
             
             # Check if token is still valid
             token = tokens[0]  # Get the most recent token
-            expires_at = datetime.fromisoformat(token['expires_at'].replace('Z', '+00:00'))
+            expires_at = parse_expires_at(token.get('expires_at'))
             
-            if expires_at > datetime.now():
+            if expires_at > time.time():
                 logger.info(f"Valid token found for client_id: {client_id}")
+                self.cache.put(client_id, token)
                 return token
             else:
                 logger.info(f"Token expired for client_id: {client_id}")
@@ -114,31 +356,16 @@ class IFoodTokenService:
             logger.info(f"Requesting token for client_id: {request.client_id}")
             
             # Make request to iFood API
-            response = requests.post(
+            response = self.session.post(
                 self.IFOOD_TOKEN_URL,
                 headers=ifood_headers,
                 data=token_data
             )
             
             if response.status_code == 200:
-                token_data = response.json()
-                created_at = datetime.now()
-                expires_at = created_at + timedelta(seconds=token_data['expiresIn'])
-                
-                token_response = TokenResponse(
-                    access_token=token_data['accessToken'],
-                    expires_in=token_data['expiresIn'],
-                    created_at=created_at,
-                    expires_at=expires_at
-                )
-                
+                payload = OAuthToken.model_validate_json(response.content)
                 logger.info("Token generated successfully")
-                return True, {
-                    "access_token": token_response.access_token,
-                    "expires_in": token_response.expires_in,
-                    "created_at": token_response.created_at.isoformat(),
-                    "expires_at": token_response.expires_at.isoformat()
-                }
+                return True, token_data_from_payload(payload)
             else:
                 error_msg = f"iFood API error: {response.status_code} - {response.text}"
                 logger.error(error_msg)
@@ -162,26 +389,32 @@ class IFoodTokenService:
         """
         try:
             # Prepare data for Supabase
-            supabase_data = {
-                "client_id": request.client_id,
-                "client_secret": request.client_secret,
-                "access_token": token_data["access_token"],
-                "expires_at": token_data["expires_at"],
-                "created_at": token_data["created_at"],
-                "user_id": request.user_id,
-                "updated_at": datetime.now().isoformat()
-            }
-            
-            # Upsert token (insert or update if exists)
-            response = requests.post(
-                f"{self.supabase_url}/rest/v1/ifood_tokens",
+            supabase_data = token_row(request, token_data)
+            url = f"{self.supabase_url}/rest/v1/ifood_tokens"
+            headers = {**self.headers, "Prefer": "return=minimal"}
+
+            # Update the client's row if there is one, otherwise insert
+            # (same as the Node token service)
+            existing = self.session.get(
+                url,
                 headers=self.headers,
-                json=supabase_data
+                params={"client_id": f"eq.{request.client_id}", "select": "id"}
             )
+            existing.raise_for_status()
+            if existing.json():
+                response = self.session.patch(
+                    url,
+                    headers=headers,
+                    params={"client_id": f"eq.{request.client_id}"},
+                    json=supabase_data
+                )
+            else:
+                response = self.session.post(url, headers=headers, json=supabase_data)
             
-            if response.status_code in [200, 201]:
+            if response.status_code in [200, 201, 204]:
                 logger.info("Token stored successfully in Supabase")
-                return True, supabase_data
+                self.cache.put(request.client_id, supabase_data)
+                return True, token_response_data(supabase_data, token_data)
             else:
                 error_msg = f"Supabase error: {response.status_code} - {response.text}"
                 logger.error(error_msg)
@@ -256,17 +489,391 @@ class IFoodTokenService:
                 "error": error_msg
             }
 
+class AsyncIFoodTokenService:
+    """
+    Non-blocking variant of IFoodTokenService for the FastAPI event loop
+
+    Same flow and return shapes, but the iFood OAuth call and the Supabase
+    REST calls go through one pooled aiohttp session, so a slow upstream
+    only parks a coroutine instead of a worker thread.
+    """
+
+    IFOOD_TOKEN_URL = IFoodTokenService.IFOOD_TOKEN_URL
+    GRANT_TYPE = IFoodTokenService.GRANT_TYPE
+
+    def __init__(self, supabase_url: str, supabase_key: str,
+                 cache: Optional[TokenCache] = None,
+                 max_connections: Optional[int] = None,
+                 timeout: float = 30):
+        """
+        Initialize the service with Supabase credentials
+
+        Args:
+            supabase_url: Supabase project URL
+            supabase_key: Supabase API key
+            cache: Token cache (defaults to the process-wide TOKEN_CACHE)
+            max_connections: Connection pool size (env TOKEN_API_MAX_CONNECTIONS, default 100)
+            timeout: Total timeout per upstream request, in seconds
+
+        Batch requests generate at most TOKEN_BATCH_CONCURRENCY (default 16)
+        tokens at a time.
+        """
+        self.supabase_url = supabase_url
+        self.supabase_key = supabase_key
+        self.cache = cache if cache is not None else TOKEN_CACHE
+        if max_connections is None:
+            max_connections = int(os.getenv('TOKEN_API_MAX_CONNECTIONS', '100'))
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.batch_concurrency = int(os.getenv('TOKEN_BATCH_CONCURRENCY', '16'))
+        self._session = None
+        self._db = None
+        # (client_id, client_secret, user_id) -> task of the request being processed
+        self._in_flight: Dict[Tuple[str, str, str], "asyncio.Task"] = {}
+
+    async def _clients(self):
+        """Pooled aiohttp session and Supabase client, created inside the running loop"""
+        if self._session is None or self._session.closed:
+            # Imported here so sync users (lambda, refresher) don't pay for aiohttp
+            import aiohttp
+            from async_supabase_client import AsyncSupabaseClient
+
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._db = AsyncSupabaseClient(self.supabase_url, self.supabase_key,
+                                           session=self._session)
+        return self._session, self._db
+
+    async def close(self):
+        """Close the pooled session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def check_existing_token(self, client_id: str) -> Optional[Dict]:
+        """
+        Check if a valid token already exists for the client
+
+        Returns:
+            Dict with token data if valid token exists, None otherwise
+        """
+        cached = await self.cache.aget(client_id)
+        if cached is not None:
+            return cached
+
+        try:
+            _, db = await self._clients()
+            tokens = await db.select("ifood_tokens", {"client_id": f"eq.{client_id}"})
+            if not tokens:
+                logger.info(f"No existing token found for client_id: {client_id}")
+                return None
+
+            token = tokens[0]
+            if parse_expires_at(token.get('expires_at')) > time.time():
+                logger.info(f"Valid token found for client_id: {client_id}")
+                await self.cache.aput_many({client_id: token})
+                return token
+
+            logger.info(f"Token expired for client_id: {client_id}")
+            return None
+
+        except Exception as e:
+            logger.error(f"Error checking existing token: {str(e)}")
+            return None
+
+    async def generate_token(self, request: TokenRequest) -> Tuple[bool, Dict]:
+        """
+        Generate new access token from iFood API
+
+        Args:
+            request: TokenRequest with client credentials
+
+        Returns:
+            Tuple of (success: bool, response: Dict)
+        """
+        try:
+            session, _ = await self._clients()
+            logger.info(f"Requesting token for client_id: {request.client_id}")
+
+            async with session.post(
+                self.IFOOD_TOKEN_URL,
+                headers={
+                    "accept": "application/json",
+                    "Content-Type": "application/x-www-form-urlencoded"
+                },
+                data={
+                    "grantType": self.GRANT_TYPE,
+                    "clientId": request.client_id,
+                    "clientSecret": request.client_secret
+                }
+            ) as response:
+                content = await response.read()
+                status = response.status
+
+            if status == 200:
+                payload = OAuthToken.model_validate_json(content)
+                logger.info("Token generated successfully")
+                return True, token_data_from_payload(payload)
+
+            error_msg = f"iFood API error: {status} - {content.decode(errors='replace')}"
+            logger.error(error_msg)
+            return False, {"error": error_msg}
+
+        except Exception as e:
+            error_msg = f"Error generating token: {str(e)}"
+            logger.error(error_msg)
+            return False, {"error": error_msg}
+
+    async def store_token(self, request: TokenRequest, token_data: Dict) -> Tuple[bool, Dict]:
+        """
+        Store token in Supabase ifood_tokens table
+
+        Args:
+            request: Original token request
+            token_data: Token data from iFood API
+
+        Returns:
+            Tuple of (success: bool, response: Dict)
+        """
+        try:
+            _, db = await self._clients()
+            supabase_data = token_row(request, token_data)
+
+            # Update the client's row if there is one, otherwise insert
+            client_filter = {"client_id": f"eq.{request.client_id}"}
+            if await db.select("ifood_tokens", client_filter, columns="id"):
+                await db.update("ifood_tokens", supabase_data, client_filter)
+            else:
+                await db.insert("ifood_tokens", supabase_data, returning=False)
+
+            logger.info("Token stored successfully in Supabase")
+            await self.cache.aput_many({request.client_id: supabase_data})
+            return True, token_response_data(supabase_data, token_data)
+
+        except Exception as e:
+            error_msg = f"Error storing token: {str(e)}"
+            logger.error(error_msg)
+            return False, {"error": error_msg}
+
+    async def process_token_request(self, client_id: str, client_secret: str, user_id: str) -> Dict:
+        """
+        Main method to process complete token request flow (see IFoodTokenService)
+
+        Concurrent calls for the same credentials and user join the request
+        already in flight instead of each generating and storing its own token.
+
+        Args:
+            client_id: iFood client ID
+            client_secret: iFood client secret
+            user_id: User identifier
+
+        Returns:
+            Dict with success status and data/error
+        """
+        import asyncio
+
+        key = (client_id, client_secret, user_id)
+        task = self._in_flight.get(key)
+        if task is not None:
+            TOKEN_REQUESTS_COALESCED.inc()
+            logger.info(f"Joining in-flight token request for client_id: {client_id}")
+        else:
+            task = asyncio.ensure_future(self._process_token_request(client_id, client_secret, user_id))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shielded: a caller that disconnects must not cancel the others' result
+        return await asyncio.shield(task)
+
+    async def _process_token_request(self, client_id: str, client_secret: str, user_id: str) -> Dict:
+        try:
+            existing_token = await self.check_existing_token(client_id)
+            if existing_token:
+                return {
+                    "success": True,
+                    "message": "Valid token already exists",
+                    "data": existing_token
+                }
+
+            request = TokenRequest(
+                client_id=client_id,
+                client_secret=client_secret,
+                user_id=user_id
+            )
+
+            success, token_data = await self.generate_token(request)
+            if not success:
+                return {
+                    "success": False,
+                    "error": token_data.get("error", "Failed to generate token")
+                }
+
+            success, stored_data = await self.store_token(request, token_data)
+            if not success:
+                return {
+                    "success": False,
+                    "error": stored_data.get("error", "Failed to store token")
+                }
+
+            return {
+                "success": True,
+                "message": "Token generated and stored successfully",
+                "data": stored_data
+            }
+
+        except Exception as e:
+            error_msg = f"Error processing token request: {str(e)}"
+            logger.error(error_msg)
+            return {
+                "success": False,
+                "error": error_msg
+            }
+
+    async def process_batch(self, requests: List[TokenRequest]) -> List[Dict]:
+        """
+        Process many token requests with one lookup and one bulk write
+
+        1. Serve cached tokens, then fetch the rest with a single
+           client_id=in.(...) query
+        2. Generate the missing/expired tokens concurrently (bounded)
+        3. Write all new tokens with one upsert on id for the clients that
+           already have a row and one bulk insert for the rest, falling back
+           to one store_token per entry if a bulk write fails
+
+        Args:
+            requests: Token requests (duplicate credentials are processed once)
+
+        Returns:
+            One result per request, in order, shaped like process_token_request
+        """
+        import asyncio
+
+        _, db = await self._clients()
+        unique: Dict[Tuple[str, str], TokenRequest] = {}
+        for request in requests:
+            unique.setdefault((request.client_id, request.client_secret), request)
+
+        results: Dict[Tuple[str, str], Dict] = {}
+        existing: Dict[str, Dict] = {}
+        # client_id -> id of its ifood_tokens row, valid or not
+        row_ids: Dict[str, str] = {}
+        existing.update(await self.cache.aget_many({key[0] for key in unique}))
+        lookup = {key[0] for key in unique if key[0] not in existing}
+
+        if lookup:
+            quoted = ','.join('"' + client_id.replace('"', '\\"') + '"' for client_id in lookup)
+            try:
+                rows = await db.select("ifood_tokens", {"client_id": f"in.({quoted})"})
+            except Exception as e:
+                logger.error(f"Error checking existing tokens: {str(e)}")
+                rows = []
+            now = time.time()
+            valid = {}
+            for row in rows:
+                row_ids.setdefault(row['client_id'], row['id'])
+                if parse_expires_at(row.get('expires_at')) > now:
+                    existing[row['client_id']] = row
+                    valid[row['client_id']] = row
+            await self.cache.aput_many(valid)
+
+        missing = []
+        for key, request in unique.items():
+            if key[0] in existing:
+                results[key] = {
+                    "success": True,
+                    "message": "Valid token already exists",
+                    "data": existing[key[0]]
+                }
+            else:
+                missing.append(request)
+
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+
+        async def generate(request: TokenRequest) -> Tuple[bool, Dict]:
+            async with semaphore:
+                return await self.generate_token(request)
+
+        generated = await asyncio.gather(*(generate(request) for request in missing))
+
+        to_store: Dict[str, Tuple[TokenRequest, Dict, Dict]] = {}
+        for request, (success, token_data) in zip(missing, generated):
+            if success:
+                # Last one wins when a batch carries the same client_id twice
+                to_store[request.client_id] = (request, token_data, token_row(request, token_data))
+            else:
+                results[(request.client_id, request.client_secret)] = {
+                    "success": False,
+                    "error": token_data.get("error", "Failed to generate token")
+                }
+
+        if to_store:
+            updates = [{**row, "id": row_ids[client_id]}
+                       for client_id, (_, _, row) in to_store.items() if client_id in row_ids]
+            inserts = [row for client_id, (_, _, row) in to_store.items()
+                       if client_id not in row_ids]
+            try:
+                if updates:
+                    await db.upsert("ifood_tokens", updates, on_conflict=TOKEN_UPSERT_CONFLICT)
+                if inserts:
+                    await db.insert("ifood_tokens", inserts, returning=False)
+                stored = {client_id: (True, token_response_data(row, token_data))
+                          for client_id, (_, token_data, row) in to_store.items()}
+                await self.cache.aput_many({client_id: row for client_id, (_, _, row)
+                                            in to_store.items()})
+                logger.info(f"Stored {len(to_store)} tokens in bulk "
+                            f"({len(updates)} updated, {len(inserts)} inserted)")
+            except Exception as e:
+                logger.error(f"Bulk token write failed, storing one by one: {str(e)}")
+                stored = {}
+                for client_id, (request, token_data, _) in to_store.items():
+                    stored[client_id] = await self.store_token(request, token_data)
+
+            for request in missing:
+                key = (request.client_id, request.client_secret)
+                if key in results:
+                    continue
+                success, stored_data = stored[request.client_id]
+                if success:
+                    results[key] = {
+                        "success": True,
+                        "message": "Token generated and stored successfully",
+                        "data": stored_data
+                    }
+                else:
+                    results[key] = {
+                        "success": False,
+                        "error": stored_data.get("error", "Failed to store token")
+                    }
+
+        return [results[(request.client_id, request.client_secret)] for request in requests]
+
+# Built by the first invocation and reused while the Lambda container stays
+# warm, together with its pooled connections and the module-level TOKEN_CACHE
+_lambda_service: Optional[IFoodTokenService] = None
+
+def get_lambda_service() -> Optional[IFoodTokenService]:
+    """Container-wide IFoodTokenService, or None if Supabase isn't configured"""
+    global _lambda_service
+    if _lambda_service is None:
+        supabase_url = os.getenv('SUPABASE_URL')
+        supabase_key = os.getenv('SUPABASE_ANON_KEY')
+        if not supabase_url or not supabase_key:
+            return None
+        _lambda_service = IFoodTokenService(supabase_url, supabase_key)
+    return _lambda_service
+
 def lambda_handler(event, context):
     """
     AWS Lambda handler function
     Can be adapted for other serverless platforms
+
+    Warm invocations reuse the service from get_lambda_service, so cached
+    tokens are answered without any network call and misses reuse the
+    open connections.
     """
     try:
-        # Get environment variables
-        supabase_url = os.getenv('SUPABASE_URL')
-        supabase_key = os.getenv('SUPABASE_ANON_KEY')
-        
-        if not supabase_url or not supabase_key:
+        service = get_lambda_service()
+        if service is None:
             return {
                 'statusCode': 500,
                 'body': json.dumps({
@@ -275,7 +882,7 @@ def lambda_handler(event, context):
             }
         
         # Parse request body
-        body = json.loads(event.get('body', '{}'))
+        body = json.loads(event.get('body') or '{}')
         
         required_fields = ['clientId', 'clientSecret', 'user_id']
         for field in required_fields:
@@ -287,8 +894,6 @@ def lambda_handler(event, context):
                     })
                 }
         
-        # Initialize service and process request
-        service = IFoodTokenService(supabase_url, supabase_key)
         result = service.process_token_request(
             body['clientId'],
             body['clientSecret'],
@@ -316,6 +921,7 @@ def lambda_handler(event, context):
 
 if __name__ == "__main__":
     # Test the service locally
+    logging.basicConfig(level=logging.INFO)
     from dotenv import load_dotenv
     load_dotenv()
     
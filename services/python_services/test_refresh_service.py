@@ -77,12 +77,9 @@ def test_token_refresh():
 def show_schedule_info():
     """Show information about the scheduled service"""
     print("\n📅 INFORMAÇÕES DO AGENDAMENTO:")
-    print("  - Frequência: A cada 2 horas")
-    print("  - Horário: No minuto 50 (xx:50)")
-    print("  - Próximas execuções:")
-    print("    - 00:50, 02:50, 04:50, 06:50...")
-    print("    - 08:50, 10:50, 12:50, 14:50...")
-    print("    - 16:50, 18:50, 20:50, 22:50...")
+    print("  - Frequência: cada token pouco antes de expirar (TOKEN_REFRESH_MODE=expiry) ou a cada 2 horas (interval)")
+    print("  - Margem: TOKEN_REFRESH_MARGIN_SECONDS (padrão 900s) antes do expires_at; no modo interval, jitter de até TOKEN_REFRESH_JITTER_SECONDS")
+    print("  - Execuções atrasadas são puladas (sem sobreposição)")
     print()
     print("🎯 Para executar o serviço continuamente:")
     print("  python ifood_token_refresh_service.py")
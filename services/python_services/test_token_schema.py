@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Checks the ifood_tokens writes against the real table schema
+
+PostgREST rejects an upsert whose on_conflict columns have no unique
+constraint (error 42P10), so every conflict target used by the token
+services must be a primary key or unique constraint in the migrations.
+
+Run with pytest, or directly: python test_token_schema.py
+"""
+
+import asyncio
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+from ifood_token_service import (
+    AsyncIFoodTokenService, IFoodTokenService, TokenCache, TokenRequest,
+    TOKEN_UPSERT_CONFLICT
+)
+from ifood_token_refresh_service import IFoodTokenRefreshService, RefreshResult, TokenRecord
+
+ROOT = Path(__file__).resolve().parents[2]
+MIGRATION_DIRS = [
+    ROOT / "frontend" / "plano-certo-hub-insights" / "supabase" / "migrations",
+    ROOT / "services" / "ifood-token-service" / "migrations",
+    ROOT / "database",
+    ROOT / "database-schemas",
+]
+
+
+def _columns(text: str) -> Tuple[str, ...]:
+    return tuple(column.strip().strip('"') for column in text.split(','))
+
+
+def unique_keys(table: str) -> Set[Tuple[str, ...]]:
+    """Primary keys and unique constraints/indexes of table in the SQL migrations"""
+    name = rf'(?:public\.)?"?{table}"?'
+    keys = set()
+    for directory in MIGRATION_DIRS:
+        for path in sorted(directory.rglob("*.sql")):
+            sql = re.sub(r'--[^\n]*', '', path.read_text(encoding="utf-8", errors="replace"))
+            for match in re.finditer(rf'CREATE TABLE (?:IF NOT EXISTS )?{name}\s*\((.*?)\n\);',
+                                     sql, re.IGNORECASE | re.DOTALL):
+                for line in match.group(1).splitlines():
+                    line = line.strip().rstrip(',')
+                    constraint = re.match(r'(?:CONSTRAINT \w+ )?(?:UNIQUE|PRIMARY KEY)\s*\(([^)]*)\)',
+                                          line, re.IGNORECASE)
+                    if constraint:
+                        keys.add(_columns(constraint.group(1)))
+                    elif re.search(r'\b(PRIMARY KEY|UNIQUE)\b', line, re.IGNORECASE):
+                        keys.add((line.split()[0].strip('"'),))
+            for match in re.finditer(rf'CREATE UNIQUE INDEX (?:IF NOT EXISTS )?\w+\s+ON {name}'
+                                     rf'(?: USING \w+)?\s*\(([^)]*)\)', sql, re.IGNORECASE):
+                keys.add(_columns(match.group(1)))
+            for match in re.finditer(rf'ALTER TABLE (?:ONLY )?{name}\s+ADD (?:CONSTRAINT \w+ )?'
+                                     rf'(?:UNIQUE|PRIMARY KEY)\s*\(([^)]*)\)', sql, re.IGNORECASE):
+                keys.add(_columns(match.group(1)))
+    return keys
+
+
+def conflict_key(on_conflict: str) -> Tuple[str, ...]:
+    return _columns(on_conflict)
+
+
+class RecordingSession:
+    """requests.Session stand-in that records calls to ifood_tokens"""
+
+    def __init__(self, rows: List[Dict], post_status: int = 201):
+        self.rows = rows
+        self.post_status = post_status
+        self.calls: List[Tuple[str, Dict]] = []
+
+    def _response(self, status: int, body=None):
+        class Response:
+            status_code = status
+            text = ''
+
+            def json(self):
+                return body
+
+            def raise_for_status(self):
+                pass
+        return Response()
+
+    def get(self, url, headers=None, params=None):
+        self.calls.append(('GET', params or {}))
+        return self._response(200, self.rows)
+
+    def post(self, url, headers=None, params=None, json=None, data=None):
+        self.calls.append(('POST', params or {}))
+        return self._response(self.post_status)
+
+    def patch(self, url, headers=None, params=None, json=None):
+        self.calls.append(('PATCH', params or {}))
+        return self._response(204)
+
+
+class RecordingDB:
+    """AsyncSupabaseClient stand-in that records writes to ifood_tokens"""
+
+    def __init__(self, rows: List[Dict]):
+        self.rows = rows
+        self.writes: List[Tuple[str, object]] = []
+
+    async def select(self, table, filters=None, columns='*', limit=None, order=None):
+        return self.rows
+
+    async def upsert(self, table, rows, on_conflict, **kwargs):
+        self.writes.append(('upsert', on_conflict))
+        return len(rows)
+
+    async def insert(self, table, rows, returning=True):
+        self.writes.append(('insert', len(rows) if isinstance(rows, list) else 1))
+        return []
+
+    async def update(self, table, values, filters):
+        self.writes.append(('update', filters))
+        return []
+
+
+def test_schema_parser_finds_ifood_tokens_keys():
+    keys = unique_keys("ifood_tokens")
+    assert ("id",) in keys
+    assert ("user_id",) in keys
+    assert ("client_id",) not in keys
+
+
+def test_token_upsert_conflict_is_unique():
+    assert conflict_key(TOKEN_UPSERT_CONFLICT) in unique_keys("ifood_tokens")
+
+
+def test_store_token_uses_unique_conflict_targets():
+    keys = unique_keys("ifood_tokens")
+    token_data = {"access_token": "a", "expires_at": "2030-01-01T00:00:00",
+                  "created_at": "2029-12-31T18:00:00"}
+    for rows, write in (([], 'POST'), ([{"id": "row-1"}], 'PATCH')):
+        session = RecordingSession(rows)
+        service = IFoodTokenService("http://db", "key", session=session,
+                                    cache=TokenCache(store=None))
+        success, data = service.store_token(TokenRequest("c1", "s1", "u1"), token_data)
+        assert success
+        assert data["expires_at"] == token_data["expires_at"]
+        assert [method for method, _ in session.calls] == ['GET', write]
+        for _, params in session.calls:
+            if "on_conflict" in params:
+                assert conflict_key(params["on_conflict"]) in keys
+
+
+def test_batch_writes_use_unique_conflict_targets():
+    keys = unique_keys("ifood_tokens")
+    db = RecordingDB([{"id": "row-1", "client_id": "c1", "expires_at": 1}])
+    service = AsyncIFoodTokenService("http://db", "key", cache=TokenCache(store=None))
+
+    async def clients():
+        return None, db
+
+    async def generate_token(request):
+        return True, {"access_token": f"new-{request.client_id}",
+                      "expires_at": "2030-01-01T00:00:00", "created_at": "2029-12-31T18:00:00"}
+
+    service._clients = clients
+    service.generate_token = generate_token
+    results = asyncio.run(service.process_batch([TokenRequest("c1", "s1", "u1"),
+                                                 TokenRequest("c2", "s2", "u2")]))
+    assert all(result["success"] for result in results)
+    assert ('insert', 1) in db.writes
+    for kind, target in db.writes:
+        if kind == 'upsert':
+            assert conflict_key(target) in keys
+
+
+def test_refresher_write_back_uses_unique_conflict_target():
+    keys = unique_keys("ifood_tokens")
+    session = RecordingSession([])
+    service = IFoodTokenRefreshService("http://db", "key", session=session, token_store=None)
+    service.token_store = None
+    token = TokenRecord(id="row-1", client_id="c1", client_secret="s1", access_token="old",
+                        expires_at=1, user_id="u1", created_at="", updated_at="")
+    result = RefreshResult(success=True, client_id="c1", new_token="new",
+                           updated_at="2030-01-01T00:00:00", expires_at=int(time.time()) + 3600)
+    assert service.write_back_tokens([token], [result]) == 1
+    targets = [params["on_conflict"] for _, params in session.calls if "on_conflict" in params]
+    assert targets and all(conflict_key(target) in keys for target in targets)
+
+
+
+def test_refresher_fallback_patches_by_id():
+    session = RecordingSession([], post_status=400)
+    service = IFoodTokenRefreshService("http://db", "key", session=session, token_store=None)
+    tokens = [TokenRecord(id=f"row-{n}", client_id="shared", client_secret="s", access_token="old",
+                          expires_at=1, user_id=f"u{n}", created_at="", updated_at="")
+              for n in (1, 2)]
+    results = [RefreshResult(success=True, client_id="shared", new_token=f"new-{n}",
+                             updated_at="2030-01-01T00:00:00", expires_at=int(time.time()) + 3600)
+               for n in (1, 2)]
+    assert service.write_back_tokens(tokens, results) == 2
+    patches = [params for method, params in session.calls if method == 'PATCH']
+    assert patches == [{"id": "eq.row-1"}, {"id": "eq.row-2"}]
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    sys.exit(0)
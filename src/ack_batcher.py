@@ -0,0 +1,235 @@
+"""
+Acknowledgment de eventos do iFood em lotes
+
+Os eventos gravados pelo polling entram em uma fila por usuário (token);
+a fila é enviada ao iFood quando atinge MAX_ACKNOWLEDGMENT_IDS ids ou
+após flush_interval segundos, o que vier primeiro. Lotes que falham são
+reenviados com backoff exponencial até max_retries vezes. Cada envio
+(inclusive as novas tentativas) vira uma linha em
+ifood_acknowledgment_batches.
+
+Um evento não confirmado é reentregue pelo iFood no polling seguinte e
+o insert em ifood_events é idempotente, então desistir de um lote nunca
+perde eventos: só gera reentregas.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from async_ifood_api_client import MAX_ACKNOWLEDGMENT_IDS, AsyncIFoodAPIClient
+from async_supabase_client import AsyncSupabaseClient
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+ACK_EVENTS = REGISTRY.counter(
+    'ifood_ack_events_total',
+    'Event ids enviados no acknowledgment por resultado (ok, retry, dropped)',
+    ['result']
+)
+ACK_PENDING = REGISTRY.gauge(
+    'ifood_ack_pending_events',
+    'Event ids aguardando acknowledgment (fila + novas tentativas)'
+)
+ACK_LAG = REGISTRY.histogram(
+    'ifood_ack_lag_seconds',
+    'Tempo entre o evento entrar na fila e o acknowledgment confirmado'
+)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass
+class AckBatch:
+    """Lote de event ids de um usuário"""
+    user_id: str
+    event_ids: List[str]
+    enqueued_at: float
+    attempt: int = 0
+    due_at: float = 0.0
+
+
+class AcknowledgmentBatcher:
+    """
+    Junta os acknowledgments e envia em lotes de até 2000 ids
+
+    add() é síncrono e barato (chamado pelo polling a cada consulta);
+    run() é a task que envia os lotes. Usado pelo IFoodEventsPoller.
+    """
+
+    def __init__(self, supabase: AsyncSupabaseClient, ifood: AsyncIFoodAPIClient,
+                 flush_interval: float = 1.0, max_retries: int = 3,
+                 retry_base_delay: float = 2.0, concurrency: int = 10,
+                 max_batch: int = MAX_ACKNOWLEDGMENT_IDS):
+        """
+        Args:
+            supabase: Cliente assíncrono do Supabase (ifood_acknowledgment_batches)
+            ifood: Cliente assíncrono da API de pedidos do iFood
+            flush_interval: Espera máxima de um id na fila antes do envio
+            max_retries: Novas tentativas de um lote que falhou
+            retry_base_delay: Espera antes da primeira nova tentativa (dobra a cada falha)
+            concurrency: Chamadas de acknowledgment simultâneas
+            max_batch: Ids por chamada (até MAX_ACKNOWLEDGMENT_IDS)
+        """
+        self.supabase = supabase
+        self.ifood = ifood
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.concurrency = max(1, concurrency)
+        self.max_batch = max(1, min(max_batch, MAX_ACKNOWLEDGMENT_IDS))
+
+        self._tokens: Dict[str, str] = {}
+        self._pending: Dict[str, AckBatch] = {}
+        self._retries: List[AckBatch] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def add(self, user_id: str, access_token: str, event_ids: List[str]):
+        """
+        Enfileira event ids para acknowledgment
+
+        Args:
+            user_id: Dono do token que recebeu os eventos
+            access_token: Token atual do usuário (usado também nas novas tentativas)
+            event_ids: Ids já gravados em ifood_events
+        """
+        if not event_ids:
+            return
+        self._tokens[user_id] = access_token
+        batch = self._pending.get(user_id)
+        if batch is None:
+            batch = self._pending[user_id] = AckBatch(user_id, [], time.monotonic())
+        batch.event_ids.extend(event_ids)
+        self._update_gauge()
+        if len(batch.event_ids) >= self.max_batch and self._wakeup is not None:
+            self._wakeup.set()
+
+    @property
+    def pending(self) -> int:
+        """Ids aguardando envio (fila + novas tentativas)"""
+        return (sum(len(batch.event_ids) for batch in self._pending.values())
+                + sum(len(batch.event_ids) for batch in self._retries))
+
+    def _update_gauge(self):
+        ACK_PENDING.set(self.pending)
+
+    def _due_batches(self, now: float, final: bool = False) -> List[AckBatch]:
+        """Retira da fila os lotes a enviar agora, divididos em até max_batch ids"""
+        batches = []
+        for batch in self._pending.values():
+            for start in range(0, len(batch.event_ids), self.max_batch):
+                batches.append(AckBatch(batch.user_id,
+                                        batch.event_ids[start:start + self.max_batch],
+                                        batch.enqueued_at))
+        self._pending = {}
+
+        waiting = []
+        for batch in self._retries:
+            (batches if final or batch.due_at <= now else waiting).append(batch)
+        self._retries = waiting
+        return batches
+
+    async def flush(self, final: bool = False) -> int:
+        """
+        Envia tudo o que está na fila e as novas tentativas vencidas
+
+        Args:
+            final: Envia também as novas tentativas ainda não vencidas
+                (encerramento); lotes que falharem são descartados
+
+        Returns:
+            Número de ids confirmados
+        """
+        batches = self._due_batches(time.monotonic(), final)
+        if not batches:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        rows = await asyncio.gather(*(self._send(batch, semaphore, final) for batch in batches))
+        self._update_gauge()
+        await self._record(rows)
+        return sum(row['successful_acknowledgments'] for row in rows)
+
+    async def _send(self, batch: AckBatch, semaphore: asyncio.Semaphore, final: bool) -> Dict:
+        """Um envio ao iFood; devolve a linha de ifood_acknowledgment_batches"""
+        async with semaphore:
+            started_at = _now()
+            started = time.perf_counter()
+            response = await self.ifood.acknowledge_events(self._tokens[batch.user_id],
+                                                           batch.event_ids)
+
+        size = len(batch.event_ids)
+        attempt = batch.attempt
+        next_retry_at = None
+        if response.ok:
+            ACK_EVENTS.labels('ok').inc(size)
+            ACK_LAG.observe(time.monotonic() - batch.enqueued_at)
+        elif attempt < self.max_retries and not final:
+            delay = self.retry_base_delay * 2 ** attempt
+            batch.attempt = attempt + 1
+            batch.due_at = time.monotonic() + delay
+            self._retries.append(batch)
+            next_retry_at = (_now() + timedelta(seconds=delay)).isoformat()
+            ACK_EVENTS.labels('retry').inc(size)
+            logger.warning(f"⚠️ Acknowledgment de {size} eventos falhou "
+                           f"({response.error or response.status}); nova tentativa em {delay:.0f}s")
+        else:
+            ACK_EVENTS.labels('dropped').inc(size)
+            logger.error(f"❌ Acknowledgment de {size} eventos desistido após "
+                         f"{attempt} novas tentativas; o iFood vai reentregá-los")
+
+        completed_at = _now()
+        return {
+            'user_id': batch.user_id,
+            'batch_size': size,
+            'event_ids': batch.event_ids,
+            'started_at': started_at.isoformat(),
+            'completed_at': completed_at.isoformat(),
+            'success': response.ok,
+            'successful_acknowledgments': size if response.ok else 0,
+            'failed_acknowledgments': 0 if response.ok else size,
+            'failed_event_ids': [] if response.ok else batch.event_ids,
+            'api_response_time_ms': response.response_time_ms,
+            'api_status_code': response.status or None,
+            'api_error_message': response.error,
+            'retry_attempts': attempt,
+            'max_retries': self.max_retries,
+            'next_retry_at': next_retry_at,
+            'processing_duration_ms': int((time.perf_counter() - started) * 1000),
+        }
+
+    async def _record(self, rows: List[Dict]):
+        """Grava os lotes enviados em ifood_acknowledgment_batches"""
+        try:
+            await self.supabase.insert('ifood_acknowledgment_batches', rows, returning=False)
+        except Exception as e:
+            logger.error(f"❌ Erro ao gravar lotes de acknowledgment: {e}")
+
+    async def run(self):
+        """Envia os lotes até stop(); no encerramento faz um último flush"""
+        self._wakeup = asyncio.Event()
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Erro no envio de acknowledgments: {e}")
+
+        await self.flush(final=True)
+
+    def stop(self):
+        """Pede o encerramento: run() envia o que restou e retorna"""
+        self._stopping = True
+        if self._wakeup is not None:
+            self._wakeup.set()
@@ -0,0 +1,191 @@
+"""
+Cliente assíncrono para a API de pedidos do iFood (eventos e pedidos)
+
+Usado pelo polling de eventos, que consulta milhares de merchants a cada
+30 segundos em um único event loop; o IFoodAPIClient síncrono (catálogo)
+continua atendendo a sincronização de produtos.
+"""
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from config import Config
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Mesmas séries do IFoodAPIClient síncrono (o registro devolve a métrica existente)
+API_REQUESTS = REGISTRY.counter(
+    'ifood_api_requests_total',
+    'Requisições à API do iFood por método e status HTTP',
+    ['method', 'status']
+)
+API_REQUEST_DURATION = REGISTRY.histogram(
+    'ifood_api_request_duration_seconds',
+    'Duração das requisições à API do iFood',
+    ['method']
+)
+
+
+# Máximo de event ids por chamada de acknowledgment
+MAX_ACKNOWLEDGMENT_IDS = 2000
+
+
+@dataclass
+class IFoodResponse:
+    """Resultado de uma chamada à API do iFood (status 0 = falha de rede)"""
+    status: int
+    data: object = None
+    response_time_ms: int = 0
+    error: Optional[str] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+
+class AsyncIFoodAPIClient:
+    """
+    Cliente assíncrono mínimo para o módulo de pedidos do iFood
+
+    Falhas HTTP e de rede não geram exceção: voltam como IFoodResponse com
+    o status (0 para rede/timeout) e a mensagem, para quem chama registrar
+    no log de polling e seguir com os demais merchants.
+    """
+
+    ORDER_API_PATH = "/order/v1.0"
+
+    def __init__(self, base_url: Optional[str] = None,
+                 session: Optional[aiohttp.ClientSession] = None,
+                 max_connections: int = 100, timeout: float = 30):
+        """
+        Inicializa o cliente
+
+        Args:
+            base_url: URL da API do iFood (padrão: Config.IFOOD_API_BASE_URL)
+            session: Sessão aiohttp compartilhada (criada sob demanda se omitida)
+            max_connections: Limite de conexões da sessão própria
+            timeout: Timeout total por requisição em segundos
+        """
+        self.base_url = (base_url or Config.IFOOD_API_BASE_URL).rstrip('/')
+        self._session = session
+        self._owns_session = session is None
+        self._max_connections = max_connections
+        self._timeout = timeout
+
+    async def session(self) -> aiohttp.ClientSession:
+        """Sessão HTTP (criada no primeiro uso, dentro do event loop)"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._max_connections),
+                timeout=aiohttp.ClientTimeout(total=self._timeout)
+            )
+            self._owns_session = True
+        return self._session
+
+    async def close(self):
+        """Fecha a sessão, se ela pertencer a este cliente"""
+        if self._owns_session and self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _request(self, method: str, path: str, access_token: str,
+                       headers: Optional[Dict[str, str]] = None,
+                       json_data=None) -> IFoodResponse:
+        request_headers = {
+            'Accept': 'application/json',
+            'Authorization': f'Bearer {access_token}',
+        }
+        if headers:
+            request_headers.update(headers)
+
+        session = await self.session()
+        started = perf_counter()
+        try:
+            async with session.request(method, f"{self.base_url}{path}",
+                                       headers=request_headers, json=json_data) as response:
+                body = await response.read()
+                status = response.status
+                response_headers = dict(response.headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            API_REQUESTS.labels(method, 'error').inc()
+            return IFoodResponse(status=0, error=str(e) or type(e).__name__,
+                                 response_time_ms=int((perf_counter() - started) * 1000))
+        finally:
+            API_REQUEST_DURATION.labels(method).observe(perf_counter() - started)
+
+        API_REQUESTS.labels(method, str(status)).inc()
+        elapsed_ms = int((perf_counter() - started) * 1000)
+        if status >= 400:
+            return IFoodResponse(status=status, response_time_ms=elapsed_ms,
+                                 error=body.decode(errors='replace')[:500],
+                                 headers=response_headers)
+        try:
+            data = json.loads(body) if body else None
+        except ValueError:
+            return IFoodResponse(status=status, response_time_ms=elapsed_ms,
+                                 error="Resposta não é JSON válido", headers=response_headers)
+        return IFoodResponse(status=status, data=data, response_time_ms=elapsed_ms,
+                             headers=response_headers)
+
+    async def poll_events(self, access_token: str,
+                          merchant_ids: Optional[List[str]] = None) -> IFoodResponse:
+        """
+        Busca os eventos pendentes (GET /events:polling)
+
+        O iFood devolve 204 quando não há eventos; nesse caso data é [].
+
+        Args:
+            access_token: Token de acesso do dono dos merchants
+            merchant_ids: Merchants consultados (header x-polling-merchants);
+                None consulta todos os merchants do token
+
+        Returns:
+            IFoodResponse com a lista de eventos em data
+        """
+        headers = {}
+        if merchant_ids:
+            headers['x-polling-merchants'] = ','.join(merchant_ids)
+        response = await self._request('GET', f"{self.ORDER_API_PATH}/events:polling",
+                                       access_token, headers=headers)
+        if response.ok and not isinstance(response.data, list):
+            response.data = []
+        return response
+
+    async def acknowledge_events(self, access_token: str, event_ids: List[str]) -> IFoodResponse:
+        """
+        Confirma o recebimento de eventos (POST /events/acknowledgment)
+
+        Eventos não confirmados são reentregues pelo iFood nos próximos polls.
+
+        Args:
+            access_token: Token de acesso usado no polling dos eventos
+            event_ids: Até MAX_ACKNOWLEDGMENT_IDS ids de evento
+
+        Returns:
+            IFoodResponse (o iFood responde 202 em caso de sucesso)
+        """
+        if len(event_ids) > MAX_ACKNOWLEDGMENT_IDS:
+            raise ValueError(f"No máximo {MAX_ACKNOWLEDGMENT_IDS} eventos por acknowledgment")
+        return await self._request('POST', f"{self.ORDER_API_PATH}/events/acknowledgment",
+                                   access_token,
+                                   json_data=[{'id': event_id} for event_id in event_ids])
+
+    async def get_order(self, access_token: str, order_id: str) -> IFoodResponse:
+        """
+        Detalhes de um pedido (GET /orders/{id})
+
+        Args:
+            access_token: Token de acesso do dono do merchant
+            order_id: orderId do evento
+
+        Returns:
+            IFoodResponse com o pedido em data
+        """
+        return await self._request('GET', f"{self.ORDER_API_PATH}/orders/{order_id}", access_token)
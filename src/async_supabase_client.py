@@ -0,0 +1,215 @@
+"""
+Cliente assíncrono para a API REST (PostgREST) do Supabase
+
+Usado pelos caminhos que rodam em um event loop (API FastAPI, pollers),
+onde o supabase-py síncrono bloquearia o loop a cada consulta.
+"""
+
+import logging
+import os
+from time import perf_counter
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Mesmas séries do SupabaseClient síncrono (o registro devolve a métrica existente)
+DB_QUERIES = REGISTRY.counter(
+    'supabase_queries_total',
+    'Consultas ao Supabase por tabela, operação e resultado',
+    ['table', 'operation', 'result']
+)
+DB_QUERY_DURATION = REGISTRY.histogram(
+    'supabase_query_duration_seconds',
+    'Duração das consultas ao Supabase',
+    ['table', 'operation']
+)
+
+
+class SupabaseRESTError(Exception):
+    """Resposta de erro do PostgREST"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Supabase {status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class AsyncSupabaseClient:
+    """
+    Cliente assíncrono mínimo para as tabelas do Supabase
+
+    Filtros seguem a sintaxe do PostgREST: {'client_id': 'eq.abc',
+    'id': 'in.(1,2)'}.
+    """
+
+    def __init__(self, url: Optional[str] = None, key: Optional[str] = None,
+                 session: Optional[aiohttp.ClientSession] = None,
+                 max_connections: int = 100, timeout: float = 30):
+        """
+        Inicializa o cliente
+
+        Args:
+            url: URL do projeto Supabase
+            key: Chave de API do Supabase
+            session: Sessão aiohttp compartilhada (criada sob demanda se omitida)
+            max_connections: Limite de conexões da sessão própria
+            timeout: Timeout total por requisição em segundos
+        """
+        self.url = (url or os.getenv('SUPABASE_URL') or '').rstrip('/')
+        self.key = key or os.getenv('SUPABASE_KEY')
+
+        if not self.url or not self.key:
+            raise ValueError("SUPABASE_URL e SUPABASE_KEY devem ser fornecidos")
+
+        self.headers = {
+            'apikey': self.key,
+            'Authorization': f'Bearer {self.key}',
+            'Content-Type': 'application/json',
+        }
+        self._session = session
+        self._owns_session = session is None
+        self._max_connections = max_connections
+        self._timeout = timeout
+
+    async def session(self) -> aiohttp.ClientSession:
+        """Sessão HTTP (criada no primeiro uso, dentro do event loop)"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._max_connections),
+                timeout=aiohttp.ClientTimeout(total=self._timeout)
+            )
+            self._owns_session = True
+        return self._session
+
+    async def close(self):
+        """Fecha a sessão, se ela pertencer a este cliente"""
+        if self._owns_session and self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _request(self, method: str, table: str, operation: str,
+                       params: Optional[Dict] = None, json_data=None,
+                       prefer: Optional[str] = None):
+        headers = self.headers
+        if prefer:
+            headers = {**headers, 'Prefer': prefer}
+
+        session = await self.session()
+        started = perf_counter()
+        try:
+            async with session.request(method, f"{self.url}/rest/v1/{table}",
+                                       headers=headers, params=params,
+                                       json=json_data) as response:
+                body = await response.read()
+                if response.status >= 400:
+                    raise SupabaseRESTError(response.status, body.decode(errors='replace'))
+        except Exception:
+            DB_QUERIES.labels(table, operation, 'error').inc()
+            raise
+        finally:
+            DB_QUERY_DURATION.labels(table, operation).observe(perf_counter() - started)
+
+        DB_QUERIES.labels(table, operation, 'ok').inc()
+        if not body:
+            return []
+        return await response.json(content_type=None)
+
+    async def select(self, table: str, filters: Optional[Dict[str, str]] = None,
+                     columns: str = '*', limit: Optional[int] = None,
+                     order: Optional[str] = None) -> List[Dict]:
+        """
+        Busca linhas de uma tabela
+
+        Args:
+            table: Nome da tabela
+            filters: Filtros PostgREST por coluna
+            columns: Colunas a retornar
+            limit: Máximo de linhas
+            order: Ordenação PostgREST (ex.: 'created_at.desc')
+
+        Returns:
+            Lista de linhas
+        """
+        params = {'select': columns, **(filters or {})}
+        if limit is not None:
+            params['limit'] = str(limit)
+        if order:
+            params['order'] = order
+        return await self._request('GET', table, 'select', params=params)
+
+    async def select_all(self, table: str, filters: Optional[Dict[str, str]] = None,
+                         columns: str = '*', order: str = 'id',
+                         page_size: int = 1000) -> List[Dict]:
+        """
+        Busca todas as linhas, em páginas de page_size (limit/offset)
+
+        O PostgREST corta cada resposta em max_rows (1000 no config.toml do
+        Supabase), então um select sem paginação perde o que passar disso.
+
+        Args:
+            table: Nome da tabela
+            filters: Filtros PostgREST por coluna
+            columns: Colunas a retornar
+            order: Ordenação estável, para as páginas não se sobreporem
+            page_size: Linhas por requisição (no máximo max_rows)
+
+        Returns:
+            Lista de linhas
+        """
+        rows: List[Dict] = []
+        while True:
+            page = await self.select(table, {**(filters or {}), 'offset': str(len(rows))},
+                                     columns=columns, limit=page_size, order=order)
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+
+    async def insert(self, table: str, rows, returning: bool = True) -> List[Dict]:
+        """Insere uma ou mais linhas"""
+        prefer = 'return=representation' if returning else 'return=minimal'
+        return await self._request('POST', table, 'insert', json_data=rows, prefer=prefer)
+
+    async def upsert(self, table: str, rows: List[Dict], on_conflict: str,
+                     ignore_duplicates: bool = False, returning: bool = False,
+                     chunk_size: int = 500) -> int:
+        """
+        Upsert em lote (INSERT ... ON CONFLICT), dividido em chunks
+
+        Args:
+            table: Nome da tabela
+            rows: Linhas (todas com as mesmas chaves)
+            on_conflict: Coluna(s) da constraint única
+            ignore_duplicates: Se True, conflitos são ignorados em vez de mesclados
+            returning: Se o PostgREST deve devolver as linhas
+            chunk_size: Máximo de linhas por requisição
+
+        Returns:
+            Número de linhas enviadas
+        """
+        if not rows:
+            return 0
+
+        resolution = 'ignore-duplicates' if ignore_duplicates else 'merge-duplicates'
+        prefer = f"resolution={resolution},return={'representation' if returning else 'minimal'}"
+        for start in range(0, len(rows), chunk_size):
+            await self._request(
+                'POST', table, 'upsert',
+                params={'on_conflict': on_conflict},
+                json_data=rows[start:start + chunk_size],
+                prefer=prefer
+            )
+        return len(rows)
+
+    async def update(self, table: str, values: Dict, filters: Dict[str, str]) -> List[Dict]:
+        """Atualiza as linhas que atendem aos filtros"""
+        return await self._request('PATCH', table, 'update', params=filters,
+                                   json_data=values, prefer='return=representation')
@@ -1,38 +1,109 @@
 """
 Configurações do sistema de sincronização
+
+Os valores vêm do ambiente (e do .env) e são resolvidos uma única vez, no
+primeiro acesso a um atributo de Config; importar este módulo não lê
+arquivos, não valida nada e não imprime avisos. Quem precisa das
+configurações obrigatórias chama Config.validate() explicitamente.
 """
 
 import os
-from dotenv import load_dotenv
+from typing import Any, Callable, Dict, Tuple
 
-# Carregar variáveis de ambiente
-load_dotenv()
 
+def _flag(value: str) -> bool:
+    return value.lower() == 'true'
 
-class Config:
-    """
-    Classe de configuração centralizada
-    """
-    
+
+# Atributo (= variável de ambiente) -> (valor padrão, conversão)
+_SETTINGS: Dict[str, Tuple[str, Callable[[str], Any]]] = {
     # Configurações do Supabase
-    SUPABASE_URL = os.getenv('SUPABASE_URL', '')
-    SUPABASE_KEY = os.getenv('SUPABASE_KEY', '')
+    'SUPABASE_URL': ('', str),
+    'SUPABASE_KEY': ('', str),
     
     # Configurações do iFood API
-    IFOOD_API_BASE_URL = os.getenv('IFOOD_API_BASE_URL', 'https://merchant-api.ifood.com.br')
-    IFOOD_API_TIMEOUT = int(os.getenv('IFOOD_API_TIMEOUT', '30'))
-    IFOOD_API_RETRY_ATTEMPTS = int(os.getenv('IFOOD_API_RETRY_ATTEMPTS', '3'))
+    'IFOOD_API_BASE_URL': ('https://merchant-api.ifood.com.br', str),
+    'IFOOD_API_TIMEOUT': ('30', int),
+    'IFOOD_API_RETRY_ATTEMPTS': ('3', int),
     
     # Configurações do Scheduler
-    SYNC_INTERVAL_MINUTES = int(os.getenv('SYNC_INTERVAL_MINUTES', '5'))
+    'SYNC_INTERVAL_MINUTES': ('5', int),
+    'SCHEDULER_JITTER_SECONDS': ('30', float),
+    'MISSED_RUN_POLICY': ('skip', str),  # skip | coalesce
     
     # Configurações de processamento
-    BATCH_SIZE = int(os.getenv('BATCH_SIZE', '100'))
-    MAX_CONCURRENT_MERCHANTS = int(os.getenv('MAX_CONCURRENT_MERCHANTS', '5'))
+    'BATCH_SIZE': ('100', int),
+    'MAX_CONCURRENT_MERCHANTS': ('5', int),
+    
+    # Modo de sincronização: 'products' (tabela products) ou 'catalog'
+    # (ifood_categories / ifood_items / ifood_option_groups / ifood_item_options)
+    'SYNC_MODE': ('products', str),
+    'UPSERT_CHUNK_SIZE': ('500', int),
+    
+    # Shutdown gracioso: prazo para concluir o merchant em andamento e
+    # arquivo com os merchants já concluídos do ciclo interrompido
+    'SHUTDOWN_GRACE_SECONDS': ('30', float),
+    'CHECKPOINT_FILE': ('sync_checkpoint.json', str),
+    
+    # Cache de tokens em disco (SQLite) compartilhado com a API e o refresh;
+    # vazio desativa. Exige TOKEN_CACHE_KEY (chave Fernet, criptografa os tokens)
+    'TOKEN_CACHE_FILE': ('', str),
+    'TOKEN_CACHE_KEY': ('', str),
+    
+    # Polling de eventos de pedidos (ifood_events / ifood_polling_log);
+    # o iFood exige uma consulta a cada 30 segundos
+    'EVENTS_POLLING_ENABLED': ('false', _flag),
+    'EVENTS_POLLING_INTERVAL_SECONDS': ('30', float),
+    'EVENTS_POLLING_CONCURRENCY': ('50', int),
+    # Acknowledgment em lotes de até 2000 eventos: espera máxima na fila e
+    # novas tentativas (com backoff) de um lote que falhou
+    'EVENTS_ACK_FLUSH_SECONDS': ('1', float),
+    'EVENTS_ACK_MAX_RETRIES': ('3', int),
+    # Deduplicação de reentregas antes do upsert em ifood_events: ids
+    # recentes exatos (LRU), capacidade e falsos positivos do Bloom filter
+    # por geração e eventos lidos do banco na subida
+    'EVENTS_DEDUP_LRU_SIZE': ('50000', int),
+    'EVENTS_DEDUP_BLOOM_CAPACITY': ('1000000', int),
+    'EVENTS_DEDUP_FALSE_POSITIVE_RATE': ('0.001', float),
+    'EVENTS_DEDUP_WARM_ROWS': ('50000', int),
+    
+    # Porta do endpoint /metrics (formato Prometheus); 0 desativa
+    'METRICS_PORT': ('9108', int),
     
     # Configurações de logging
-    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
-    LOG_FILE = os.getenv('LOG_FILE', 'ifood_sync.log')
+    'LOG_LEVEL': ('INFO', str),
+    'LOG_FILE': ('ifood_sync.log', str),
+    
+    # Configurações de performance
+    'ENABLE_CACHING': ('true', _flag),
+    'CACHE_TTL_SECONDS': ('300', int),
+    
+    # Configurações de modo de execução
+    'DRY_RUN': ('false', _flag),
+    'DEBUG_MODE': ('false', _flag),
+}
+
+
+class _LazyConfig(type):
+    """Metaclasse que resolve os atributos de _SETTINGS no primeiro acesso"""
+    
+    def __getattr__(cls, name):
+        # Só é chamado para atributos ainda não definidos na classe
+        if name not in _SETTINGS or cls._loaded:
+            raise AttributeError(f"Config não tem o atributo {name}")
+        cls.load()
+        return getattr(cls, name)
+
+
+class Config(metaclass=_LazyConfig):
+    """
+    Classe de configuração centralizada
+    
+    Os atributos de _SETTINGS (SUPABASE_URL, BATCH_SIZE...) são carregados
+    do ambiente no primeiro acesso e depois lidos como atributos comuns.
+    """
+    
+    _loaded = False
     
     # Configurações de validação
     REQUIRED_PRODUCT_FIELDS = ['item_id', 'merchant_id', 'name']
@@ -44,13 +115,25 @@ class Config:
     # Configurações de deduplicação
     DEDUP_KEY_FIELDS = ['merchant_id', 'item_id']
     
-    # Configurações de performance
-    ENABLE_CACHING = os.getenv('ENABLE_CACHING', 'true').lower() == 'true'
-    CACHE_TTL_SECONDS = int(os.getenv('CACHE_TTL_SECONDS', '300'))
+    @classmethod
+    def load(cls):
+        """Lê o .env e o ambiente (uma vez) e fixa os valores na classe"""
+        if cls._loaded:
+            return
+        from dotenv import load_dotenv
+        load_dotenv()
+        for name, (default, convert) in _SETTINGS.items():
+            setattr(cls, name, convert(os.getenv(name, default)))
+        cls._loaded = True
     
-    # Configurações de modo de execução
-    DRY_RUN = os.getenv('DRY_RUN', 'false').lower() == 'true'
-    DEBUG_MODE = os.getenv('DEBUG_MODE', 'false').lower() == 'true'
+    @classmethod
+    def reload(cls):
+        """Descarta os valores resolvidos (e ajustes feitos em runtime) e relê o ambiente"""
+        for name in _SETTINGS:
+            if name in cls.__dict__:
+                delattr(cls, name)
+        cls._loaded = False
+        cls.load()
     
     @classmethod
     def validate(cls):
@@ -90,11 +173,20 @@ class Config:
                 'retry_attempts': cls.IFOOD_API_RETRY_ATTEMPTS
             },
             'scheduler': {
-                'sync_interval_minutes': cls.SYNC_INTERVAL_MINUTES
+                'sync_interval_minutes': cls.SYNC_INTERVAL_MINUTES,
+                'jitter_seconds': cls.SCHEDULER_JITTER_SECONDS,
+                'missed_run_policy': cls.MISSED_RUN_POLICY,
+                'shutdown_grace_seconds': cls.SHUTDOWN_GRACE_SECONDS,
+                'checkpoint_file': cls.CHECKPOINT_FILE
             },
             'processing': {
                 'batch_size': cls.BATCH_SIZE,
-                'max_concurrent_merchants': cls.MAX_CONCURRENT_MERCHANTS
+                'max_concurrent_merchants': cls.MAX_CONCURRENT_MERCHANTS,
+                'sync_mode': cls.SYNC_MODE,
+                'upsert_chunk_size': cls.UPSERT_CHUNK_SIZE
+            },
+            'metrics': {
+                'port': cls.METRICS_PORT
             },
             'logging': {
                 'level': cls.LOG_LEVEL,
@@ -109,11 +201,3 @@ class Config:
                 'debug': cls.DEBUG_MODE
             }
         }
-
-
-# Validar configurações ao importar
-try:
-    Config.validate()
-except ValueError as e:
-    print(f"⚠️  Aviso de configuração: {e}")
-    print("Por favor, configure as variáveis de ambiente necessárias no arquivo .env")
\ No newline at end of file
@@ -0,0 +1,242 @@
+"""
+Deduplicação em memória dos event ids do polling
+
+O iFood reentrega um evento até receber o acknowledgment, então boa parte
+de cada rodada são ids já gravados em ifood_events. Antes do upsert os ids
+passam por duas camadas:
+
+- LRU dos ids gravados mais recentemente: acerto exato, o evento é
+  descartado sem ir ao banco;
+- Bloom filter rotativo (duas gerações) cobrindo uma janela bem maior com
+  pouca memória: um "não" é definitivo e o evento vai direto para o upsert;
+  um "talvez" é conferido no banco com um select só de event_id, em lote,
+  para que um falso positivo nunca descarte um evento novo.
+
+A taxa de falsos positivos só define quantos ids novos pagam essa
+conferência. Na subida, as duas camadas são aquecidas com os eventos mais
+recentes de ifood_events.
+"""
+
+import hashlib
+import logging
+import math
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+from async_supabase_client import AsyncSupabaseClient
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+EVENTS_DEDUP = REGISTRY.counter(
+    'ifood_events_dedup_total',
+    'Event ids verificados antes do upsert por resultado '
+    '(lru_hit, bloom_hit, bloom_false_positive, miss)',
+    ['result']
+)
+EVENTS_DEDUP_SIZE = REGISTRY.gauge(
+    'ifood_events_dedup_recent_ids',
+    'Event ids no LRU de deduplicação'
+)
+
+# Ids por select de conferência (a lista vai na query string)
+VERIFY_CHUNK_SIZE = 100
+
+
+class BloomFilter:
+    """Bloom filter de tamanho fixo dimensionado por capacidade e taxa de falsos positivos"""
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        """
+        Args:
+            capacity: Número de ids previstos
+            false_positive_rate: Taxa de falsos positivos com a capacidade cheia
+        """
+        capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str) -> Iterable[int]:
+        # Double hashing (Kirsch-Mitzenmacher) sobre um único digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(key))
+
+
+class RotatingBloomFilter:
+    """
+    Duas gerações de BloomFilter: quando a atual enche, a anterior é
+    descartada, mantendo a taxa de falsos positivos sob controle sem
+    crescer indefinidamente
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        """
+        Args:
+            capacity: Ids por geração (a janela coberta fica entre 1x e 2x)
+            false_positive_rate: Taxa total de falsos positivos (dividida
+                entre as duas gerações)
+        """
+        self.capacity = max(1, capacity)
+        self.false_positive_rate = false_positive_rate / 2
+        self.current = BloomFilter(self.capacity, self.false_positive_rate)
+        self.previous = None
+
+    def add(self, key: str):
+        if self.current.count >= self.capacity:
+            self.previous = self.current
+            self.current = BloomFilter(self.capacity, self.false_positive_rate)
+        self.current.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.current or (self.previous is not None and key in self.previous)
+
+
+class EventDeduplicator:
+    """
+    Filtra os eventos já gravados antes do upsert em ifood_events
+
+    Usado pelo IFoodEventsPoller: new_events() antes de gravar e
+    remember() só depois que a gravação deu certo.
+    """
+
+    def __init__(self, supabase: AsyncSupabaseClient, lru_size: int = 50_000,
+                 bloom_capacity: int = 1_000_000, false_positive_rate: float = 0.001,
+                 warm_rows: int = 50_000, page_size: int = 1000):
+        """
+        Args:
+            supabase: Cliente assíncrono do Supabase (ifood_events)
+            lru_size: Ids mais recentes guardados exatamente
+            bloom_capacity: Ids por geração do Bloom filter
+            false_positive_rate: Taxa de falsos positivos do Bloom filter
+            warm_rows: Eventos mais recentes lidos do banco na subida
+            page_size: Linhas por select no aquecimento
+        """
+        if not 0 < false_positive_rate < 1:
+            raise ValueError("false_positive_rate deve estar entre 0 e 1")
+        self.supabase = supabase
+        self.lru_size = max(1, lru_size)
+        self.warm_rows = warm_rows
+        self.page_size = page_size
+        self.bloom = RotatingBloomFilter(bloom_capacity, false_positive_rate)
+        self._recent: 'OrderedDict[str, None]' = OrderedDict()
+        self._checked = 0
+        self._dropped = 0
+
+    def remember(self, event_ids: Iterable[str]):
+        """Registra ids já gravados em ifood_events"""
+        recent = self._recent
+        for event_id in event_ids:
+            if event_id in recent:
+                recent.move_to_end(event_id)
+                continue
+            recent[event_id] = None
+            self.bloom.add(event_id)
+            if len(recent) > self.lru_size:
+                recent.popitem(last=False)
+        EVENTS_DEDUP_SIZE.set(len(recent))
+
+    def classify(self, event_ids: Iterable[str]) -> Tuple[List[str], List[str], List[str]]:
+        """
+        Separa ids pelas camadas em memória, sem ir ao banco
+
+        Returns:
+            (novos, duplicados no LRU, possíveis duplicados do Bloom filter)
+        """
+        new, known, maybe = [], [], []
+        for event_id in event_ids:
+            if event_id in self._recent:
+                self._recent.move_to_end(event_id)
+                known.append(event_id)
+            elif event_id in self.bloom:
+                maybe.append(event_id)
+            else:
+                new.append(event_id)
+        return new, known, maybe
+
+    async def stored_ids(self, event_ids: List[str]) -> set:
+        """Quais dos ids já estão em ifood_events (select só de event_id, em lotes)"""
+        stored = set()
+        for start in range(0, len(event_ids), VERIFY_CHUNK_SIZE):
+            chunk = event_ids[start:start + VERIFY_CHUNK_SIZE]
+            quoted = ','.join(f'"{event_id}"' for event_id in chunk)
+            rows = await self.supabase.select('ifood_events',
+                                              filters={'event_id': f'in.({quoted})'},
+                                              columns='event_id')
+            stored.update(row['event_id'] for row in rows)
+        return stored
+
+    async def new_events(self, events: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Separa as linhas de ifood_events em novas e já gravadas
+
+        Args:
+            events: Linhas com event_id único
+
+        Returns:
+            (linhas a gravar, linhas descartadas como duplicadas)
+        """
+        by_id = {event['event_id']: event for event in events}
+        new, known, maybe = self.classify(by_id)
+
+        confirmed = await self.stored_ids(maybe) if maybe else set()
+        false_positives = [event_id for event_id in maybe if event_id not in confirmed]
+        new.extend(false_positives)
+        known.extend(confirmed)
+
+        EVENTS_DEDUP.labels('lru_hit').inc(len(known) - len(confirmed))
+        EVENTS_DEDUP.labels('bloom_hit').inc(len(confirmed))
+        EVENTS_DEDUP.labels('bloom_false_positive').inc(len(false_positives))
+        EVENTS_DEDUP.labels('miss').inc(len(new) - len(false_positives))
+        self._checked += len(by_id)
+        self._dropped += len(known)
+        # Duplicados confirmados no banco voltam para o LRU
+        self.remember(confirmed)
+        return [by_id[event_id] for event_id in new], [by_id[event_id] for event_id in known]
+
+    async def warm(self) -> int:
+        """
+        Carrega os eventos mais recentes de ifood_events (falhas só geram log)
+
+        Returns:
+            Número de ids carregados
+        """
+        event_ids: List[str] = []
+        try:
+            while len(event_ids) < self.warm_rows:
+                limit = min(self.page_size, self.warm_rows - len(event_ids))
+                rows = await self.supabase.select(
+                    'ifood_events', filters={'offset': str(len(event_ids))},
+                    columns='event_id', limit=limit, order='received_at.desc'
+                )
+                event_ids.extend(row['event_id'] for row in rows)
+                if len(rows) < limit:
+                    break
+        except Exception as e:
+            logger.error(f"❌ Erro ao aquecer a deduplicação de eventos: {e}")
+
+        # Do mais antigo para o mais recente, para o LRU manter os últimos
+        self.remember(reversed(event_ids))
+        logger.info(f"🧠 Deduplicação de eventos aquecida com {len(event_ids)} ids")
+        return len(event_ids)
+
+    def stats(self) -> Dict:
+        """Ids verificados, descartados e taxa de acerto desde a subida"""
+        return {
+            'checked': self._checked,
+            'dropped': self._dropped,
+            'hit_rate': self._dropped / self._checked if self._checked else 0.0,
+            'recent_ids': len(self._recent),
+        }
@@ -0,0 +1,429 @@
+"""
+Polling de eventos de pedidos do iFood
+
+A cada rodada (30 segundos, exigência do iFood) consulta os eventos de
+todos os merchants cadastrados, em lotes de até 100 merchants do mesmo
+token por requisição (header x-polling-merchants). Os eventos são
+gravados em ifood_events com um upsert em lote idempotente em event_id
+(reentregas do iFood viram conflitos ignorados) e cada consulta registra
+uma linha em ifood_polling_log. Reentregas já conhecidas são descartadas
+em memória pelo EventDeduplicator antes do upsert, e todos os eventos
+gravados (ou já existentes) são confirmados ao
+iFood em lotes pelo AcknowledgmentBatcher. Os pedidos dos eventos são
+gravados em ifood_orders pelo OrderIngestor, e um evento de pedido só é
+confirmado depois que o pedido foi gravado. As consultas de uma rodada
+rodam em paralelo no mesmo event loop, limitadas por um semáforo, para
+atender milhares de merchants em um único processo.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from ack_batcher import AcknowledgmentBatcher
+from async_ifood_api_client import AsyncIFoodAPIClient
+from async_supabase_client import AsyncSupabaseClient
+from config import Config
+from event_dedup import EventDeduplicator
+from metrics import REGISTRY
+from order_ingestion import OrderIngestor
+from token_store import parse_expires_at
+
+logger = logging.getLogger(__name__)
+
+EVENTS_POLLS = REGISTRY.counter(
+    'ifood_events_polls_total',
+    'Consultas de polling de eventos por resultado',
+    ['result']
+)
+EVENTS_RECEIVED = REGISTRY.counter(
+    'ifood_events_received_total',
+    'Eventos recebidos do polling (inclui reentregas)'
+)
+EVENTS_ROUND_DURATION = REGISTRY.histogram(
+    'ifood_events_polling_round_duration_seconds',
+    'Duração de uma rodada de polling (todas as consultas e gravações)'
+)
+
+EVENT_CONFLICT = "event_id"
+
+# Limite de merchants por consulta no header x-polling-merchants
+MAX_POLLING_MERCHANTS = 100
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass
+class PollTarget:
+    """Merchants consultados com o token de um usuário"""
+    user_id: str
+    access_token: str
+    merchant_ids: List[str]
+
+
+def event_row(event: Dict, user_id: str, polling_batch_id: str, received_at: str,
+              merchant_id: Optional[str] = None) -> Dict:
+    """
+    Linha de ifood_events para um evento do polling
+
+    Args:
+        event: Evento como veio do iFood (id, code, fullCode, orderId, merchantId...)
+        user_id: Dono do token usado na consulta
+        polling_batch_id: id da linha de ifood_polling_log da consulta
+        received_at: Horário da consulta (ISO-8601)
+        merchant_id: Merchant a usar se o evento não trouxer merchantId
+    """
+    return {
+        'event_id': event['id'],
+        'user_id': user_id,
+        'merchant_id': event.get('merchantId') or merchant_id,
+        'event_type': event.get('fullCode') or event.get('code') or 'UNKNOWN',
+        'event_category': 'ORDER' if event.get('orderId') else event.get('group'),
+        'event_data': event,
+        'polling_batch_id': polling_batch_id,
+        'received_at': received_at,
+    }
+
+
+class IFoodEventsPoller:
+    """
+    Serviço de polling de eventos (serve/stop, compatível com o supervisor)
+
+    Tokens e merchants são relidos do banco a cada targets_reload_seconds
+    (e antes, se o iFood recusar um token).
+    """
+
+    def __init__(self, supabase: AsyncSupabaseClient, ifood: AsyncIFoodAPIClient,
+                 interval: float = 30.0, concurrency: int = 50,
+                 targets_reload_seconds: float = 300.0, chunk_size: int = 500,
+                 merchants_per_poll: int = MAX_POLLING_MERCHANTS,
+                 ack_batcher: Optional[AcknowledgmentBatcher] = None,
+                 dedup: Optional[EventDeduplicator] = None,
+                 order_ingestor: Optional[OrderIngestor] = None):
+        """
+        Args:
+            supabase: Cliente assíncrono do Supabase
+            ifood: Cliente assíncrono da API de pedidos do iFood
+            interval: Segundos entre rodadas de polling
+            concurrency: Consultas simultâneas ao iFood
+            targets_reload_seconds: Intervalo de releitura de tokens e merchants
+            chunk_size: Linhas por requisição nas gravações em lote
+            merchants_per_poll: Merchants por consulta (até MAX_POLLING_MERCHANTS)
+            ack_batcher: Confirma os eventos depois de gravados (padrão: um
+                AcknowledgmentBatcher com os mesmos clientes)
+            dedup: Descarta reentregas já gravadas antes do upsert (padrão:
+                um EventDeduplicator com o mesmo cliente do Supabase)
+            order_ingestor: Grava os pedidos dos eventos em ifood_orders
+                (padrão: um OrderIngestor com os mesmos clientes)
+        """
+        self.supabase = supabase
+        self.ifood = ifood
+        self.interval = interval
+        self.concurrency = max(1, concurrency)
+        self.targets_reload_seconds = targets_reload_seconds
+        self.chunk_size = chunk_size
+        self.merchants_per_poll = max(1, min(merchants_per_poll, MAX_POLLING_MERCHANTS))
+        self.ack_batcher = ack_batcher or AcknowledgmentBatcher(supabase, ifood)
+        self.dedup = dedup or EventDeduplicator(supabase)
+        self.order_ingestor = order_ingestor or OrderIngestor(
+            supabase, ifood, concurrency=self.concurrency, chunk_size=chunk_size
+        )
+        self.scheduler = None
+        self._targets: List[PollTarget] = []
+        self._targets_loaded_at = 0.0
+
+    async def load_targets(self) -> List[PollTarget]:
+        """
+        Tokens válidos e os merchants de cada usuário
+
+        Returns:
+            Um PollTarget por usuário com token e merchants
+        """
+        # Paginado: acima de max_rows linhas um select único perderia merchants
+        tokens = await self.supabase.select_all(
+            'ifood_tokens', columns='user_id,access_token,expires_at'
+        )
+        merchants = await self.supabase.select_all(
+            'ifood_merchants', columns='merchant_id,user_id'
+        )
+
+        # Token mais recente de cada usuário, se ainda válido
+        now = time.time()
+        best: Dict[str, Dict] = {}
+        for token in tokens:
+            user_id = token.get('user_id')
+            expires_at = parse_expires_at(token.get('expires_at'))
+            if not user_id or not token.get('access_token') or expires_at <= now:
+                continue
+            current = best.get(user_id)
+            if current is None or expires_at > parse_expires_at(current.get('expires_at')):
+                best[user_id] = token
+
+        merchant_ids: Dict[str, List[str]] = {}
+        for merchant in merchants:
+            if merchant.get('user_id') in best and merchant.get('merchant_id'):
+                merchant_ids.setdefault(merchant['user_id'], []).append(merchant['merchant_id'])
+
+        targets = [
+            PollTarget(user_id, best[user_id]['access_token'], ids)
+            for user_id, ids in merchant_ids.items()
+        ]
+        logger.info(f"📡 Polling de eventos: {sum(len(t.merchant_ids) for t in targets)} "
+                    f"merchants de {len(targets)} usuários")
+        return targets
+
+    async def targets(self) -> List[PollTarget]:
+        """Alvos atuais, relidos do banco quando vencidos"""
+        if time.monotonic() - self._targets_loaded_at >= self.targets_reload_seconds:
+            self._targets = await self.load_targets()
+            self._targets_loaded_at = time.monotonic()
+        return self._targets
+
+    def poll_requests(self, target: PollTarget) -> List[List[str]]:
+        """
+        Filtros de merchants das consultas de um alvo
+
+        Os merchants do token são divididos em lotes de até
+        merchants_per_poll, cada um consultado com uma única requisição
+        (header x-polling-merchants), em vez de uma por merchant.
+        """
+        size = self.merchants_per_poll
+        return [target.merchant_ids[start:start + size]
+                for start in range(0, len(target.merchant_ids), size)]
+
+    @staticmethod
+    def events_by_merchant(events: List[Dict]) -> Dict[Optional[str], List[Dict]]:
+        """Separa as linhas de ifood_events de uma consulta em lote por merchant"""
+        grouped: Dict[Optional[str], List[Dict]] = {}
+        for event in events:
+            grouped.setdefault(event['merchant_id'], []).append(event)
+        return grouped
+
+    async def poll(self, target: PollTarget, merchant_ids: List[str],
+                   semaphore: asyncio.Semaphore):
+        """
+        Uma consulta ao iFood
+
+        Returns:
+            (linhas de ifood_events, linha de ifood_polling_log)
+        """
+        async with semaphore:
+            started_at = _now()
+            started = time.perf_counter()
+            response = await self.ifood.poll_events(target.access_token, merchant_ids)
+
+            batch_id = str(uuid.uuid4())
+            received_at = started_at.isoformat()
+            # Eventos sem merchantId só podem ser atribuídos em consultas de um merchant
+            fallback_merchant = merchant_ids[0] if len(merchant_ids) == 1 else None
+            events = [
+                event_row(event, target.user_id, batch_id, received_at, fallback_merchant)
+                for event in (response.data or []) if isinstance(event, dict) and event.get('id')
+            ]
+            completed_at = _now()
+
+        unexpected = self.events_by_merchant(events).keys() - set(merchant_ids)
+        if unexpected:
+            logger.warning(f"⚠️ Eventos de merchants fora do filtro da consulta: "
+                           f"{', '.join(str(m) for m in unexpected)}")
+
+        if response.status == 401:
+            # Token renovado ou revogado: relê os tokens na próxima rodada
+            self._targets_loaded_at = 0.0
+        EVENTS_POLLS.labels('ok' if response.ok else 'error').inc()
+        EVENTS_RECEIVED.inc(len(events))
+
+        log_row = {
+            'id': batch_id,
+            'user_id': target.user_id,
+            'polling_timestamp': received_at,
+            'polling_duration_ms': int((time.perf_counter() - started) * 1000),
+            'events_received': len(events),
+            'events_processed': 0,
+            'events_failed': 0,
+            'api_response_time_ms': response.response_time_ms,
+            'api_status_code': response.status or None,
+            'api_error_message': response.error,
+            'success': response.ok,
+            'error_message': None if response.ok else (response.error or f"HTTP {response.status}"),
+            'merchant_filter': ','.join(merchant_ids),
+            'started_at': received_at,
+            'completed_at': completed_at.isoformat(),
+            'next_polling_at': (started_at + timedelta(seconds=self.interval)).isoformat(),
+        }
+        return events, log_row
+
+    async def store_events(self, events: List[Dict]) -> Optional[str]:
+        """
+        Grava os eventos em lote; eventos já gravados são ignorados
+
+        Reentregas reconhecidas pelo EventDeduplicator nem chegam ao banco;
+        as demais viram conflitos ignorados no upsert.
+
+        Returns:
+            None em caso de sucesso, ou a mensagem de erro
+        """
+        unique = list({event['event_id']: event for event in events}.values())
+        try:
+            new, _ = await self.dedup.new_events(unique)
+            if new:
+                await self.supabase.upsert('ifood_events', new, on_conflict=EVENT_CONFLICT,
+                                           ignore_duplicates=True, chunk_size=self.chunk_size)
+            self.dedup.remember(event['event_id'] for event in new)
+            return None
+        except Exception as e:
+            logger.error(f"❌ Erro ao gravar {len(unique)} eventos: {e}")
+            return str(e)
+
+    async def ingest_orders(self, events: List[Dict],
+                            tokens: Dict[str, str]) -> Tuple[Dict, Set[str]]:
+        """
+        Grava os pedidos dos eventos da rodada
+
+        Entram também as reentregas: o iFood só reentrega o que não foi
+        confirmado, e um evento de pedido só é confirmado depois que o
+        pedido foi gravado, então a reentrega é a nova tentativa.
+
+        Returns:
+            (estatísticas, event ids que não devem ser confirmados)
+        """
+        unique = list({event['event_id']: event for event in events}.values())
+        try:
+            stats = await self.order_ingestor.ingest(unique, tokens)
+            return stats, set(stats['failed_event_ids'])
+        except Exception as e:
+            logger.error(f"❌ Erro na ingestão de pedidos: {e}")
+            return {'stored': 0}, {event['event_id'] for event in unique
+                                   if event['event_data'].get('orderId')}
+
+    async def store_polling_logs(self, log_rows: List[Dict]):
+        """Grava as linhas de ifood_polling_log da rodada"""
+        try:
+            for start in range(0, len(log_rows), self.chunk_size):
+                await self.supabase.insert('ifood_polling_log',
+                                           log_rows[start:start + self.chunk_size],
+                                           returning=False)
+        except Exception as e:
+            logger.error(f"❌ Erro ao gravar log de polling: {e}")
+
+    async def poll_round(self) -> Dict:
+        """
+        Uma rodada: consulta todos os merchants e grava eventos e logs em lote
+
+        Returns:
+            Estatísticas da rodada
+        """
+        round_started = time.perf_counter()
+        try:
+            targets = await self.targets()
+        except Exception as e:
+            logger.error(f"❌ Erro ao carregar tokens e merchants: {e}")
+            return {'polls': 0, 'merchants': 0, 'events': 0, 'merchants_with_events': 0,
+                    'failed_polls': 0, 'orders': 0}
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(
+            self.poll(target, merchant_ids, semaphore)
+            for target in targets
+            for merchant_ids in self.poll_requests(target)
+        ))
+
+        events = [event for rows, _ in results for event in rows]
+        log_rows = [log_row for _, log_row in results]
+        orders = {'stored': 0}
+        if events:
+            error = await self.store_events(events)
+            tokens = {target.user_id: target.access_token for target in targets}
+            held: Set[str] = set()
+            if error is None:
+                orders, held = await self.ingest_orders(events, tokens)
+            for rows, log_row in results:
+                if not rows:
+                    continue
+                if error is None:
+                    log_row['events_processed'] = len(rows)
+                    # Só confirma o que já está no banco (e, para eventos de
+                    # pedido, com o pedido gravado): o resto é reentregue
+                    self.ack_batcher.add(log_row['user_id'], tokens[log_row['user_id']],
+                                         [row['event_id'] for row in rows
+                                          if row['event_id'] not in held])
+                else:
+                    log_row['events_failed'] = len(rows)
+                    log_row['success'] = False
+                    log_row['error_message'] = f"Erro ao gravar eventos: {error}"
+        await self.store_polling_logs(log_rows)
+
+        elapsed = time.perf_counter() - round_started
+        EVENTS_ROUND_DURATION.observe(elapsed)
+        failed = sum(1 for log_row in log_rows if not log_row['success'])
+        merchants = sum(len(target.merchant_ids) for target in targets)
+        merchants_with_events = len(self.events_by_merchant(events))
+        if events or failed:
+            logger.info(f"📬 Rodada de polling: {len(log_rows)} consultas para {merchants} merchants, "
+                        f"{len(events)} eventos de {merchants_with_events} merchants, "
+                        f"{failed} falhas em {elapsed:.2f}s")
+        if elapsed > self.interval:
+            logger.warning(f"⚠️ Rodada de polling levou {elapsed:.1f}s "
+                           f"(intervalo {self.interval:.0f}s)")
+        return {'polls': len(log_rows), 'merchants': merchants, 'events': len(events),
+                'merchants_with_events': merchants_with_events, 'failed_polls': failed,
+                'orders': orders['stored']}
+
+    async def serve(self):
+        """Executa uma rodada a cada interval segundos até stop()"""
+        from job_scheduler import AsyncJobScheduler
+
+        self.scheduler = AsyncJobScheduler()
+        self.scheduler.add_job(
+            'events_polling',
+            self.poll_round,
+            interval=self.interval,
+            deadline=self.interval
+        )
+        await self.dedup.warm()
+        ack_task = asyncio.create_task(self.ack_batcher.run(), name="events:ack")
+        try:
+            await self.scheduler.run()
+        finally:
+            self.ack_batcher.stop()
+            await ack_task
+            await self.ifood.close()
+            await self.supabase.close()
+
+    def stop(self):
+        """Para de agendar rodadas; a rodada em andamento termina"""
+        if self.scheduler is not None:
+            self.scheduler.stop()
+
+
+def build_events_poller() -> IFoodEventsPoller:
+    """Poller configurado por Config (SUPABASE_*, IFOOD_API_BASE_URL, EVENTS_*)"""
+    concurrency = Config.EVENTS_POLLING_CONCURRENCY
+    supabase = AsyncSupabaseClient(Config.SUPABASE_URL, Config.SUPABASE_KEY)
+    ifood = AsyncIFoodAPIClient(max_connections=concurrency, timeout=Config.IFOOD_API_TIMEOUT)
+    return IFoodEventsPoller(
+        supabase,
+        ifood,
+        interval=Config.EVENTS_POLLING_INTERVAL_SECONDS,
+        concurrency=concurrency,
+        chunk_size=Config.UPSERT_CHUNK_SIZE,
+        ack_batcher=AcknowledgmentBatcher(
+            supabase,
+            ifood,
+            flush_interval=Config.EVENTS_ACK_FLUSH_SECONDS,
+            max_retries=Config.EVENTS_ACK_MAX_RETRIES
+        ),
+        dedup=EventDeduplicator(
+            supabase,
+            lru_size=Config.EVENTS_DEDUP_LRU_SIZE,
+            bloom_capacity=Config.EVENTS_DEDUP_BLOOM_CAPACITY,
+            false_positive_rate=Config.EVENTS_DEDUP_FALSE_POSITIVE_RATE,
+            warm_rows=Config.EVENTS_DEDUP_WARM_ROWS
+        )
+    )
@@ -5,11 +5,24 @@ Cliente para integração com a API do iFood
 import logging
 import requests
 from typing import List, Dict, Optional
-from time import sleep
+from time import perf_counter, sleep
 from urllib.parse import urljoin
 
+from metrics import REGISTRY
+
 logger = logging.getLogger(__name__)
 
+API_REQUESTS = REGISTRY.counter(
+    'ifood_api_requests_total',
+    'Requisições à API do iFood por método e status HTTP',
+    ['method', 'status']
+)
+API_REQUEST_DURATION = REGISTRY.histogram(
+    'ifood_api_request_duration_seconds',
+    'Duração das requisições à API do iFood',
+    ['method']
+)
+
 
 class IFoodAPIClient:
     """
@@ -19,21 +32,24 @@ class IFoodAPIClient:
     BASE_URL = "https://merchant-api.ifood.com.br"
     CATALOG_V2_PATH = "/catalog/v2.0"
     
-    def __init__(self, timeout: int = 30, retry_attempts: int = 3):
+    def __init__(self, timeout: int = 30, retry_attempts: int = 3,
+                 session: Optional[requests.Session] = None):
         """
         Inicializa o cliente da API do iFood
         
         Args:
             timeout: Timeout para requisições em segundos
             retry_attempts: Número de tentativas em caso de erro
+            session: Sessão HTTP compartilhada (pool de conexões); seus headers
+                padrão não são alterados, já que outros componentes a usam
         """
         self.timeout = timeout
         self.retry_attempts = retry_attempts
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.session = session or requests.Session()
+        self.default_headers = {
             'Accept': 'application/json',
             'Content-Type': 'application/json'
-        })
+        }
         logger.info("Cliente iFood API inicializado")
     
     def _make_request(self, method: str, url: str, headers: Dict = None, 
@@ -54,17 +70,26 @@ class IFoodAPIClient:
         for attempt in range(self.retry_attempts):
             try:
                 request_headers = self.session.headers.copy()
+                request_headers.update(self.default_headers)
                 if headers:
                     request_headers.update(headers)
                 
-                response = self.session.request(
-                    method=method,
-                    url=url,
-                    headers=request_headers,
-                    params=params,
-                    json=json_data,
-                    timeout=self.timeout
-                )
+                started = perf_counter()
+                try:
+                    response = self.session.request(
+                        method=method,
+                        url=url,
+                        headers=request_headers,
+                        params=params,
+                        json=json_data,
+                        timeout=self.timeout
+                    )
+                except requests.exceptions.RequestException:
+                    API_REQUESTS.labels(method, 'error').inc()
+                    raise
+                finally:
+                    API_REQUEST_DURATION.labels(method).observe(perf_counter() - started)
+                API_REQUESTS.labels(method, str(response.status_code)).inc()
                 
                 response.raise_for_status()
                 
@@ -0,0 +1,29 @@
+"""
+Modelos tipados (pydantic v2) para os payloads da API do iFood
+
+Os modelos ignoram campos extras e expõem os campos em snake_case (com alias
+camelCase da API). OAuthToken é o modelo da resposta OAuth usado pelos
+serviços de token, validado direto dos bytes da resposta.
+"""
+
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+from pydantic.alias_generators import to_camel
+
+
+class IFoodModel(BaseModel):
+    """Base dos modelos: aliases camelCase e campos extras ignorados"""
+
+    model_config = ConfigDict(
+        alias_generator=to_camel,
+        populate_by_name=True,
+        extra='ignore'
+    )
+
+
+class OAuthToken(IFoodModel):
+    """Resposta do endpoint /authentication/v1.0/oauth/token"""
+    access_token: str
+    type: Optional[str] = None
+    expires_in: int
@@ -0,0 +1,220 @@
+"""
+Agendador assíncrono de jobs periódicos
+
+Substitui o loop de polling da biblioteca `schedule`:
+- single-flight: cada job roda no máximo uma vez por vez
+- política para execuções perdidas quando um ciclo estoura o intervalo
+  ('skip' descarta os ticks perdidos, 'coalesce' junta todos em uma execução
+  imediata)
+- jitter aleatório para que instâncias diferentes não disparem no mesmo minuto
+- acompanhamento de deadline (duração máxima esperada de cada execução)
+- intervalo dinâmico: se o job retorna um número, a próxima execução
+  acontece após esse número de segundos (ex.: até o próximo token vencer)
+"""
+
+import asyncio
+import inspect
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+SKIP = 'skip'
+COALESCE = 'coalesce'
+MISSED_RUN_POLICIES = (SKIP, COALESCE)
+
+
+@dataclass
+class Job:
+    """Definição e estado de um job periódico"""
+    name: str
+    func: Callable[[], Any]
+    interval: float
+    jitter: float = 0.0
+    missed_run_policy: str = SKIP
+    deadline: Optional[float] = None
+    run_immediately: bool = True
+
+    # Estado de execução
+    running: bool = False
+    runs: int = 0
+    failures: int = 0
+    missed_runs: int = 0
+    deadline_misses: int = 0
+    last_started_at: Optional[float] = None
+    last_duration: Optional[float] = None
+    next_run_at: Optional[float] = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado atual do job (para logs e métricas)"""
+        return {
+            'name': self.name,
+            'running': self.running,
+            'runs': self.runs,
+            'failures': self.failures,
+            'missed_runs': self.missed_runs,
+            'deadline_misses': self.deadline_misses,
+            'last_duration': self.last_duration,
+            'next_run_at': self.next_run_at,
+        }
+
+
+class AsyncJobScheduler:
+    """
+    Executa jobs periódicos em um único event loop
+
+    Funções síncronas rodam em threads (asyncio.to_thread) para não bloquear
+    o loop; corrotinas são aguardadas diretamente.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, Job] = {}
+        self._stop_event: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def add_job(self, name: str, func: Callable[[], Any], interval: float,
+                jitter: float = 0.0, missed_run_policy: str = SKIP,
+                deadline: Optional[float] = None,
+                run_immediately: bool = True) -> Job:
+        """
+        Registra um job
+
+        Args:
+            name: Nome único do job
+            func: Função ou corrotina sem argumentos; se retornar um número,
+                ele substitui o intervalo até a próxima execução
+            interval: Intervalo entre execuções em segundos
+            jitter: Atraso aleatório máximo (segundos) somado a cada execução
+            missed_run_policy: 'skip' ou 'coalesce'
+            deadline: Duração máxima esperada (segundos); estouros são contados
+            run_immediately: Se a primeira execução acontece na partida
+
+        Returns:
+            O Job registrado
+        """
+        if name in self.jobs:
+            raise ValueError(f"Job já registrado: {name}")
+        if missed_run_policy not in MISSED_RUN_POLICIES:
+            raise ValueError(f"Política inválida: {missed_run_policy}")
+        if interval <= 0:
+            raise ValueError("interval deve ser positivo")
+
+        job = Job(
+            name=name,
+            func=func,
+            interval=interval,
+            jitter=jitter,
+            missed_run_policy=missed_run_policy,
+            deadline=deadline,
+            run_immediately=run_immediately
+        )
+        self.jobs[name] = job
+        return job
+
+    async def run(self):
+        """Executa todos os jobs até stop() ser chamado"""
+        self._stop_event = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._tasks = [
+            asyncio.create_task(self._job_loop(job), name=f"job:{job.name}")
+            for job in self.jobs.values()
+        ]
+        logger.info(f"⏰ Agendador iniciado com {len(self._tasks)} jobs")
+
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            logger.info("🛑 Agendador encerrado")
+
+    def stop(self):
+        """
+        Pede o encerramento: jobs em execução terminam, novos não começam
+
+        Pode ser chamado de handlers de sinal e de outras threads: o evento é
+        marcado via call_soon_threadsafe, que também acorda o loop.
+        """
+        if self._stop_event is None:
+            return
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+        else:
+            self._stop_event.set()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop_event is not None and self._stop_event.is_set()
+
+    @property
+    def running_jobs(self) -> List[str]:
+        """Nomes dos jobs em execução neste momento"""
+        return [job.name for job in self.jobs.values() if job.running]
+
+    async def _sleep_until(self, deadline: float) -> bool:
+        """Dorme até o horário (time.monotonic); retorna False se parado antes"""
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+        return not self.stopping
+
+    async def _job_loop(self, job: Job):
+        """Loop de um job: o await sequencial garante o single-flight"""
+        base = time.monotonic()
+        if not job.run_immediately:
+            base += job.interval
+
+        while not self.stopping:
+            job.next_run_at = base + random.uniform(0, job.jitter)
+            if not await self._sleep_until(job.next_run_at):
+                break
+
+            next_delay = await self._execute(job)
+
+            if isinstance(next_delay, (int, float)) and not isinstance(next_delay, bool):
+                # O próprio job decidiu quando rodar de novo
+                base = time.monotonic() + max(0.0, next_delay)
+                continue
+
+            # Próximo tick na grade do intervalo, tratando ticks perdidos
+            base += job.interval
+            now = time.monotonic()
+            if now > base:
+                missed = int((now - base) // job.interval) + 1
+                if job.missed_run_policy == COALESCE:
+                    job.missed_runs += missed - 1
+                    base = now
+                    logger.warning(f"⚠️ Job {job.name} atrasado: {missed} execuções agrupadas em uma")
+                else:
+                    job.missed_runs += missed
+                    base += missed * job.interval
+                    logger.warning(f"⚠️ Job {job.name} atrasado: {missed} execuções puladas")
+
+    async def _execute(self, job: Job) -> Any:
+        """Executa o job uma vez, registrando duração, falhas e deadline"""
+        job.running = True
+        job.runs += 1
+        job.last_started_at = time.monotonic()
+        try:
+            if inspect.iscoroutinefunction(job.func):
+                return await job.func()
+            return await asyncio.to_thread(job.func)
+        except Exception as e:
+            job.failures += 1
+            logger.error(f"❌ Erro no job {job.name}: {e}")
+            return None
+        finally:
+            job.running = False
+            job.last_duration = time.monotonic() - job.last_started_at
+            if job.deadline is not None and job.last_duration > job.deadline:
+                job.deadline_misses += 1
+                logger.warning(
+                    f"⏱️ Job {job.name} excedeu o deadline: "
+                    f"{job.last_duration:.1f}s > {job.deadline:.1f}s"
+                )
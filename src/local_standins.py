@@ -0,0 +1,405 @@
+"""
+Substitutos locais do Supabase e da API do iFood
+
+Permitem rodar e medir a sincronização sem rede e de forma reproduzível:
+- SQLiteSupabaseClient: SupabaseClient cujo query builder grava em SQLite
+  (subconjunto do supabase-py usado pelo projeto: select/insert/update/
+  upsert/delete com filtros eq/neq/in_/gt/gte/lt/lte, order e limit)
+- SimulatedIFoodAPI: gera catálogos determinísticos (seed) com a mesma
+  interface de IFoodAPIClient
+- seed_simulation: popula ifood_tokens e ifood_merchants no SQLite
+"""
+
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from supabase_client import SupabaseClient
+
+logger = logging.getLogger(__name__)
+
+
+class _Response:
+    """Resposta no formato do supabase-py (apenas .data e .count)"""
+
+    def __init__(self, data: List[Dict], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class _SQLiteQuery:
+    """Query builder encadeável, executado contra o SQLiteStore"""
+
+    _OPERATORS = {'eq': '=', 'neq': '!=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+    def __init__(self, store: 'SQLiteStore', table: str):
+        self._store = store
+        self._table = table
+        self._operation = 'select'
+        self._columns = '*'
+        self._payload: Any = None
+        self._on_conflict: Optional[str] = None
+        self._filters: List[tuple] = []
+        self._order: Optional[tuple] = None
+        self._limit: Optional[int] = None
+
+    # Operações
+    def select(self, columns: str = '*', count: Optional[str] = None):
+        self._operation = 'select'
+        self._columns = columns
+        return self
+
+    def insert(self, rows, **kwargs):
+        self._operation = 'insert'
+        self._payload = rows
+        return self
+
+    def upsert(self, rows, on_conflict: str = '', **kwargs):
+        self._operation = 'upsert'
+        self._payload = rows
+        self._on_conflict = on_conflict or 'id'
+        return self
+
+    def update(self, values: Dict, **kwargs):
+        self._operation = 'update'
+        self._payload = values
+        return self
+
+    def delete(self, **kwargs):
+        self._operation = 'delete'
+        return self
+
+    # Filtros
+    def __getattr__(self, name):
+        if name in self._OPERATORS:
+            def compare(column: str, value: Any):
+                self._filters.append((column, self._OPERATORS[name], value))
+                return self
+            return compare
+        raise AttributeError(name)
+
+    def in_(self, column: str, values: Iterable):
+        self._filters.append((column, 'IN', list(values)))
+        return self
+
+    def order(self, column: str, desc: bool = False, **kwargs):
+        self._order = (column, desc)
+        return self
+
+    def limit(self, size: int, **kwargs):
+        self._limit = size
+        return self
+
+    def execute(self) -> _Response:
+        return self._store.execute(self)
+
+
+class SQLiteStore:
+    """
+    Banco SQLite com uma tabela por tabela lógica, cada linha em JSON
+
+    Índices de expressão (json_extract) são criados na primeira vez em que
+    uma coluna é filtrada, como os índices que existem no Postgres.
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._tables = set()
+        self._indexes = set()
+
+    def table(self, table_name: str) -> _SQLiteQuery:
+        return _SQLiteQuery(self, table_name)
+
+    def _ensure_table(self, table: str):
+        if table not in self._tables:
+            self._conn.execute(
+                f'CREATE TABLE IF NOT EXISTS "{table}" (rowid INTEGER PRIMARY KEY, data TEXT NOT NULL)'
+            )
+            self._tables.add(table)
+
+    def _ensure_index(self, table: str, column: str):
+        if (table, column) not in self._indexes:
+            self._conn.execute(
+                f'CREATE INDEX IF NOT EXISTS "idx_{table}_{column}" '
+                f'ON "{table}" (json_extract(data, \'$.{column}\'))'
+            )
+            self._indexes.add((table, column))
+
+    def _where(self, table: str, filters: List[tuple]):
+        clauses, params = [], []
+        for column, operator, value in filters:
+            self._ensure_index(table, column)
+            expression = f"json_extract(data, '$.{column}')"
+            if operator == 'IN':
+                if not value:
+                    clauses.append('0')
+                    continue
+                clauses.append(f"{expression} IN ({','.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                clauses.append(f'{expression} {operator} ?')
+                params.append(value)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def _select_rows(self, query: _SQLiteQuery) -> List[tuple]:
+        where, params = self._where(query._table, query._filters)
+        sql = f'SELECT rowid, data FROM "{query._table}"{where}'
+        if query._order:
+            column, desc = query._order
+            sql += f" ORDER BY json_extract(data, '$.{column}') {'DESC' if desc else 'ASC'}"
+        if query._limit is not None:
+            sql += f' LIMIT {int(query._limit)}'
+        return self._conn.execute(sql, params).fetchall()
+
+    def execute(self, query: _SQLiteQuery) -> _Response:
+        with self._lock:
+            self._ensure_table(query._table)
+            handler = getattr(self, f'_execute_{query._operation}')
+            with self._conn:
+                return handler(query)
+
+    def _execute_select(self, query: _SQLiteQuery) -> _Response:
+        rows = [json.loads(data) for _, data in self._select_rows(query)]
+        if query._columns.strip() != '*':
+            columns = [c.strip() for c in query._columns.split(',')]
+            rows = [{c: row.get(c) for c in columns} for row in rows]
+        return _Response(rows, count=len(rows))
+
+    def _insert_one(self, table: str, row: Dict) -> Dict:
+        cursor = self._conn.execute(f'INSERT INTO "{table}" (data) VALUES (?)', (json.dumps(row),))
+        if 'id' not in row:
+            # Simula a chave serial gerada pelo banco
+            row = {**row, 'id': cursor.lastrowid}
+            self._conn.execute(f'UPDATE "{table}" SET data = ? WHERE rowid = ?',
+                               (json.dumps(row), cursor.lastrowid))
+        return row
+
+    def _execute_insert(self, query: _SQLiteQuery) -> _Response:
+        rows = query._payload if isinstance(query._payload, list) else [query._payload]
+        return _Response([self._insert_one(query._table, dict(row)) for row in rows])
+
+    def _execute_upsert(self, query: _SQLiteQuery) -> _Response:
+        rows = query._payload if isinstance(query._payload, list) else [query._payload]
+        keys = [k.strip() for k in query._on_conflict.split(',')]
+        written = []
+        for row in rows:
+            match = _SQLiteQuery(self, query._table)
+            match._filters = [(key, '=', row.get(key)) for key in keys]
+            existing = self._select_rows(match)
+            if existing:
+                rowid, data = existing[0]
+                merged = {**json.loads(data), **row}
+                self._conn.execute(f'UPDATE "{query._table}" SET data = ? WHERE rowid = ?',
+                                   (json.dumps(merged), rowid))
+                written.append(merged)
+            else:
+                written.append(self._insert_one(query._table, dict(row)))
+        return _Response(written)
+
+    def _execute_update(self, query: _SQLiteQuery) -> _Response:
+        updated = []
+        for rowid, data in self._select_rows(query):
+            merged = {**json.loads(data), **query._payload}
+            self._conn.execute(f'UPDATE "{query._table}" SET data = ? WHERE rowid = ?',
+                               (json.dumps(merged), rowid))
+            updated.append(merged)
+        return _Response(updated)
+
+    def _execute_delete(self, query: _SQLiteQuery) -> _Response:
+        deleted = []
+        for rowid, data in self._select_rows(query):
+            self._conn.execute(f'DELETE FROM "{query._table}" WHERE rowid = ?', (rowid,))
+            deleted.append(json.loads(data))
+        return _Response(deleted)
+
+
+class SQLiteSupabaseClient(SupabaseClient):
+    """
+    SupabaseClient apoiado em SQLite
+
+    Herda todos os helpers (get_tokens, bulk_upsert...) e a instrumentação
+    de table(); só o cliente subjacente é substituído.
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        self.url = f'sqlite:///{path}'
+        self.key = None
+        self.client = SQLiteStore(path)
+        logger.info(f"Cliente Supabase local (SQLite) inicializado: {path}")
+
+
+class SimulatedIFoodAPI:
+    """
+    API do iFood simulada, com catálogos determinísticos
+
+    Mesma interface de IFoodAPIClient para os métodos usados pela
+    sincronização. Uma fração dos itens é repetida entre categorias, como
+    acontece com produtos em mais de uma categoria no iFood.
+    """
+
+    def __init__(self, catalogs_per_merchant: int = 1, categories_per_catalog: int = 10,
+                 items_per_category: int = 50, option_groups_per_item: int = 2,
+                 options_per_group: int = 3, duplicate_ratio: float = 0.05,
+                 latency: float = 0.0, seed: int = 42):
+        """
+        Args:
+            catalogs_per_merchant: Catálogos por merchant
+            categories_per_catalog: Categorias por catálogo
+            items_per_category: Itens por categoria
+            option_groups_per_item: Grupos de complementos por item
+            options_per_group: Opções por grupo
+            duplicate_ratio: Fração de itens repetidos de outra categoria
+            latency: Atraso artificial por chamada (segundos)
+            seed: Semente do gerador
+        """
+        self.catalogs_per_merchant = catalogs_per_merchant
+        self.categories_per_catalog = categories_per_catalog
+        self.items_per_category = items_per_category
+        self.option_groups_per_item = option_groups_per_item
+        self.options_per_group = options_per_group
+        self.duplicate_ratio = duplicate_ratio
+        self.latency = latency
+        self.seed = seed
+        self.calls = 0
+        self._categories_cache: Dict[tuple, List[Dict]] = {}
+
+    def _wait(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _catalog_ids(self, merchant_id: str) -> List[str]:
+        return [f'{merchant_id}-catalog-{c}' for c in range(self.catalogs_per_merchant)]
+
+    def get_merchant_catalogs(self, merchant_id: str, access_token: str) -> List[Dict]:
+        self._wait()
+        return [
+            {
+                'catalogId': catalog_id,
+                'context': ['DEFAULT'],
+                'status': 'AVAILABLE',
+                'modifiedAt': '2024-01-01T00:00:00Z',
+            }
+            for catalog_id in self._catalog_ids(merchant_id)
+        ]
+
+    def get_catalog_categories(self, merchant_id: str, catalog_id: str,
+                               access_token: str, include_items: bool = True) -> List[Dict]:
+        self._wait()
+        key = (catalog_id, include_items)
+        if key not in self._categories_cache:
+            self._categories_cache[key] = self._build_categories(catalog_id, include_items)
+        return self._categories_cache[key]
+
+    def prefetch(self, merchant_ids: Iterable[str]):
+        """
+        Gera antecipadamente os catálogos dos merchants
+
+        Assim o custo de gerar os payloads simulados não aparece nas medições
+        da sincronização.
+        """
+        for merchant_id in merchant_ids:
+            for catalog_id in self._catalog_ids(merchant_id):
+                self._categories_cache[(catalog_id, True)] = self._build_categories(catalog_id, True)
+
+    def _build_categories(self, catalog_id: str, include_items: bool) -> List[Dict]:
+        rng = random.Random(f'{self.seed}:{catalog_id}')
+        categories = []
+        previous_items: List[Dict] = []
+
+        for c in range(self.categories_per_catalog):
+            items = []
+            for i in range(self.items_per_category if include_items else 0):
+                if previous_items and rng.random() < self.duplicate_ratio:
+                    items.append(rng.choice(previous_items))
+                    continue
+                item = self._build_item(rng, f'{catalog_id}-{c}-{i}')
+                items.append(item)
+            previous_items.extend(items)
+
+            categories.append({
+                'id': f'{catalog_id}-category-{c}',
+                'name': f'Categoria {c}',
+                'status': 'AVAILABLE',
+                'template': 'DEFAULT',
+                'index': c,
+                'items': items,
+            })
+        return categories
+
+    def _build_item(self, rng: random.Random, key: str) -> Dict:
+        price = round(rng.uniform(5, 120), 2)
+        return {
+            'id': f'item-{key}',
+            'name': f'Produto {key}',
+            'description': 'Descrição do produto simulado',
+            'status': 'AVAILABLE' if rng.random() > 0.1 else 'UNAVAILABLE',
+            'productId': f'product-{key}',
+            'imagePath': f'images/{key}.png',
+            'externalCode': f'EXT-{key}',
+            'price': {'value': price, 'originalValue': price},
+            'optionGroups': [
+                {
+                    'id': f'group-{key}-{g}',
+                    'name': f'Complementos {g}',
+                    'status': 'AVAILABLE',
+                    'optionGroupType': 'DEFAULT',
+                    'min': 0,
+                    'max': self.options_per_group,
+                    'options': [
+                        {
+                            'id': f'option-{key}-{g}-{o}',
+                            'name': f'Opção {o}',
+                            'status': 'AVAILABLE',
+                            'productId': f'option-product-{key}-{g}-{o}',
+                            'price': {'value': round(rng.uniform(0, 10), 2)},
+                        }
+                        for o in range(self.options_per_group)
+                    ],
+                }
+                for g in range(self.option_groups_per_item)
+            ],
+        }
+
+    def validate_token(self, access_token: str) -> bool:
+        return True
+
+
+def seed_simulation(supabase_client: SupabaseClient, n_tokens: int = 5,
+                    merchants_per_token: int = 2) -> List[str]:
+    """
+    Popula ifood_tokens e ifood_merchants para uma simulação
+
+    Args:
+        supabase_client: Cliente (normalmente SQLiteSupabaseClient)
+        n_tokens: Número de tokens (usuários)
+        merchants_per_token: Merchants por usuário
+
+    Returns:
+        Lista dos merchant_id criados
+    """
+    tokens, merchants = [], []
+    for t in range(n_tokens):
+        user_id = f'user-{t}'
+        tokens.append({
+            'client_id': f'client-{t}',
+            'client_secret': f'secret-{t}',
+            'access_token': f'token-{t}',
+            'expires_at': int(time.time()) + 21600,
+            'user_id': user_id,
+        })
+        for m in range(merchants_per_token):
+            merchants.append({
+                'merchant_id': f'merchant-{t}-{m}',
+                'name': f'Loja {t}-{m}',
+                'user_id': user_id,
+            })
+
+    supabase_client.table('ifood_tokens').insert(tokens).execute()
+    supabase_client.table('ifood_merchants').insert(merchants).execute()
+    return [merchant['merchant_id'] for merchant in merchants]
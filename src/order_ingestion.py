@@ -0,0 +1,302 @@
+"""
+Ingestão de pedidos do iFood a partir dos eventos do polling
+
+Os eventos de pedido de cada rodada são agrupados por pedido; os detalhes
+de cada pedido são buscados em paralelo (GET /orders/{id}) e as colunas
+indexadas de ifood_orders (cliente, valores, pagamento) são extraídas em
+uma única passada sobre o JSON. O status e os horários de confirmação,
+entrega e cancelamento vêm dos próprios eventos; o status só avança
+(STATUS_RANK), então um evento atrasado ou reentregue não faz o pedido
+voltar. Tudo é gravado com um upsert em lote em ifood_order_id, então um
+pico de pedidos custa poucas requisições ao banco em vez de uma por pedido.
+
+Eventos cujo pedido não foi gravado não devem ser confirmados ao iFood:
+a reentrega é o que faz a ingestão ser tentada de novo.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from async_ifood_api_client import AsyncIFoodAPIClient
+from async_supabase_client import AsyncSupabaseClient
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+ORDERS_INGESTED = REGISTRY.counter(
+    'ifood_orders_ingested_total',
+    'Pedidos processados a partir dos eventos por resultado (ok, fetch_error, store_error)',
+    ['result']
+)
+ORDERS_INGESTION_DURATION = REGISTRY.histogram(
+    'ifood_orders_ingestion_duration_seconds',
+    'Duração da ingestão dos pedidos de uma rodada (busca e gravação)'
+)
+
+ORDER_CONFLICT = "ifood_order_id"
+
+# Código e fullCode do evento -> status em ifood_orders
+ORDER_EVENT_STATUS = {
+    'PLC': 'PENDING', 'PLACED': 'PENDING',
+    'CFM': 'CONFIRMED', 'CONFIRMED': 'CONFIRMED',
+    'SPS': 'PREPARING', 'SEPARATION_STARTED': 'PREPARING',
+    'RTP': 'READY', 'READY_TO_PICKUP': 'READY',
+    'DSP': 'DISPATCHED', 'DISPATCHED': 'DISPATCHED',
+    'CON': 'DELIVERED', 'CONCLUDED': 'DELIVERED',
+    'CAN': 'CANCELLED', 'CANCELLED': 'CANCELLED',
+}
+
+# Ordem do ciclo de vida: um status só substitui outro de posição menor.
+# Entregue e cancelado são finais e não se substituem
+STATUS_RANK = {
+    'PENDING': 0,
+    'CONFIRMED': 1,
+    'PREPARING': 2,
+    'READY': 3,
+    'DISPATCHED': 4,
+    'DELIVERED': 5,
+    'CANCELLED': 5,
+}
+
+# Status -> coluna com o horário do evento
+STATUS_TIMESTAMP = {
+    'CONFIRMED': 'confirmed_at',
+    'DELIVERED': 'delivered_at',
+    'CANCELLED': 'cancelled_at',
+}
+
+# Ids por PATCH de processing_status em ifood_events e por select de status
+# em ifood_orders (a lista vai na query string)
+MARK_CHUNK_SIZE = 100
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def order_row(order: Dict, user_id: str, merchant_id: Optional[str] = None) -> Dict:
+    """
+    Linha de ifood_orders com as colunas extraídas do pedido do iFood
+
+    Args:
+        order: Pedido como veio de GET /orders/{id}
+        user_id: Dono do token que recebeu o evento
+        merchant_id: Merchant do evento, se o pedido não trouxer merchant.id
+    """
+    customer = order.get('customer') or {}
+    phone = customer.get('phone')
+    delivery = order.get('delivery') or {}
+    total = order.get('total') or {}
+    methods = (order.get('payments') or {}).get('methods') or []
+    payment_methods = ','.join(dict.fromkeys(
+        method['method'] for method in methods if isinstance(method, dict) and method.get('method')
+    ))
+    return {
+        'ifood_order_id': order['id'],
+        'merchant_id': (order.get('merchant') or {}).get('id') or merchant_id,
+        'user_id': user_id,
+        'order_data': order,
+        'customer_name': customer.get('name'),
+        'customer_phone': phone.get('number') if isinstance(phone, dict) else phone,
+        'customer_address': delivery.get('deliveryAddress'),
+        'total_amount': total.get('orderAmount'),
+        'delivery_fee': total.get('deliveryFee'),
+        'payment_method': payment_methods[:100] or None,
+    }
+
+
+def order_status(events: List[Dict], current: Optional[str] = None) -> Dict:
+    """
+    Status e horários de um pedido a partir dos seus eventos da rodada
+
+    Args:
+        events: Linhas de ifood_events do pedido
+        current: Status já gravado em ifood_orders, se houver
+
+    Returns:
+        status (o mais avançado em STATUS_RANK, só se avançar sobre current)
+        e as colunas de STATUS_TIMESTAMP presentes nos eventos
+    """
+    fields = {}
+    status = current
+    ordered = sorted(events, key=lambda event: event['event_data'].get('createdAt')
+                     or event['received_at'])
+    for event in ordered:
+        data = event['event_data']
+        event_status = (ORDER_EVENT_STATUS.get(data.get('code'))
+                        or ORDER_EVENT_STATUS.get(data.get('fullCode')))
+        if event_status is None:
+            continue
+        column = STATUS_TIMESTAMP.get(event_status)
+        if column:
+            fields[column] = data.get('createdAt') or event['received_at']
+        if status is None or STATUS_RANK[event_status] > STATUS_RANK.get(status, -1):
+            status = event_status
+    if status is not None and status != current:
+        fields['status'] = status
+    return fields
+
+
+class OrderIngestor:
+    """
+    Grava em ifood_orders os pedidos dos eventos novos de uma rodada
+
+    Usado pelo IFoodEventsPoller depois que os eventos foram gravados.
+    Os eventos de um pedido que não pôde ser buscado ou gravado ficam como
+    FAILED em ifood_events (processing_status) e voltam em failed_event_ids:
+    o poller não os confirma, e a reentrega do iFood dispara nova tentativa.
+    """
+
+    def __init__(self, supabase: AsyncSupabaseClient, ifood: AsyncIFoodAPIClient,
+                 concurrency: int = 50, chunk_size: int = 500):
+        """
+        Args:
+            supabase: Cliente assíncrono do Supabase (ifood_orders, ifood_events)
+            ifood: Cliente assíncrono da API de pedidos do iFood
+            concurrency: Buscas de pedido simultâneas
+            chunk_size: Linhas por requisição no upsert
+        """
+        self.supabase = supabase
+        self.ifood = ifood
+        self.concurrency = max(1, concurrency)
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def events_by_order(events: List[Dict]) -> Dict[str, List[Dict]]:
+        """Eventos de pedido agrupados por orderId"""
+        grouped: Dict[str, List[Dict]] = {}
+        for event in events:
+            order_id = event['event_data'].get('orderId')
+            if order_id:
+                grouped.setdefault(order_id, []).append(event)
+        return grouped
+
+    async def fetch(self, access_token: str, order_id: str,
+                    semaphore: asyncio.Semaphore) -> Optional[Dict]:
+        """Detalhes de um pedido, ou None se a busca falhar"""
+        async with semaphore:
+            response = await self.ifood.get_order(access_token, order_id)
+        if response.ok and isinstance(response.data, dict) and response.data.get('id'):
+            return response.data
+        logger.warning(f"⚠️ Pedido {order_id} não carregado: "
+                       f"{response.error or f'HTTP {response.status}'}")
+        return None
+
+    async def stored_statuses(self, order_ids: List[str]) -> Dict[str, str]:
+        """Status atual em ifood_orders dos pedidos já gravados"""
+        statuses = {}
+        for start in range(0, len(order_ids), MARK_CHUNK_SIZE):
+            quoted = ','.join(f'"{order_id}"'
+                              for order_id in order_ids[start:start + MARK_CHUNK_SIZE])
+            rows = await self.supabase.select('ifood_orders',
+                                              filters={'ifood_order_id': f'in.({quoted})'},
+                                              columns='ifood_order_id,status')
+            statuses.update((row['ifood_order_id'], row['status']) for row in rows)
+        return statuses
+
+    async def store_orders(self, rows: List[Dict]):
+        """
+        Upsert em lote em ifood_order_id
+
+        As colunas de horário só entram nas linhas em que foram definidas
+        (um evento de entrega não apaga o confirmed_at gravado antes); como
+        o upsert em lote exige as mesmas chaves, as linhas são agrupadas
+        pelo conjunto de colunas.
+        """
+        groups: Dict[tuple, List[Dict]] = {}
+        for row in rows:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+        for group in groups.values():
+            await self.supabase.upsert('ifood_orders', group, on_conflict=ORDER_CONFLICT,
+                                       chunk_size=self.chunk_size)
+
+    async def mark_events(self, event_ids: List[str], status: str,
+                          error: Optional[str] = None):
+        """Atualiza processing_status dos eventos em ifood_events (falhas só geram log)"""
+        values = {'processing_status': status, 'processed_at': _now().isoformat(),
+                  'processing_error': error}
+        try:
+            for start in range(0, len(event_ids), MARK_CHUNK_SIZE):
+                quoted = ','.join(f'"{event_id}"'
+                                  for event_id in event_ids[start:start + MARK_CHUNK_SIZE])
+                await self.supabase.update('ifood_events', values,
+                                           {'event_id': f'in.({quoted})'})
+        except Exception as e:
+            logger.error(f"❌ Erro ao atualizar processing_status de {len(event_ids)} eventos: {e}")
+
+    async def ingest(self, events: List[Dict], tokens: Dict[str, str]) -> Dict:
+        """
+        Busca e grava os pedidos dos eventos
+
+        Args:
+            events: Linhas de ifood_events já gravadas (novas ou reentregues)
+            tokens: Token de acesso por user_id
+
+        Returns:
+            Estatísticas (orders, stored, failed) e failed_event_ids, os
+            eventos que não devem ser confirmados
+        """
+        started = time.perf_counter()
+        by_order = {
+            order_id: order_events
+            for order_id, order_events in self.events_by_order(events).items()
+            if order_events[0]['user_id'] in tokens
+        }
+        if not by_order:
+            return {'orders': 0, 'stored': 0, 'failed': 0, 'failed_event_ids': []}
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        orders = await asyncio.gather(*(
+            self.fetch(tokens[order_events[0]['user_id']], order_id, semaphore)
+            for order_id, order_events in by_order.items()
+        ))
+
+        fetched: List[Tuple[List[Dict], Dict]] = []
+        failed_ids: List[str] = []
+        for order_events, order in zip(by_order.values(), orders):
+            if order is None:
+                failed_ids.extend(event['event_id'] for event in order_events)
+            else:
+                fetched.append((order_events, order))
+        ORDERS_INGESTED.labels('fetch_error').inc(len(by_order) - len(fetched))
+
+        stored_ids: List[str] = []
+        error = None
+        if fetched:
+            try:
+                current = await self.stored_statuses([order['id'] for _, order in fetched])
+                rows = []
+                for order_events, order in fetched:
+                    first = order_events[0]
+                    row = order_row(order, first['user_id'], first['merchant_id'])
+                    row.update(order_status(order_events, current.get(order['id'])))
+                    row['updated_at'] = _now().isoformat()
+                    rows.append(row)
+                await self.store_orders(rows)
+                ORDERS_INGESTED.labels('ok').inc(len(fetched))
+                stored_ids = [event['event_id'] for order_events, _ in fetched
+                              for event in order_events]
+            except Exception as e:
+                error = str(e)
+                logger.error(f"❌ Erro ao gravar {len(fetched)} pedidos: {e}")
+                ORDERS_INGESTED.labels('store_error').inc(len(fetched))
+                failed_ids.extend(event['event_id'] for order_events, _ in fetched
+                                  for event in order_events)
+
+        if stored_ids:
+            await self.mark_events(stored_ids, 'COMPLETED')
+        if failed_ids:
+            await self.mark_events(failed_ids, 'FAILED',
+                                   f"Erro ao gravar pedido: {error}" if error
+                                   else "Erro ao buscar detalhes do pedido")
+
+        elapsed = time.perf_counter() - started
+        ORDERS_INGESTION_DURATION.observe(elapsed)
+        stored = 0 if error else len(fetched)
+        logger.info(f"🧾 Pedidos: {stored} gravados de {len(by_order)} "
+                    f"({len(by_order) - stored} falhas) em {elapsed:.2f}s")
+        return {'orders': len(by_order), 'stored': stored, 'failed': len(by_order) - stored,
+                'failed_event_ids': failed_ids}
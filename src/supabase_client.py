@@ -2,13 +2,73 @@
 Cliente Supabase para interação com o banco de dados
 """
 
-import os
 import logging
+from time import perf_counter
 from typing import Optional
 from supabase import create_client, Client
 
+from config import Config
+from metrics import REGISTRY
+
 logger = logging.getLogger(__name__)
 
+DB_QUERIES = REGISTRY.counter(
+    'supabase_queries_total',
+    'Consultas ao Supabase por tabela, operação e resultado',
+    ['table', 'operation', 'result']
+)
+DB_QUERY_DURATION = REGISTRY.histogram(
+    'supabase_query_duration_seconds',
+    'Duração das consultas ao Supabase',
+    ['table', 'operation']
+)
+
+
+class _InstrumentedQuery:
+    """
+    Envolve o query builder do supabase-py e mede o execute()
+
+    Cada chamada encadeada (select/eq/update...) devolve outro builder, que
+    é envolvido de novo; a operação registrada é o primeiro método chamado.
+    """
+
+    __slots__ = ('_builder', '_table', '_operation')
+
+    def __init__(self, builder, table: str, operation: Optional[str] = None):
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if name == 'execute':
+            return self._execute
+        if not callable(attr):
+            # Propriedades como .not_ também devolvem builders
+            if hasattr(attr, 'execute'):
+                return _InstrumentedQuery(attr, self._table, self._operation)
+            return attr
+
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, 'execute'):
+                return _InstrumentedQuery(result, self._table, self._operation or name)
+            return result
+        return chained
+
+    def _execute(self, *args, **kwargs):
+        operation = self._operation or 'unknown'
+        started = perf_counter()
+        try:
+            response = self._builder.execute(*args, **kwargs)
+        except Exception:
+            DB_QUERIES.labels(self._table, operation, 'error').inc()
+            raise
+        finally:
+            DB_QUERY_DURATION.labels(self._table, operation).observe(perf_counter() - started)
+        DB_QUERIES.labels(self._table, operation, 'ok').inc()
+        return response
+
 
 class SupabaseClient:
     """
@@ -23,8 +83,8 @@ class SupabaseClient:
             url: URL do projeto Supabase
             key: Chave de API do Supabase
         """
-        self.url = url or os.getenv('SUPABASE_URL')
-        self.key = key or os.getenv('SUPABASE_KEY')
+        self.url = url or Config.SUPABASE_URL
+        self.key = key or Config.SUPABASE_KEY
         
         if not self.url or not self.key:
             raise ValueError("SUPABASE_URL e SUPABASE_KEY devem ser fornecidos")
@@ -38,8 +98,11 @@ class SupabaseClient:
         
         Args:
             table_name: Nome da tabela
+        
+        Returns:
+            Query builder com o execute() instrumentado (métricas)
         """
-        return self.client.table(table_name)
+        return _InstrumentedQuery(self.client.table(table_name), table_name)
     
     def get_tokens(self):
         """
@@ -127,6 +190,33 @@ class SupabaseClient:
             logger.error(f"Erro ao criar produtos em lote: {e}")
             raise
     
+    def bulk_upsert(self, table_name: str, rows: list, on_conflict: str,
+                    chunk_size: int = 500) -> int:
+        """
+        Faz upsert em lote (INSERT ... ON CONFLICT) dividindo em chunks
+
+        Args:
+            table_name: Nome da tabela
+            rows: Linhas a gravar (chaves de conflito únicas dentro da lista)
+            on_conflict: Coluna(s) da constraint única usada no upsert
+            chunk_size: Máximo de linhas por requisição
+
+        Returns:
+            Número de linhas enviadas
+        """
+        if not rows:
+            return 0
+
+        try:
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
+                self.table(table_name).upsert(chunk, on_conflict=on_conflict).execute()
+            logger.info(f"{len(rows)} linhas upserted em {table_name}")
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Erro no upsert em lote de {table_name}: {e}")
+            raise
+    
     def check_product_exists(self, merchant_id: str, item_id: str) -> bool:
         """
         Verifica se um produto já existe
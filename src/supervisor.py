@@ -0,0 +1,201 @@
+"""
+Supervisor de serviços em um único event loop
+
+Roda vários serviços de longa duração (sincronização de produtos, renovação
+de tokens, API) como tasks do mesmo processo, para que compartilhem pools
+de conexão, caches e o registro de métricas. Cada serviço é reiniciado
+isoladamente quando falha, com backoff exponencial, sem derrubar os demais.
+
+Um serviço é qualquer objeto com:
+- serve(): corrotina que roda até stop() ser chamado
+- stop(): pede o encerramento (chamado de dentro do event loop)
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SERVICE_RESTARTS = REGISTRY.counter(
+    'supervisor_service_restarts_total',
+    'Reinícios de serviços supervisionados após falha',
+    ['service']
+)
+SERVICE_UP = REGISTRY.gauge(
+    'supervisor_service_up',
+    'Serviço supervisionado em execução (1) ou parado (0)',
+    ['service']
+)
+
+
+@dataclass
+class SupervisedService:
+    """Definição e estado de um serviço supervisionado"""
+    name: str
+    factory: Callable[[], Any]
+    instance: Any = None
+    restarts: int = 0
+    last_error: Optional[str] = None
+    started_at: Optional[float] = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado atual do serviço (para logs)"""
+        return {
+            'name': self.name,
+            'running': self.instance is not None,
+            'restarts': self.restarts,
+            'last_error': self.last_error,
+        }
+
+
+class ServiceSupervisor:
+    """
+    Executa e reinicia serviços em um único event loop
+
+    A factory de cada serviço roda em uma thread (a construção pode fazer
+    I/O bloqueante) e é chamada de novo a cada reinício; recursos
+    compartilhados ficam fora dela e são reaproveitados entre reinícios.
+    """
+
+    def __init__(self, restart_delay: float = 1.0, max_restart_delay: float = 60.0,
+                 stable_after: float = 60.0):
+        """
+        Args:
+            restart_delay: Espera antes do primeiro reinício (segundos)
+            max_restart_delay: Teto do backoff exponencial entre reinícios
+            stable_after: Após rodar este tempo sem falhar, o backoff volta ao início
+        """
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.stable_after = stable_after
+        self.services: Dict[str, SupervisedService] = {}
+        self._stop_event: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop_requested = False
+
+    def add(self, name: str, factory: Callable[[], Any]) -> SupervisedService:
+        """
+        Registra um serviço
+
+        Args:
+            name: Nome único do serviço
+            factory: Função sem argumentos que constrói o serviço (serve/stop)
+
+        Returns:
+            O SupervisedService registrado
+        """
+        if name in self.services:
+            raise ValueError(f"Serviço já registrado: {name}")
+        service = SupervisedService(name=name, factory=factory)
+        self.services[name] = service
+        return service
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop_event is not None and self._stop_event.is_set()
+
+    async def run(self, install_signal_handlers: bool = True):
+        """
+        Executa todos os serviços até stop() (ou SIGINT/SIGTERM)
+
+        Args:
+            install_signal_handlers: Se SIGINT/SIGTERM chamam stop(); um
+                segundo sinal encerra o processo imediatamente
+        """
+        self._stop_event = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        if self._stop_requested:
+            self._stop_event.set()
+        if install_signal_handlers:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                self._loop.add_signal_handler(sig, self._handle_signal)
+
+        logger.info(f"🧭 Supervisor iniciado com {len(self.services)} serviços: "
+                    f"{', '.join(self.services)}")
+        try:
+            await asyncio.gather(*(
+                asyncio.create_task(self._supervise(service), name=f"service:{service.name}")
+                for service in self.services.values()
+            ))
+        finally:
+            if install_signal_handlers:
+                for sig in (signal.SIGINT, signal.SIGTERM):
+                    self._loop.remove_signal_handler(sig)
+            logger.info("🛑 Supervisor encerrado")
+
+    def stop(self):
+        """
+        Pede o encerramento de todos os serviços
+
+        Pode ser chamado de outras threads: a parada é agendada no loop.
+        """
+        self._stop_requested = True
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._stop_services)
+
+    def _stop_services(self):
+        self._stop_event.set()
+        for service in self.services.values():
+            if service.instance is not None:
+                try:
+                    service.instance.stop()
+                except Exception as e:
+                    logger.error(f"❌ Erro ao parar {service.name}: {e}")
+
+    def _handle_signal(self):
+        if self.stopping:
+            logger.warning("⚠️ Segundo sinal recebido. Saindo sem aguardar os serviços")
+            # sys.exit esperaria as threads do executor do asyncio
+            os._exit(1)
+        logger.info("🛑 Sinal de shutdown recebido. Encerrando serviços...")
+        self.stop()
+
+    async def _supervise(self, service: SupervisedService):
+        """Loop de um serviço: constrói, executa e reinicia após falhas"""
+        delay = self.restart_delay
+        while not self.stopping:
+            service.started_at = time.monotonic()
+            try:
+                # SystemExit: initialize_clients da sincronização encerra o
+                # processo em erro fatal; aqui isso vira só uma falha do serviço
+                service.instance = await asyncio.to_thread(service.factory)
+                if self.stopping:
+                    break
+                SERVICE_UP.labels(service.name).set(1)
+                logger.info(f"▶️ Serviço {service.name} iniciado")
+                await service.instance.serve()
+                if self.stopping:
+                    break
+                service.last_error = "encerrado inesperadamente"
+            except asyncio.CancelledError:
+                raise
+            except (Exception, SystemExit) as e:
+                service.last_error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            finally:
+                service.instance = None
+                SERVICE_UP.labels(service.name).set(0)
+
+            if self.stopping:
+                break
+
+            if time.monotonic() - service.started_at >= self.stable_after:
+                delay = self.restart_delay
+            service.restarts += 1
+            SERVICE_RESTARTS.labels(service.name).inc()
+            logger.error(f"❌ Serviço {service.name} falhou ({service.last_error}); "
+                         f"reiniciando em {delay:.0f}s (reinício #{service.restarts})")
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, self.max_restart_delay)
+
+        logger.info(f"⏹️ Serviço {service.name} parado")
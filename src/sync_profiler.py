@@ -0,0 +1,99 @@
+"""
+Perfilamento de um ciclo de sincronização (CPU + alocações)
+
+Executa uma função (normalmente run_sync_cycle) sob cProfile e tracemalloc
+e grava um relatório em texto com as funções mais caras e os pontos que
+mais alocam memória.
+"""
+
+import cProfile
+import io
+import logging
+import pstats
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def profile_call(func: Callable[[], Any], output_path: str, top: int = 30,
+                 sort_by: str = 'cumulative', trace_frames: int = 1,
+                 context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Executa func uma vez com profiler de CPU e de alocações
+
+    Args:
+        func: Função sem argumentos a medir
+        output_path: Arquivo do relatório (texto)
+        top: Quantidade de entradas em cada seção
+        sort_by: Ordenação principal do cProfile ('cumulative', 'tottime'...)
+        trace_frames: Profundidade da pilha guardada pelo tracemalloc
+        context: Informações extras para o cabeçalho (modo, simulação...)
+
+    Returns:
+        Resumo com duração, pico de memória e caminho do relatório
+    """
+    profiler = cProfile.Profile()
+    tracemalloc.start(trace_frames)
+    started = time.perf_counter()
+    error = None
+
+    profiler.enable()
+    try:
+        func()
+    except Exception as e:
+        error = e
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - started
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    # Ignora as alocações do próprio tracemalloc/profiler
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<unknown>'),
+    ))
+
+    report = io.StringIO()
+    report.write("=" * 78 + "\n")
+    report.write(f"PERFIL DO CICLO DE SINCRONIZAÇÃO - {datetime.now():%Y-%m-%d %H:%M:%S}\n")
+    report.write("=" * 78 + "\n")
+    for key, value in (context or {}).items():
+        report.write(f"{key}: {value}\n")
+    report.write(f"Duração: {elapsed:.3f}s\n")
+    report.write(f"Memória rastreada: atual {current / 1024 / 1024:.1f} MB, "
+                 f"pico {peak / 1024 / 1024:.1f} MB\n")
+    if error is not None:
+        report.write(f"Ciclo terminou com erro: {error!r}\n")
+
+    orders = [sort_by] + (['tottime'] if sort_by != 'tottime' else [])
+    for order in orders:
+        report.write(f"\n{'-' * 78}\nCPU - top {top} por {order}\n{'-' * 78}\n")
+        stats = pstats.Stats(profiler, stream=report)
+        stats.strip_dirs().sort_stats(order).print_stats(top)
+
+    report.write(f"\n{'-' * 78}\nALOCAÇÕES - top {top} por linha de origem\n{'-' * 78}\n")
+    for idx, stat in enumerate(snapshot.statistics('lineno')[:top], 1):
+        frame = stat.traceback[0]
+        report.write(f"{idx:3d}. {frame.filename}:{frame.lineno} - "
+                     f"{stat.size / 1024:.1f} KiB em {stat.count} blocos\n")
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(report.getvalue())
+
+    logger.info(f"📄 Relatório de perfil salvo em {output_path} "
+                f"({elapsed:.2f}s, pico {peak / 1024 / 1024:.1f} MB)")
+
+    if error is not None:
+        raise error
+
+    return {
+        'elapsed_seconds': elapsed,
+        'peak_bytes': peak,
+        'report_path': output_path,
+    }
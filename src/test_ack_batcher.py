@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Testes do AcknowledgmentBatcher (ack_batcher)
+
+Usam clientes falsos do Supabase e do iFood, sem rede.
+Rode com pytest, ou direto: python test_ack_batcher.py
+"""
+
+import asyncio
+import sys
+import time
+
+from ack_batcher import AckBatch, AcknowledgmentBatcher
+from async_ifood_api_client import MAX_ACKNOWLEDGMENT_IDS, IFoodResponse
+
+
+class FakeIFood:
+    """Responde ao acknowledgment com os status da fila (200 quando ela acaba)"""
+
+    def __init__(self, statuses=()):
+        self.statuses = list(statuses)
+        self.calls = []
+
+    async def acknowledge_events(self, access_token, event_ids):
+        self.calls.append((access_token, list(event_ids)))
+        status = self.statuses.pop(0) if self.statuses else 200
+        return IFoodResponse(status=status, error=None if status == 200 else 'falha')
+
+
+class FakeSupabase:
+    """Guarda as linhas gravadas em ifood_acknowledgment_batches"""
+
+    def __init__(self):
+        self.rows = []
+
+    async def insert(self, table, rows, returning=True):
+        assert table == 'ifood_acknowledgment_batches'
+        self.rows.extend(rows)
+
+
+def _ids(count, prefix='e'):
+    return [f'{prefix}{i}' for i in range(count)]
+
+
+def test_due_batches_split_at_max_batch():
+    batcher = AcknowledgmentBatcher(FakeSupabase(), FakeIFood())
+    batcher.add('u1', 't1', _ids(4500))
+    batcher.add('u2', 't2', _ids(10, 'x'))
+
+    batches = batcher._due_batches(time.monotonic())
+
+    sizes = sorted((batch.user_id, len(batch.event_ids)) for batch in batches)
+    assert sizes == [('u1', 500), ('u1', 2000), ('u1', 2000), ('u2', 10)]
+    u1 = [id_ for batch in batches if batch.user_id == 'u1' for id_ in batch.event_ids]
+    assert u1 == _ids(4500)
+    assert batcher.pending == 0
+
+
+def test_max_batch_capped_at_api_limit():
+    batcher = AcknowledgmentBatcher(FakeSupabase(), FakeIFood(),
+                                    max_batch=MAX_ACKNOWLEDGMENT_IDS * 2)
+    assert batcher.max_batch == MAX_ACKNOWLEDGMENT_IDS == 2000
+
+    batcher = AcknowledgmentBatcher(FakeSupabase(), FakeIFood(), max_batch=3)
+    batcher.add('u1', 't1', _ids(7))
+    assert [len(batch.event_ids) for batch in batcher._due_batches(time.monotonic())] == [3, 3, 1]
+
+
+def test_due_batches_hold_retries_until_due():
+    batcher = AcknowledgmentBatcher(FakeSupabase(), FakeIFood())
+    now = time.monotonic()
+    due = AckBatch('u1', ['a'], now, attempt=1, due_at=now - 1)
+    waiting = AckBatch('u1', ['b'], now, attempt=1, due_at=now + 60)
+    batcher._retries = [due, waiting]
+
+    assert batcher._due_batches(now) == [due]
+    assert batcher._retries == [waiting]
+    assert batcher._due_batches(now, final=True) == [waiting]
+    assert batcher._retries == []
+
+
+def test_failed_batch_retried_with_exponential_backoff():
+    supabase = FakeSupabase()
+    ifood = FakeIFood([500, 500, 500, 500])
+    batcher = AcknowledgmentBatcher(supabase, ifood, max_retries=3, retry_base_delay=2.0)
+    batcher.add('u1', 't1', ['a', 'b'])
+
+    delays = []
+    for attempt in range(3):
+        before = time.monotonic()
+        assert asyncio.run(batcher.flush()) == 0
+        assert len(batcher._retries) == 1
+        retry = batcher._retries[0]
+        assert retry.attempt == attempt + 1
+        delays.append(retry.due_at - before)
+        assert supabase.rows[-1]['retry_attempts'] == attempt
+        assert supabase.rows[-1]['next_retry_at'] is not None
+        retry.due_at = 0.0
+
+    # 2s, 4s, 8s (com folga para o tempo do próprio teste)
+    for delay, expected in zip(delays, [2.0, 4.0, 8.0]):
+        assert expected - 0.5 <= delay <= expected + 0.5
+
+    # Esgotadas as novas tentativas, o lote é descartado
+    assert asyncio.run(batcher.flush()) == 0
+    assert batcher._retries == []
+    assert batcher.pending == 0
+    last = supabase.rows[-1]
+    assert last['retry_attempts'] == 3
+    assert last['next_retry_at'] is None
+    assert last['failed_event_ids'] == ['a', 'b']
+    assert len(ifood.calls) == 4
+
+
+def test_retry_succeeds_and_is_recorded():
+    supabase = FakeSupabase()
+    ifood = FakeIFood([503])
+    batcher = AcknowledgmentBatcher(supabase, ifood)
+    batcher.add('u1', 't1', ['a'])
+
+    assert asyncio.run(batcher.flush()) == 0
+    batcher._retries[0].due_at = 0.0
+    assert asyncio.run(batcher.flush()) == 1
+
+    assert batcher.pending == 0
+    assert [row['success'] for row in supabase.rows] == [False, True]
+    assert supabase.rows[-1]['retry_attempts'] == 1
+    assert ifood.calls == [('t1', ['a']), ('t1', ['a'])]
+
+
+def test_final_flush_sends_pending_retries_without_rescheduling():
+    ifood = FakeIFood([500, 500])
+    batcher = AcknowledgmentBatcher(FakeSupabase(), ifood)
+    batcher.add('u1', 't1', ['a'])
+    asyncio.run(batcher.flush())
+    assert batcher._retries[0].due_at > time.monotonic()
+
+    assert asyncio.run(batcher.flush(final=True)) == 0
+    assert batcher._retries == []
+    assert len(ifood.calls) == 2
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    sys.exit(0)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Testes do EventDeduplicator (event_dedup)
+
+Usam um cliente falso do Supabase, sem rede. Os falsos positivos do Bloom
+filter são forçados com um filtro que responde "talvez" para ids escolhidos.
+Rode com pytest, ou direto: python test_event_dedup.py
+"""
+
+import asyncio
+import sys
+
+from event_dedup import VERIFY_CHUNK_SIZE, BloomFilter, EventDeduplicator
+
+
+class FakeSupabase:
+    """ifood_events com os event ids em `stored`; guarda os selects feitos"""
+
+    def __init__(self, stored=()):
+        self.stored = set(stored)
+        self.selects = []
+
+    async def select(self, table, filters=None, columns='*', limit=None, order=None):
+        assert table == 'ifood_events'
+        quoted = filters['event_id'][len('in.('):-1]
+        event_ids = [value.strip('"') for value in quoted.split(',')]
+        self.selects.append(event_ids)
+        return [{'event_id': event_id} for event_id in event_ids if event_id in self.stored]
+
+
+class MaybeBloom:
+    """Bloom filter falso: "talvez" para os ids adicionados e para `false_positives`"""
+
+    def __init__(self, false_positives=()):
+        self.keys = set(false_positives)
+
+    def add(self, key):
+        self.keys.add(key)
+
+    def __contains__(self, key):
+        return key in self.keys
+
+
+def _events(*event_ids):
+    return [{'event_id': event_id, 'event_type': 'PLC'} for event_id in event_ids]
+
+
+def test_bloom_false_positive_is_kept():
+    supabase = FakeSupabase()
+    dedup = EventDeduplicator(supabase)
+    dedup.bloom = MaybeBloom(['novo'])
+
+    new, dropped = asyncio.run(dedup.new_events(_events('novo', 'outro')))
+
+    assert [event['event_id'] for event in new] == ['outro', 'novo']
+    assert dropped == []
+    # Só o "talvez" foi conferido no banco
+    assert supabase.selects == [['novo']]
+
+
+def test_bloom_hit_confirmed_in_database_is_dropped():
+    supabase = FakeSupabase(stored=['antigo'])
+    dedup = EventDeduplicator(supabase)
+    dedup.bloom = MaybeBloom(['antigo', 'novo'])
+
+    new, dropped = asyncio.run(dedup.new_events(_events('antigo', 'novo')))
+
+    assert [event['event_id'] for event in new] == ['novo']
+    assert [event['event_id'] for event in dropped] == ['antigo']
+    # O duplicado confirmado volta para o LRU e não é conferido de novo
+    assert dedup.classify(['antigo', 'novo']) == ([], ['antigo'], ['novo'])
+    assert dedup.stats()['dropped'] == 1
+
+
+def test_lru_hit_skips_database():
+    supabase = FakeSupabase()
+    dedup = EventDeduplicator(supabase)
+    dedup.remember(['a', 'b'])
+
+    new, dropped = asyncio.run(dedup.new_events(_events('a', 'b', 'c')))
+
+    assert [event['event_id'] for event in new] == ['c']
+    assert [event['event_id'] for event in dropped] == ['a', 'b']
+    assert supabase.selects == []
+    assert dedup.stats() == {'checked': 3, 'dropped': 2, 'hit_rate': 2 / 3, 'recent_ids': 2}
+
+
+def test_evicted_ids_are_verified_in_chunks():
+    count = VERIFY_CHUNK_SIZE + 5
+    event_ids = [f'e{i}' for i in range(count)]
+    supabase = FakeSupabase(stored=event_ids[:count - 1])
+    dedup = EventDeduplicator(supabase, lru_size=1)
+    dedup.bloom = MaybeBloom()
+    dedup.remember(event_ids)
+
+    new, dropped = asyncio.run(dedup.new_events(_events(*event_ids)))
+
+    # O último id segue no LRU; os demais vão ao banco em lotes
+    assert [len(chunk) for chunk in supabase.selects] == [VERIFY_CHUNK_SIZE,
+                                                         count - 1 - VERIFY_CHUNK_SIZE]
+    assert new == []
+    assert len(dropped) == count
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    keys = [f'k{i}' for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    sys.exit(0)
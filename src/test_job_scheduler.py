@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Testes do AsyncJobScheduler (job_scheduler)
+
+Usam intervalos curtos (décimos de segundo) com folga para o agendamento
+do event loop. Rode com pytest, ou direto: python test_job_scheduler.py
+"""
+
+import asyncio
+import sys
+import time
+
+from job_scheduler import COALESCE, SKIP, AsyncJobScheduler
+
+
+def _run_for(scheduler: AsyncJobScheduler, seconds: float):
+    """Roda o agendador e pede o stop() depois de `seconds`"""
+    async def main():
+        asyncio.get_running_loop().call_later(seconds, scheduler.stop)
+        await scheduler.run()
+    asyncio.run(main())
+
+
+def _slow_first_run(starts: list, duration: float):
+    """Job cuja primeira execução demora `duration` e as demais são instantâneas"""
+    async def job():
+        starts.append(time.monotonic())
+        if len(starts) == 1:
+            await asyncio.sleep(duration)
+    return job
+
+
+def test_single_flight():
+    scheduler = AsyncJobScheduler()
+    state = {'running': 0, 'max': 0}
+
+    async def job():
+        state['running'] += 1
+        state['max'] = max(state['max'], state['running'])
+        await asyncio.sleep(0.15)
+        state['running'] -= 1
+
+    job_state = scheduler.add_job('slow', job, interval=0.05)
+    _run_for(scheduler, 0.5)
+    assert state['max'] == 1
+    assert 2 <= job_state.runs <= 4
+
+
+def test_sync_job_runs_in_thread_and_failures_are_counted():
+    scheduler = AsyncJobScheduler()
+    calls = []
+
+    def job():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise RuntimeError("falha")
+
+    job_state = scheduler.add_job('sync', job, interval=0.05)
+    _run_for(scheduler, 0.22)
+    assert job_state.failures == 1
+    assert job_state.runs == len(calls) >= 3
+
+
+def test_skip_drops_missed_ticks_and_keeps_the_grid():
+    scheduler = AsyncJobScheduler()
+    starts = []
+    job_state = scheduler.add_job('skip', _slow_first_run(starts, 0.35), interval=0.1,
+                                  missed_run_policy=SKIP)
+    _run_for(scheduler, 0.45)
+    # Ticks em 0.1, 0.2 e 0.3 perdidos; a próxima execução fica em 0.4
+    assert job_state.missed_runs == 3
+    assert len(starts) == 2
+    assert 0.38 <= starts[1] - starts[0] <= 0.44
+
+
+def test_coalesce_runs_missed_ticks_once_right_away():
+    scheduler = AsyncJobScheduler()
+    starts = []
+    job_state = scheduler.add_job('coalesce', _slow_first_run(starts, 0.35), interval=0.1,
+                                  missed_run_policy=COALESCE)
+    _run_for(scheduler, 0.42)
+    # Os três ticks perdidos viram uma execução imediata
+    assert job_state.missed_runs == 2
+    assert len(starts) == 2
+    assert 0.35 <= starts[1] - starts[0] <= 0.38
+
+
+def test_deadline_misses_are_counted():
+    scheduler = AsyncJobScheduler()
+
+    async def job():
+        await asyncio.sleep(0.05)
+
+    job_state = scheduler.add_job('deadline', job, interval=0.1, deadline=0.01)
+    _run_for(scheduler, 0.25)
+    assert job_state.runs >= 2
+    assert job_state.deadline_misses == job_state.runs
+
+
+def test_returned_delay_replaces_the_interval():
+    scheduler = AsyncJobScheduler()
+    starts = []
+
+    async def job():
+        starts.append(time.monotonic())
+        return 0.05
+
+    scheduler.add_job('dynamic', job, interval=60)
+    _run_for(scheduler, 0.28)
+    assert len(starts) >= 4
+    assert all(0.04 <= later - earlier <= 0.09 for earlier, later in zip(starts, starts[1:]))
+
+
+def test_run_immediately_false_waits_one_interval():
+    scheduler = AsyncJobScheduler()
+    starts = []
+
+    async def job():
+        starts.append(time.monotonic())
+
+    scheduler.add_job('later', job, interval=0.2, run_immediately=False)
+    started = time.monotonic()
+    _run_for(scheduler, 0.3)
+    assert len(starts) == 1
+    assert starts[0] - started >= 0.19
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    sys.exit(0)
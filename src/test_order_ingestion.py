@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Testes da ingestão de pedidos (order_ingestion)
+
+Usam clientes falsos do Supabase e do iFood, sem rede.
+Rode com pytest, ou direto: python test_order_ingestion.py
+"""
+
+import asyncio
+import sys
+
+from async_ifood_api_client import IFoodResponse
+from order_ingestion import OrderIngestor, order_status
+
+
+class FakeIFood:
+    """GET /orders/{id}: devolve o pedido, ou HTTP 500 para os ids em `failing`"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.calls = []
+
+    async def get_order(self, access_token, order_id):
+        self.calls.append((access_token, order_id))
+        if order_id in self.failing:
+            return IFoodResponse(status=500, error='erro interno')
+        return IFoodResponse(status=200, data={'id': order_id, 'merchant': {'id': 'm1'},
+                                               'total': {'orderAmount': 42.5}})
+
+
+class FakeSupabase:
+    """ifood_orders com os status em `statuses`; o upsert falha se `fail_upsert`"""
+
+    def __init__(self, statuses=None, fail_upsert=False):
+        self.statuses = statuses or {}
+        self.fail_upsert = fail_upsert
+        self.upserts = []
+        self.updates = []
+
+    async def select(self, table, filters=None, columns='*', limit=None, order=None):
+        assert table == 'ifood_orders'
+        return [{'ifood_order_id': order_id, 'status': status}
+                for order_id, status in self.statuses.items()
+                if f'"{order_id}"' in filters['ifood_order_id']]
+
+    async def upsert(self, table, rows, on_conflict=None, chunk_size=None):
+        if self.fail_upsert:
+            raise RuntimeError('upsert falhou')
+        self.upserts.extend(rows)
+
+    async def update(self, table, values, filters):
+        assert table == 'ifood_events'
+        self.updates.append((values['processing_status'], filters['event_id']))
+
+
+def _event(event_id, order_id, code, created_at, user_id='u1'):
+    return {
+        'event_id': event_id,
+        'user_id': user_id,
+        'merchant_id': 'm1',
+        'received_at': created_at,
+        'event_data': {'orderId': order_id, 'code': code, 'createdAt': created_at},
+    }
+
+
+def test_order_status_takes_most_advanced():
+    events = [
+        _event('e2', 'o1', 'CFM', '2026-01-01T10:01:00Z'),
+        _event('e1', 'o1', 'PLC', '2026-01-01T10:00:00Z'),
+        _event('e3', 'o1', 'DSP', '2026-01-01T10:30:00Z'),
+    ]
+    assert order_status(events) == {'status': 'DISPATCHED',
+                                    'confirmed_at': '2026-01-01T10:01:00Z'}
+
+
+def test_order_status_never_regresses():
+    late = [_event('e1', 'o1', 'CFM', '2026-01-01T10:01:00Z')]
+    # O horário é gravado, mas o status gravado não volta
+    assert order_status(late, current='DELIVERED') == {'confirmed_at': '2026-01-01T10:01:00Z'}
+    assert order_status(late, current='CONFIRMED') == {'confirmed_at': '2026-01-01T10:01:00Z'}
+    assert order_status([_event('e2', 'o1', 'RTP', '2026-01-01T10:20:00Z')],
+                        current='CONFIRMED') == {'status': 'READY'}
+
+
+def test_order_status_final_states():
+    delivered = [_event('e1', 'o1', 'CON', '2026-01-01T11:00:00Z')]
+    cancelled = [_event('e2', 'o1', 'CAN', '2026-01-01T11:05:00Z')]
+    # Entregue e cancelado não se substituem
+    assert order_status(cancelled, current='DELIVERED') == {'cancelled_at': '2026-01-01T11:05:00Z'}
+    assert order_status(delivered + cancelled) == {'status': 'DELIVERED',
+                                                   'delivered_at': '2026-01-01T11:00:00Z',
+                                                   'cancelled_at': '2026-01-01T11:05:00Z'}
+
+
+def test_order_status_uses_full_code_and_ignores_unknown():
+    event = _event('e1', 'o1', None, '2026-01-01T10:00:00Z')
+    event['event_data']['fullCode'] = 'CANCELLED'
+    unknown = _event('e2', 'o1', 'XYZ', '2026-01-01T10:05:00Z')
+    assert order_status([event, unknown]) == {'status': 'CANCELLED',
+                                              'cancelled_at': '2026-01-01T10:00:00Z'}
+    assert order_status([unknown], current='PENDING') == {}
+
+
+def test_ingest_stores_orders_and_marks_events():
+    supabase = FakeSupabase(statuses={'o1': 'CONFIRMED'})
+    ingestor = OrderIngestor(supabase, FakeIFood())
+    events = [
+        _event('e1', 'o1', 'DSP', '2026-01-01T10:30:00Z'),
+        _event('e2', 'o2', 'PLC', '2026-01-01T10:00:00Z'),
+    ]
+
+    result = asyncio.run(ingestor.ingest(events, {'u1': 't1'}))
+
+    assert result == {'orders': 2, 'stored': 2, 'failed': 0, 'failed_event_ids': []}
+    rows = {row['ifood_order_id']: row for row in supabase.upserts}
+    assert rows['o1']['status'] == 'DISPATCHED'
+    assert rows['o2']['status'] == 'PENDING'
+    assert rows['o1']['total_amount'] == 42.5
+    assert [status for status, _ in supabase.updates] == ['COMPLETED']
+
+
+def test_ingest_returns_failed_event_ids_on_fetch_failure():
+    supabase = FakeSupabase()
+    ingestor = OrderIngestor(supabase, FakeIFood(failing=['o2']))
+    events = [
+        _event('e1', 'o1', 'PLC', '2026-01-01T10:00:00Z'),
+        _event('e2', 'o2', 'PLC', '2026-01-01T10:00:00Z'),
+        _event('e3', 'o2', 'CFM', '2026-01-01T10:01:00Z'),
+    ]
+
+    result = asyncio.run(ingestor.ingest(events, {'u1': 't1'}))
+
+    assert result['orders'] == 2
+    assert result['stored'] == 1
+    assert result['failed'] == 1
+    assert sorted(result['failed_event_ids']) == ['e2', 'e3']
+    assert [row['ifood_order_id'] for row in supabase.upserts] == ['o1']
+    assert [status for status, _ in supabase.updates] == ['COMPLETED', 'FAILED']
+
+
+def test_ingest_returns_failed_event_ids_on_store_failure():
+    supabase = FakeSupabase(fail_upsert=True)
+    ingestor = OrderIngestor(supabase, FakeIFood())
+    events = [
+        _event('e1', 'o1', 'PLC', '2026-01-01T10:00:00Z'),
+        _event('e2', 'o2', 'PLC', '2026-01-01T10:00:00Z'),
+    ]
+
+    result = asyncio.run(ingestor.ingest(events, {'u1': 't1'}))
+
+    assert result == {'orders': 2, 'stored': 0, 'failed': 2, 'failed_event_ids': ['e1', 'e2']}
+    assert [status for status, _ in supabase.updates] == ['FAILED']
+
+
+def test_ingest_skips_users_without_token():
+    ifood = FakeIFood()
+    ingestor = OrderIngestor(FakeSupabase(), ifood)
+    events = [_event('e1', 'o1', 'PLC', '2026-01-01T10:00:00Z', user_id='u2')]
+
+    result = asyncio.run(ingestor.ingest(events, {'u1': 't1'}))
+
+    assert result == {'orders': 0, 'stored': 0, 'failed': 0, 'failed_event_ids': []}
+    assert ifood.calls == []
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    sys.exit(0)
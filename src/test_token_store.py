@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Testes do cache persistente de tokens (token_store)
+
+Rode com pytest, ou direto: python test_token_store.py
+"""
+
+import os
+import stat
+import sys
+import tempfile
+import time
+
+from cryptography.fernet import Fernet
+
+from token_store import PersistentTokenCache, open_token_store, token_version
+
+
+def _store(directory: str) -> PersistentTokenCache:
+    return PersistentTokenCache(os.path.join(directory, 'tokens.db'), Fernet.generate_key().decode())
+
+
+def _row(row_id: str, client_id: str, user_id: str, access_token: str, updated_at: str = '1') -> dict:
+    return {'id': row_id, 'client_id': client_id, 'client_secret': 'secret', 'user_id': user_id,
+            'access_token': access_token, 'expires_at': int(time.time()) + 3600,
+            'token_updated_at': updated_at, 'updated_at': updated_at}
+
+
+def test_rows_sharing_client_id_are_kept_apart():
+    with tempfile.TemporaryDirectory() as directory:
+        store = _store(directory)
+        store.put_many([_row('1', 'app', 'u1', 'token-1'), _row('2', 'app', 'u2', 'token-2')])
+
+        rows = store.get_many()
+        assert sorted(rows) == ['1', '2']
+        assert {row['user_id'] for row in rows.values()} == {'u1', 'u2'}
+        assert store.get('2')['access_token'] == 'token-2'
+        assert store.get_for_client('app')['client_id'] == 'app'
+
+
+def test_reconcile_is_stable_for_rows_sharing_client_id():
+    with tempfile.TemporaryDirectory() as directory:
+        store = _store(directory)
+        db = {'1': _row('1', 'app', 'u1', 'token-1'), '2': _row('2', 'app', 'u2', 'token-2')}
+        fetched = []
+
+        def fetch_rows(ids):
+            fetched.append(sorted(ids))
+            return [db[row_id] for row_id in ids]
+
+        versions = {row_id: token_version(row) for row_id, row in db.items()}
+        first = store.reconcile(versions, fetch_rows)
+        second = store.reconcile(versions, fetch_rows)
+
+        assert [row['user_id'] for row in first] == ['u1', 'u2']
+        assert [row['user_id'] for row in second] == ['u1', 'u2']
+        # A segunda carga não recarrega nada: as versões não alternam
+        assert fetched == [['1', '2']]
+
+        db['2'] = _row('2', 'app', 'u2', 'token-2b', updated_at='2')
+        del db['1']
+        versions = {row_id: token_version(row) for row_id, row in db.items()}
+        third = store.reconcile(versions, fetch_rows)
+        assert [row['access_token'] for row in third] == ['token-2b']
+        assert fetched[-1] == ['2']
+        assert sorted(store.get_many()) == ['2']
+
+
+def test_file_is_private_and_key_is_required():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tokens.db')
+        assert open_token_store(path, '') is None
+        assert not os.path.exists(path)
+
+        store = _store(directory)
+        store.put(_row('1', 'app', 'u1', 'plain-access-token'))
+        for name in os.listdir(directory):
+            assert stat.S_IMODE(os.stat(os.path.join(directory, name)).st_mode) == 0o600
+        with open(store.path, 'rb') as f:
+            assert b'plain-access-token' not in f.read()
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    sys.exit(0)
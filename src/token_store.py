@@ -0,0 +1,316 @@
+"""
+Cache persistente de tokens do iFood (SQLite em modo WAL)
+
+Compartilhado pelos processos da mesma máquina (API de tokens, refresh e
+sincronização): após um restart, os tokens já conhecidos são lidos do
+arquivo em vez de consultar ifood_tokens. As linhas são guardadas pelo id
+de ifood_tokens com a versão do registro no banco (token_updated_at/
+updated_at); reconcile() recarrega só as linhas cuja versão mudou.
+
+As linhas incluem access_token e client_secret, então o payload é sempre
+criptografado (Fernet, pacote cryptography) com a chave TOKEN_CACHE_KEY:
+sem chave o cache fica desativado. O arquivo e os arquivos -wal/-shm são
+criados com permissão 0600.
+
+Quem lê com get()/get_many() só confere o expires_at: a versão é
+comparada com o banco em reconcile() (a cada carga do refresh), e os
+escritores Python (token service, refresh) atualizam o arquivo ao gravar.
+Uma linha trocada por outro escritor (ex.: o serviço Node) pode ser
+servida do disco até o refresh reconciliar ou o token expirar.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import stat
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Só o dono do processo lê o arquivo (tokens e client_secret)
+FILE_MODE = stat.S_IRUSR | stat.S_IWUSR
+
+
+def parse_expires_at(value: Any) -> float:
+    """
+    Normaliza ifood_tokens.expires_at para timestamp Unix
+
+    A coluna é BIGINT (segundos desde a época), mas linhas antigas gravadas
+    pelo token service têm strings ISO-8601; valores inválidos contam como
+    expirados.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and value:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            pass
+    return 0.0
+
+
+def token_version(row: Dict) -> str:
+    """
+    Versão de uma linha de ifood_tokens
+
+    Combina token_updated_at (gravado pelos serviços Python) com updated_at
+    (trigger do banco), já que nem todo escritor atualiza token_updated_at.
+    """
+    return f"{row.get('token_updated_at') or ''}|{row.get('updated_at') or ''}"
+
+
+class PersistentTokenCache:
+    """
+    Linhas de ifood_tokens por id em um arquivo SQLite
+
+    A chave é o id (chave primária de ifood_tokens): client_id não é único,
+    vários usuários podem usar as mesmas credenciais do app. get_for_client()
+    busca pelo índice de client_id.
+
+    Erros de disco ou de banco bloqueado são registrados e tratados como
+    cache vazio: o cache nunca impede o acesso ao Supabase.
+    """
+
+    def __init__(self, path: str, encryption_key: str, busy_timeout: float = 5.0):
+        """
+        Args:
+            path: Arquivo SQLite (criado com permissão 0600 se não existir)
+            encryption_key: Chave Fernet para criptografar os tokens em disco
+            busy_timeout: Espera máxima por um lock de escrita de outro processo
+        """
+        if not encryption_key:
+            raise ValueError("O cache de tokens exige uma chave (TOKEN_CACHE_KEY)")
+        try:
+            from cryptography.fernet import Fernet
+        except ImportError as e:
+            raise RuntimeError("TOKEN_CACHE_KEY exige o pacote cryptography") from e
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._fernet = Fernet(encryption_key.encode())
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Conexões não sobrevivem a fork: cada processo abre a sua
+        if self._conn is None or self._pid != os.getpid():
+            # O SQLite cria -wal/-shm com a permissão do arquivo principal
+            os.close(os.open(self.path, os.O_RDWR | os.O_CREAT, FILE_MODE))
+            self._restrict(self.path)
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                                   check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            for suffix in ('-wal', '-shm'):
+                if os.path.exists(self.path + suffix):
+                    self._restrict(self.path + suffix)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            # Tabela antiga, por client_id: descartada (é só cache)
+            conn.execute('DROP TABLE IF EXISTS tokens')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS token_rows ('
+                'id TEXT PRIMARY KEY, client_id TEXT NOT NULL, version TEXT NOT NULL, '
+                'expires_at REAL NOT NULL, payload BLOB NOT NULL, stored_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS token_rows_client_id ON token_rows (client_id)')
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    @staticmethod
+    def _restrict(path: str):
+        """Arquivos criados antes (ou por outro umask) também ficam 0600"""
+        if stat.S_IMODE(os.stat(path).st_mode) != FILE_MODE:
+            os.chmod(path, FILE_MODE)
+
+    def _encode(self, row: Dict) -> bytes:
+        return self._fernet.encrypt(json.dumps(row, default=str).encode())
+
+    def _decode(self, payload: bytes) -> Optional[Dict]:
+        try:
+            return json.loads(self._fernet.decrypt(payload))
+        except Exception:
+            # Chave trocada ou arquivo corrompido
+            return None
+
+    def get(self, row_id: str) -> Optional[Dict]:
+        """Linha guardada para o id (ou None)"""
+        return self.get_many([row_id]).get(str(row_id))
+
+    def get_many(self, row_ids: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """
+        Linhas guardadas por id
+
+        Args:
+            row_ids: Ids de ifood_tokens a buscar (None = todos)
+
+        Returns:
+            Dicionário id -> linha de ifood_tokens
+        """
+        try:
+            with self._lock:
+                conn = self._connection()
+                if row_ids is None:
+                    rows = conn.execute('SELECT id, payload FROM token_rows').fetchall()
+                else:
+                    ids = [str(row_id) for row_id in row_ids]
+                    rows = []
+                    for start in range(0, len(ids), 500):
+                        chunk = ids[start:start + 500]
+                        rows.extend(conn.execute(
+                            f"SELECT id, payload FROM token_rows "
+                            f"WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                        ).fetchall())
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Cache de tokens indisponível: {e}")
+            return {}
+
+        result = {}
+        for row_id, payload in rows:
+            row = self._decode(payload)
+            if row is not None:
+                result[row_id] = row
+        return result
+
+    def get_for_client(self, client_id: str) -> Optional[Dict]:
+        """
+        Linha do client_id que expira por último (ou None)
+
+        Como a consulta por client_id em ifood_tokens, serve qualquer uma
+        das linhas que compartilham as credenciais.
+        """
+        try:
+            with self._lock:
+                found = self._connection().execute(
+                    'SELECT payload FROM token_rows WHERE client_id = ? '
+                    'ORDER BY expires_at DESC LIMIT 1', (client_id,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Cache de tokens indisponível: {e}")
+            return None
+        return self._decode(found[0]) if found else None
+
+    def put(self, row: Dict):
+        """Guarda (ou substitui) a linha pelo id"""
+        self.put_many([row])
+
+    def put_many(self, rows: Iterable[Dict]):
+        """Guarda várias linhas em uma única transação (linhas sem id são ignoradas)"""
+        now = time.time()
+        values = [
+            (str(row['id']), row['client_id'], token_version(row),
+             parse_expires_at(row.get('expires_at')), self._encode(row), now)
+            for row in rows if row.get('id') and row.get('client_id')
+        ]
+        if not values:
+            return
+        try:
+            with self._lock:
+                conn = self._connection()
+                with conn:
+                    conn.execute('BEGIN IMMEDIATE')
+                    conn.executemany(
+                        'INSERT INTO token_rows (id, client_id, version, expires_at, payload, stored_at) '
+                        'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET '
+                        'client_id = excluded.client_id, version = excluded.version, '
+                        'expires_at = excluded.expires_at, payload = excluded.payload, '
+                        'stored_at = excluded.stored_at',
+                        values
+                    )
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Erro ao gravar cache de tokens: {e}")
+
+    def versions(self) -> Dict[str, str]:
+        """Versão guardada de cada id"""
+        try:
+            with self._lock:
+                return dict(self._connection().execute('SELECT id, version FROM token_rows').fetchall())
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Cache de tokens indisponível: {e}")
+            return {}
+
+    def invalidate(self, row_id: str):
+        """Remove o id do cache"""
+        self.remove([row_id])
+
+    def remove(self, row_ids: Iterable[str]):
+        """Remove vários ids (ex.: tokens apagados do banco)"""
+        try:
+            with self._lock:
+                conn = self._connection()
+                with conn:
+                    conn.execute('BEGIN IMMEDIATE')
+                    conn.executemany('DELETE FROM token_rows WHERE id = ?',
+                                     [(str(row_id),) for row_id in row_ids])
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Erro ao limpar cache de tokens: {e}")
+
+    def reconcile(self, db_versions: Dict[str, str],
+                  fetch_rows: Callable[[List[str]], List[Dict]]) -> List[Dict]:
+        """
+        Sincroniza o cache com o banco e devolve as linhas atuais
+
+        Busca no banco só as linhas cuja versão mudou (ou que o cache não
+        tem) e descarta as que sumiram do banco.
+
+        Args:
+            db_versions: id -> token_version da linha no banco
+            fetch_rows: Busca as linhas completas de uma lista de ids
+
+        Returns:
+            Linhas de ifood_tokens, na ordem de db_versions
+        """
+        db_versions = {str(row_id): version for row_id, version in db_versions.items()}
+        cached_versions = self.versions()
+        stale = [row_id for row_id, version in db_versions.items()
+                 if cached_versions.get(row_id) != version]
+        fetched: Dict[str, Dict] = {}
+        if stale:
+            fetched = {str(row['id']): row for row in fetch_rows(stale)}
+            self.put_many(fetched.values())
+        removed = cached_versions.keys() - db_versions.keys()
+        if removed:
+            self.remove(removed)
+
+        logger.info(f"🗄️ Cache de tokens: {len(db_versions) - len(stale)} reaproveitados, "
+                    f"{len(stale)} recarregados do banco")
+        cached = self.get_many(row_id for row_id in db_versions if row_id not in fetched)
+        rows = []
+        for row_id in db_versions:
+            row = fetched.get(row_id) or cached.get(row_id)
+            if row is not None:
+                rows.append(row)
+        return rows
+
+    def __len__(self) -> int:
+        return len(self.versions())
+
+
+def open_token_store(path: Optional[str], encryption_key: Optional[str] = None) -> Optional[PersistentTokenCache]:
+    """
+    Cache persistente em path, ou None se o cache estiver desativado
+
+    Desativado com path vazio, ou sem encryption_key: os tokens não são
+    gravados em texto puro.
+    """
+    if not path:
+        return None
+    if not encryption_key:
+        logger.warning("⚠️ TOKEN_CACHE_FILE definido sem TOKEN_CACHE_KEY: "
+                       "cache de tokens em disco desativado")
+        return None
+    return PersistentTokenCache(path, encryption_key)
+
+
+@lru_cache(maxsize=1)
+def default_token_store() -> Optional[PersistentTokenCache]:
+    """Cache do processo configurado por TOKEN_CACHE_FILE / TOKEN_CACHE_KEY"""
+    return open_token_store(os.getenv('TOKEN_CACHE_FILE'), os.getenv('TOKEN_CACHE_KEY'))
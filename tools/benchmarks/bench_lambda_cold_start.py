@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Benchmark de cold start e invocações warm do lambda_handler do token service
+
+Sobe um stub local (REST do Supabase + OAuth do iFood, com latência
+configurável) e mede:
+
+- cold: processos novos, cada um importando ifood_token_service e fazendo
+  uma invocação (interpretador, importação e primeira chamada separados)
+- warm hit: invocações repetidas do mesmo client_id (token em cache)
+- warm miss: client_ids novos reaproveitando o serviço do container
+- warm miss sem reuso: um IFoodTokenService novo por invocação (comportamento
+  anterior do handler), para comparar o reuso de conexões
+
+Uso:
+    python tools/benchmarks/bench_lambda_cold_start.py --cold-runs 10 --warm-runs 200
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+SERVICE_DIR = ROOT / "services" / "python_services"
+
+# Executado em cada processo "cold"; imprime os tempos em JSON
+COLD_SNIPPET = """
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {service_dir!r})
+import ifood_token_service as service
+imported = time.perf_counter()
+service.IFoodTokenService.IFOOD_TOKEN_URL = {token_url!r}
+response = service.lambda_handler({{'body': json.dumps({{
+    'clientId': 'cold', 'clientSecret': 's', 'user_id': 'u'}})}}, None)
+finished = time.perf_counter()
+print(json.dumps({{
+    'status': response['statusCode'],
+    'import_ms': (imported - started) * 1000,
+    'invoke_ms': (finished - imported) * 1000,
+}}))
+"""
+
+
+def start_stub(latency: float) -> ThreadingHTTPServer:
+    """Stub HTTP/1.1 (keep-alive) do Supabase e do OAuth do iFood"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Cabeçalho e corpo saem em writes separados; sem isso o Nagle +
+        # delayed ACK somam ~40 ms a cada resposta em conexão reaproveitada
+        disable_nagle_algorithm = True
+
+        def _send(self, status: int, body: bytes = b''):
+            time.sleep(latency)
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._send(200, b'[]')
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self.path.startswith('/oauth'):
+                self._send(200, json.dumps({
+                    'accessToken': 'token', 'type': 'bearer', 'expiresIn': 21600
+                }).encode())
+            else:
+                self._send(201)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def summarize(samples: list) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return (f"p50 {statistics.median(ordered):8.2f} ms   p95 {p95:8.2f} ms   "
+            f"máx {ordered[-1]:8.2f} ms")
+
+
+def run_cold(runs: int, base_url: str) -> dict:
+    """Processos novos: tempo total, importação e primeira invocação"""
+    snippet = COLD_SNIPPET.format(service_dir=str(SERVICE_DIR),
+                                  token_url=f"{base_url}/oauth/token")
+    env = {**os.environ, 'SUPABASE_URL': base_url, 'SUPABASE_ANON_KEY': 'bench'}
+    totals, imports, invokes = [], [], []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', snippet], env=env,
+                                capture_output=True, text=True, check=True).stdout
+        totals.append((time.perf_counter() - started) * 1000)
+        result = json.loads(output.strip().splitlines()[-1])
+        if result['status'] != 200:
+            raise RuntimeError(f"Invocação cold falhou: {result}")
+        imports.append(result['import_ms'])
+        invokes.append(result['invoke_ms'])
+    return {'process': totals, 'import': imports, 'first_invoke': invokes}
+
+
+def run_warm(runs: int, base_url: str) -> dict:
+    """Invocações no mesmo processo (container warm)"""
+    os.environ['SUPABASE_URL'] = base_url
+    os.environ['SUPABASE_ANON_KEY'] = 'bench'
+    sys.path.insert(0, str(SERVICE_DIR))
+    import ifood_token_service as service
+
+    service.IFoodTokenService.IFOOD_TOKEN_URL = f"{base_url}/oauth/token"
+
+    def invoke(client_id: str) -> float:
+        event = {'body': json.dumps({'clientId': client_id, 'clientSecret': 's', 'user_id': 'u'})}
+        started = time.perf_counter()
+        response = service.lambda_handler(event, None)
+        elapsed = (time.perf_counter() - started) * 1000
+        if response['statusCode'] != 200:
+            raise RuntimeError(f"Invocação warm falhou: {response}")
+        return elapsed
+
+    invoke('warm')
+    hits = [invoke('warm') for _ in range(runs)]
+    misses = [invoke(f'miss-{i}') for i in range(runs)]
+
+    # Comportamento anterior: serviço (e conexões) novos a cada invocação
+    fresh = []
+    for i in range(runs):
+        started = time.perf_counter()
+        result = service.IFoodTokenService(base_url, 'bench').process_token_request(f'fresh-{i}', 's', 'u')
+        fresh.append((time.perf_counter() - started) * 1000)
+        if not result['success']:
+            raise RuntimeError(f"Invocação sem reuso falhou: {result}")
+
+    return {'hit': hits, 'miss': misses, 'miss_fresh_service': fresh}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cold-runs', type=int, default=10)
+    parser.add_argument('--warm-runs', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='latência do stub por requisição, em segundos')
+    parser.add_argument('--json', help='grava as amostras neste arquivo')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    server = start_stub(args.latency)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    cold = run_cold(args.cold_runs, base_url)
+    warm = run_warm(args.warm_runs, base_url)
+
+    print(f"cold ({args.cold_runs} processos, stub {args.latency * 1000:.0f} ms/requisição):")
+    print(f"  processo completo    {summarize(cold['process'])}")
+    print(f"  importação           {summarize(cold['import'])}")
+    print(f"  primeira invocação   {summarize(cold['first_invoke'])}")
+    print(f"warm ({args.warm_runs} invocações cada):")
+    print(f"  cache hit            {summarize(warm['hit'])}")
+    print(f"  miss (reuso)         {summarize(warm['miss'])}")
+    print(f"  miss (sem reuso)     {summarize(warm['miss_fresh_service'])}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'cold': cold, 'warm': warm, 'latency': args.latency}, f)
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Benchmark de parsing da resposta OAuth do iFood: dicts vs modelo pydantic
+
+Compara json.loads + acesso por chave com OAuthToken.model_validate_json
+(validação direto dos bytes), o caminho usado pelos serviços de token.
+
+Uso:
+    python tools/benchmarks/bench_payload_parsing.py --responses 20000
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+
+from ifood_models import OAuthToken  # noqa: E402
+
+
+def best_of(func, *args, repeat: int = 3):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--responses', type=int, default=20000)
+    args = parser.parse_args()
+
+    token = json.dumps({'accessToken': 'x' * 900, 'type': 'bearer', 'expiresIn': 21600}).encode()
+    n = args.responses
+    loads, loads_time = best_of(lambda: [(data['accessToken'], data['expiresIn'])
+                                         for data in (json.loads(token) for _ in range(n))])
+    models, model_time = best_of(lambda: [(payload.access_token, payload.expires_in)
+                                          for payload in (OAuthToken.model_validate_json(token)
+                                                          for _ in range(n))])
+    assert loads == models
+    print(f"token OAuth ({n} respostas):")
+    print(f"  json.loads                    {loads_time * 1000:8.1f} ms")
+    print(f"  OAuthToken                    {model_time * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
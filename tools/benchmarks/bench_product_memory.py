@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memória da representação de produtos na sincronização
+
+Compara o caminho antigo (dataclass comum + vars() + prepare_product_for_db)
+com o Product slotted/internado convertido via to_db_row, e com a variante
+imutável FrozenProduct. Cada variante roda
+em um subprocesso separado para que o pico de RSS seja medido isoladamente.
+
+Uso:
+    python tools/benchmarks/bench_product_memory.py --items 50000
+"""
+
+import argparse
+import gc
+import json
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "_disabled_product_sync"))
+
+from ifood_product_sync import IFoodProductSync  # noqa: E402
+from product_processor import ProductProcessor  # noqa: E402
+
+
+VARIANTS = ['legacy', 'slotted', 'frozen']
+
+
+@dataclass
+class LegacyProduct:
+    """Cópia da dataclass original (sem slots) para comparação"""
+    item_id: str
+    name: str
+    description: str
+    status: str
+    product_id: str
+    image_path: str
+    price: float
+    merchant_id: str
+    user_id: Optional[str] = None
+    client_id: Optional[str] = None
+
+
+def build_payload(n_items: int, n_merchants: int = 20) -> bytes:
+    """Gera um catálogo sintético no formato da API (bytes JSON)"""
+    items = [
+        {
+            'id': f'item-{i}',
+            'name': f'Produto {i}',
+            'description': 'Descrição padrão do produto',
+            'status': 'AVAILABLE' if i % 3 else 'UNAVAILABLE',
+            'productId': f'prod-{i}',
+            'imagePath': f'images/{i}.png',
+            'price': {'value': 10.0 + (i % 50), 'originalValue': 12.0},
+            'merchant': f'merchant-{i % n_merchants}',
+        }
+        for i in range(n_items)
+    ]
+    return json.dumps(items).encode()
+
+
+def run_variant(variant: str, n_items: int) -> dict:
+    """Executa uma variante e retorna as métricas coletadas"""
+    # Strings vindas do json.loads são objetos novos, como na resposta real
+    items = json.loads(build_payload(n_items))
+    processor = ProductProcessor()
+    sync = IFoodProductSync(supabase_client=None, ifood_api_client=None,
+                            frozen_products=(variant == 'frozen'))
+
+    gc.collect()
+    gc_before = [s['collections'] for s in gc.get_stats()]
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    rows = []
+    for item in items:
+        merchant_id = item['merchant']
+        if variant == 'legacy':
+            price = item['price']['value']
+            product = LegacyProduct(
+                item_id=item['id'], name=item['name'],
+                description=item['description'], status=item['status'],
+                product_id=item['productId'], image_path=item['imagePath'],
+                price=price, merchant_id=merchant_id, user_id='user-1',
+            )
+            rows.append(processor.prepare_product_for_db(
+                vars(product), {'client_id': f'client-{merchant_id}'}
+            ))
+        else:
+            product = sync.extract_product_data(
+                item, merchant_id, 'user-1', f'client-{merchant_id}'
+            )
+            rows.append(product.to_db_row(
+                processor.normalize_product_status(product.status)
+            ))
+
+    elapsed = time.perf_counter() - start
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc_after = [s['collections'] for s in gc.get_stats()]
+
+    return {
+        'variant': variant,
+        'items': n_items,
+        'rows': len(rows),
+        'elapsed_s': round(elapsed, 3),
+        'traced_peak_mb': round(traced_peak / 1024 / 1024, 2),
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+        'gc_collections': [a - b for a, b in zip(gc_after, gc_before)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=50000)
+    parser.add_argument('--variant', choices=VARIANTS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.items)))
+        return
+
+    results = []
+    for variant in VARIANTS:
+        output = subprocess.run(
+            [sys.executable, __file__, '--variant', variant, '--items', str(args.items)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    for result in results:
+        print(f"{result['variant']:>8}: pico tracemalloc {result['traced_peak_mb']:>8} MB | "
+              f"RSS máx {result['max_rss_mb']:>8} MB | "
+              f"gc {result['gc_collections']} | {result['elapsed_s']}s")
+
+
+if __name__ == '__main__':
+    main()
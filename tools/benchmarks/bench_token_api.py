@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Teste de carga da API de tokens (services/python_services/api_server.py)
+
+Sobe stand-ins locais do OAuth do iFood e da REST do Supabase (processo
+próprio, aiohttp, latência configurável), inicia a API com uvicorn apontada
+para eles e dispara POST /token em vários níveis de concorrência, com uma
+mistura configurável de cenários:
+
+- hit: client_ids com token válido (aquecidos antes da medição)
+- miss: client_ids sem token (consulta + OAuth + insert)
+- expired: client_ids cujo token no banco já expirou
+
+O resultado (vazão, percentis de latência por nível e por cenário, erros)
+sai em JSON para comparar versões.
+
+Uso:
+    python tools/benchmarks/bench_token_api.py --concurrency 1,10,50 \\
+        --requests 2000 --mix hit=0.8,miss=0.1,expired=0.1 --output token_api.json
+    # contra uma API já em execução (que deve apontar para os mesmos stand-ins):
+    python tools/benchmarks/bench_token_api.py --api-url http://127.0.0.1:8000
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import aiohttp
+
+ROOT = Path(__file__).resolve().parents[2]
+SERVICE_DIR = ROOT / "services" / "python_services"
+
+SCENARIOS = ('hit', 'miss', 'expired')
+
+# Colunas únicas de ifood_tokens no schema real (PRIMARY KEY e UNIQUE(user_id) em
+# frontend/plano-certo-hub-insights/supabase/migrations/20250116000001-create-ifood-tokens-table.sql);
+# client_id não tem constraint
+UNIQUE_COLUMNS = {'id', 'user_id'}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_stand_ins(port: int, latency: float, ready):
+    """Processo dos stand-ins: OAuth do iFood + tabela ifood_tokens em memória"""
+    from aiohttp import web
+
+    tokens: Dict[str, Dict] = {}
+    counter = itertools.count()
+
+    async def oauth(request):
+        await request.post()
+        await asyncio.sleep(latency)
+        return web.json_response({
+            'accessToken': f'token-{next(counter)}', 'type': 'bearer', 'expiresIn': 21600
+        })
+
+    def lookup(client_id: str):
+        row = tokens.get(client_id)
+        if row is None and client_id.startswith('expired-'):
+            row = tokens[client_id] = {'id': f'row-{next(counter)}', 'client_id': client_id,
+                                       'access_token': 'old', 'expires_at': 1}
+        return row
+
+    async def select(request):
+        await asyncio.sleep(latency)
+        client_filter = request.query.get('client_id', '')
+        if client_filter.startswith('in.('):
+            client_ids = [item.strip('"') for item in client_filter[4:-1].split(',')]
+        else:
+            client_ids = [client_filter.removeprefix('eq.')]
+        rows = [row for row in map(lookup, client_ids) if row is not None]
+        return web.json_response(rows)
+
+    async def write(request):
+        # Como o PostgREST: on_conflict precisa de uma constraint única de verdade
+        on_conflict = request.query.get('on_conflict')
+        if on_conflict is not None and on_conflict not in UNIQUE_COLUMNS:
+            return web.json_response({
+                'code': '42P10',
+                'message': 'there is no unique or exclusion constraint matching '
+                           'the ON CONFLICT specification'
+            }, status=400)
+        rows = await request.json()
+        await asyncio.sleep(latency)
+        for row in rows if isinstance(rows, list) else [rows]:
+            if on_conflict is None and row['client_id'] in tokens:
+                # Sem constraint em client_id um insert duplicaria a linha
+                return web.json_response({'message': 'linha duplicada para client_id'}, status=409)
+            tokens[row['client_id']] = {'id': f'row-{next(counter)}', **row}
+        return web.Response(status=201)
+
+    async def update(request):
+        client_id = request.query.get('client_id', '').removeprefix('eq.')
+        values = await request.json()
+        await asyncio.sleep(latency)
+        row = lookup(client_id)
+        if row is not None:
+            row.update(values)
+        return web.json_response([row] if row else [])
+
+    app = web.Application()
+    app.router.add_post('/oauth/token', oauth)
+    app.router.add_get('/rest/v1/ifood_tokens', select)
+    app.router.add_post('/rest/v1/ifood_tokens', write)
+    app.router.add_patch('/rest/v1/ifood_tokens', update)
+
+    async def serve():
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', port).start()
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+def start_api(port: int, stand_in_url: str, workers: int) -> subprocess.Popen:
+    """Inicia api_server com uvicorn apontado para os stand-ins"""
+    env = {
+        **os.environ,
+        'SUPABASE_URL': stand_in_url,
+        'SUPABASE_ANON_KEY': 'bench',
+        'IFOOD_TOKEN_URL': f'{stand_in_url}/oauth/token',
+        'TOKEN_CACHE_FILE': '',
+    }
+    return subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'api_server:app', '--host', '127.0.0.1',
+         '--port', str(port), '--workers', str(workers), '--log-level', 'warning'],
+        cwd=SERVICE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+async def wait_healthy(session: aiohttp.ClientSession, api_url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f'{api_url}/health') as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f'API não respondeu em {timeout}s')
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS:
+            raise ValueError(f'Cenário desconhecido: {name} (use {", ".join(SCENARIOS)})')
+        mix[name] = float(weight)
+    return mix
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        'p50': round(pick(0.50), 3),
+        'p90': round(pick(0.90), 3),
+        'p99': round(pick(0.99), 3),
+        'max': round(ordered[-1], 3),
+        'mean': round(statistics.fmean(ordered), 3),
+    }
+
+
+async def run_level(session: aiohttp.ClientSession, api_url: str, concurrency: int,
+                    total: int, mix: Dict[str, float], hit_ids: List[str],
+                    run_id: str, rng: random.Random) -> Dict:
+    """Dispara total requisições com concurrency clientes simultâneos"""
+    names = list(mix)
+    plan = rng.choices(names, weights=[mix[name] for name in names], k=total)
+    samples: List[Tuple[str, float, int]] = []
+    next_index = itertools.count()
+
+    def body_for(index: int, scenario: str) -> Dict:
+        if scenario == 'hit':
+            client_id = hit_ids[index % len(hit_ids)]
+        else:
+            client_id = f'{scenario}-{run_id}-{concurrency}-{index}'
+        return {'clientId': client_id, 'clientSecret': 'secret', 'user_id': 'bench'}
+
+    async def worker():
+        for index in iter(lambda: next(next_index), None):
+            if index >= total:
+                return
+            scenario = plan[index]
+            started = time.perf_counter()
+            try:
+                async with session.post(f'{api_url}/token', json=body_for(index, scenario)) as response:
+                    await response.read()
+                    status = response.status
+            except aiohttp.ClientError:
+                status = 0
+            samples.append((scenario, (time.perf_counter() - started) * 1000, status))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ok = [latency for _, latency, status in samples if status == 200]
+    by_scenario = {}
+    for scenario in names:
+        scenario_ok = [latency for name, latency, status in samples if name == scenario and status == 200]
+        by_scenario[scenario] = {
+            'requests': sum(1 for name, _, _ in samples if name == scenario),
+            'latency_ms': percentiles(scenario_ok),
+        }
+
+    return {
+        'concurrency': concurrency,
+        'requests': len(samples),
+        'errors': len(samples) - len(ok),
+        'duration_s': round(elapsed, 3),
+        'throughput_rps': round(len(samples) / elapsed, 1),
+        'latency_ms': percentiles(ok),
+        'by_scenario': by_scenario,
+    }
+
+
+async def run_benchmark(args, api_url: str) -> List[Dict]:
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    run_id = f'{int(time.time())}'
+    hit_ids = [f'hit-{run_id}-{i}' for i in range(args.hit_clients)]
+
+    connector = aiohttp.TCPConnector(limit=max(args.concurrency) + 10)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await wait_healthy(session, api_url)
+
+        # Aquecimento: cria os tokens dos clientes "hit"
+        for client_id in hit_ids:
+            async with session.post(f'{api_url}/token', json={
+                'clientId': client_id, 'clientSecret': 'secret', 'user_id': 'bench'
+            }) as response:
+                await response.read()
+
+        levels = []
+        for concurrency in args.concurrency:
+            level = await run_level(session, api_url, concurrency, args.requests, mix,
+                                    hit_ids, run_id, rng)
+            levels.append(level)
+            latency = level['latency_ms']
+            print(f"c={concurrency:<4} {level['throughput_rps']:8.1f} req/s   "
+                  f"p50 {latency.get('p50', 0):7.2f} ms   p90 {latency.get('p90', 0):7.2f} ms   "
+                  f"p99 {latency.get('p99', 0):7.2f} ms   erros {level['errors']}")
+        return levels
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', default='1,10,50',
+                        help='níveis de concorrência separados por vírgula')
+    parser.add_argument('--requests', type=int, default=1000, help='requisições por nível')
+    parser.add_argument('--mix', default='hit=0.8,miss=0.1,expired=0.1',
+                        help='pesos dos cenários (hit, miss, expired)')
+    parser.add_argument('--hit-clients', type=int, default=50,
+                        help='client_ids aquecidos usados pelo cenário hit')
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='latência dos stand-ins por requisição, em segundos')
+    parser.add_argument('--workers', type=int, default=1, help='workers do uvicorn')
+    parser.add_argument('--api-url', help='usa uma API já em execução em vez de iniciar uma')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='grava os resultados em JSON neste arquivo')
+    args = parser.parse_args()
+    args.concurrency = [int(value) for value in args.concurrency.split(',')]
+
+    stand_ins = api = None
+    api_url = args.api_url
+    try:
+        if api_url is None:
+            stand_in_port = free_port()
+            ready = multiprocessing.Event()
+            stand_ins = multiprocessing.Process(target=run_stand_ins,
+                                                args=(stand_in_port, args.latency, ready),
+                                                daemon=True)
+            stand_ins.start()
+            if not ready.wait(10):
+                raise RuntimeError('Stand-ins não iniciaram')
+            api_port = free_port()
+            api = start_api(api_port, f'http://127.0.0.1:{stand_in_port}', args.workers)
+            api_url = f'http://127.0.0.1:{api_port}'
+
+        print(f"API {api_url}  mix {args.mix}  stand-ins {args.latency * 1000:.0f} ms  "
+              f"{args.requests} requisições por nível")
+        levels = asyncio.run(run_benchmark(args, api_url))
+    finally:
+        if api is not None:
+            api.terminate()
+            api.wait(10)
+        if stand_ins is not None:
+            stand_ins.terminate()
+
+    if args.output:
+        result = {
+            'benchmark': 'token_api',
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'config': {
+                'mix': parse_mix(args.mix),
+                'requests_per_level': args.requests,
+                'hit_clients': args.hit_clients,
+                'stand_in_latency_s': args.latency,
+                'workers': args.workers,
+                'external_api': args.api_url is not None,
+            },
+            'levels': levels,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"Resultados gravados em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
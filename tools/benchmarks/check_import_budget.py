@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Verifica o orçamento de tempo de importação dos pontos de entrada
+
+Cada alvo roda em um interpretador novo (sem cache de módulos em memória)
+várias vezes; a mediana do tempo de importação é comparada com o orçamento
+do alvo. Sai com código 1 se algum alvo estourar, para uso em CI ou antes
+de um commit que mexa em imports de nível de módulo.
+
+O tempo medido é só o do import (não inclui a subida do interpretador).
+
+Uso:
+    python tools/benchmarks/check_import_budget.py
+    python tools/benchmarks/check_import_budget.py --runs 9 --scale 2
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+PYTHONPATH = os.pathsep.join(str(ROOT / path) for path in (
+    'src', '_disabled_product_sync', 'services/python_services'
+))
+
+# Módulo -> orçamento em ms. Os valores deixam folga sobre o medido em uma
+# máquina de desenvolvimento; um import pesado (supabase, requests, numpy)
+# no nível de módulo estoura o orçamento com sobra
+BUDGETS_MS = {
+    'config': 15,
+    'metrics': 25,
+    'token_store': 40,
+    'main': 120,
+    'ifood_token_service': 250,  # pydantic (~100 ms) é a maior parte
+}
+
+SNIPPET = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+print(json.dumps({{'ms': (time.perf_counter() - started) * 1000,
+                  'modules': len(sys.modules)}}))
+"""
+
+
+def measure(module: str, runs: int) -> dict:
+    """Mediana do tempo de importação de module em interpretadores novos"""
+    env = {**os.environ, 'PYTHONPATH': PYTHONPATH, 'PYTHONDONTWRITEBYTECODE': '1'}
+    samples, modules = [], 0
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', SNIPPET.format(module=module)],
+                                env=env, cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        samples.append(result['ms'])
+        modules = result['modules']
+    return {'ms': statistics.median(samples), 'modules': modules}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='execuções por alvo')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiplica os orçamentos (máquinas mais lentas)')
+    parser.add_argument('modules', nargs='*', help='alvos (padrão: todos de BUDGETS_MS)')
+    args = parser.parse_args()
+
+    over = []
+    for module in args.modules or BUDGETS_MS:
+        budget = BUDGETS_MS.get(module, 0) * args.scale
+        try:
+            result = measure(module, args.runs)
+        except subprocess.CalledProcessError as e:
+            print(f"❌ {module:<22} falhou ao importar\n{e.stderr}")
+            over.append(module)
+            continue
+
+        ok = not budget or result['ms'] <= budget
+        status = '✅' if ok else '❌'
+        limit = f"{budget:6.0f} ms" if budget else '     - '
+        print(f"{status} {module:<22} {result['ms']:7.1f} ms   orçamento {limit}   "
+              f"{result['modules']} módulos")
+        if not ok:
+            over.append(module)
+
+    if over:
+        print(f"\n❌ Acima do orçamento: {', '.join(over)}")
+        return 1
+    print("\n✅ Todos os imports dentro do orçamento")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())